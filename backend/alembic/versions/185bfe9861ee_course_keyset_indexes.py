@@ -0,0 +1,25 @@
+"""course keyset pagination indexes
+
+Revision ID: 185bfe9861ee
+Revises: d6fc5d549fa3
+Create Date: 2026-10-18 09:12:41.208114
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '185bfe9861ee'
+down_revision = 'd6fc5d549fa3'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # (created_at, id) ordering for public lists, prefixed by educator_id for instructor lists
+    op.create_index('ix_courses_created_at_id', 'courses', ['created_at', 'id'], unique=False)
+    op.create_index('ix_courses_educator_created_at_id', 'courses', ['educator_id', 'created_at', 'id'], unique=False)
+
+def downgrade():
+    op.drop_index('ix_courses_educator_created_at_id', table_name='courses')
+    op.drop_index('ix_courses_created_at_id', table_name='courses')
@@ -0,0 +1,34 @@
+"""course full-text search vector + trigram index
+
+Revision ID: 5e0c7a2d91b4
+Revises: 185bfe9861ee
+Create Date: 2026-10-18 10:03:17.551930
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '5e0c7a2d91b4'
+down_revision = '185bfe9861ee'
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+)
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # generated column: Postgres recomputes it on every course insert/update, no app code involved
+    op.add_column('courses', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR_SQL, persisted=True), nullable=True))
+    op.create_index('ix_courses_search_vector', 'courses', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index('ix_courses_title_trgm', 'courses', ['title'], unique=False, postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
+
+def downgrade():
+    op.drop_index('ix_courses_title_trgm', table_name='courses')
+    op.drop_index('ix_courses_search_vector', table_name='courses')
+    op.drop_column('courses', 'search_vector')
@@ -0,0 +1,59 @@
+"""ON DELETE CASCADE on the course tree foreign keys
+
+Revision ID: 9c41f3b7a2e8
+Revises: 5e0c7a2d91b4
+Create Date: 2026-10-18 11:26:40.218305
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c41f3b7a2e8'
+down_revision = '5e0c7a2d91b4'
+branch_labels = None
+depends_on = None
+
+# (table, column, referenced table, ondelete) - constraint names are Postgres defaults from the initial schema
+CASCADE_FKS = [
+    ('sections', 'course_id', 'courses', 'CASCADE'),
+    ('lessons', 'section_id', 'sections', 'CASCADE'),
+    ('assessments', 'lesson_id', 'lessons', 'CASCADE'),
+    ('choices', 'assessment_id', 'assessments', 'CASCADE'),
+    ('student_lessons', 'lesson_id', 'lessons', 'CASCADE'),
+    ('assessment_attempts', 'assessment_id', 'assessments', 'CASCADE'),
+    ('student_answers', 'attempt_id', 'assessment_attempts', 'CASCADE'),
+    ('student_answers', 'choice_id', 'choices', 'SET NULL'),
+]
+
+# Postgres does not index the referencing side; without these every cascaded delete scans the child table
+FK_INDEXES = [
+    ('ix_sections_course_id', 'sections', 'course_id'),
+    ('ix_lessons_section_id', 'lessons', 'section_id'),
+    ('ix_assessments_lesson_id', 'assessments', 'lesson_id'),
+    ('ix_choices_assessment_id', 'choices', 'assessment_id'),
+    ('ix_student_lessons_lesson_id', 'student_lessons', 'lesson_id'),
+    ('ix_assessment_attempts_assessment_id', 'assessment_attempts', 'assessment_id'),
+    ('ix_student_answers_attempt_id', 'student_answers', 'attempt_id'),
+    ('ix_student_answers_choice_id', 'student_answers', 'choice_id'),
+]
+
+
+def _fk_name(table, column):
+    return f'{table}_{column}_fkey'
+
+
+def upgrade():
+    for table, column, referred, ondelete in CASCADE_FKS:
+        op.drop_constraint(_fk_name(table, column), table, type_='foreignkey')
+        op.create_foreign_key(_fk_name(table, column), table, referred, [column], ['id'], ondelete=ondelete)
+    for name, table, column in FK_INDEXES:
+        op.create_index(name, table, [column], unique=False)
+
+def downgrade():
+    for name, table, column in reversed(FK_INDEXES):
+        op.drop_index(name, table_name=table)
+    for table, column, referred, ondelete in reversed(CASCADE_FKS):
+        op.drop_constraint(_fk_name(table, column), table, type_='foreignkey')
+        op.create_foreign_key(_fk_name(table, column), table, referred, [column], ['id'])
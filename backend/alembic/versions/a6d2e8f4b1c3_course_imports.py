@@ -0,0 +1,38 @@
+"""course_imports: persisted progress of bulk course imports
+
+Revision ID: a6d2e8f4b1c3
+Revises: f1a3c5e7b9d2
+Create Date: 2026-10-18 16:02:48.517930
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d2e8f4b1c3'
+down_revision = 'f1a3c5e7b9d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('course_imports',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('educator_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(), server_default='queued', nullable=False),
+    sa.Column('lines_read', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('imported', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('failed', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('errors', postgresql.ARRAY(sa.Text()), server_default='{}', nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['educator_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('course_imports')
@@ -0,0 +1,25 @@
+"""courses.slug text_pattern_ops index for the slug prefix lookup
+
+Revision ID: b2f6d9a3e7c5
+Revises: a6d2e8f4b1c3
+Create Date: 2026-10-18 16:24:11.308652
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2f6d9a3e7c5'
+down_revision = 'a6d2e8f4b1c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # ix_courses_slug uses the database collation, which can't serve LIKE 'base-%' unless it is C
+    op.create_index('ix_courses_slug_pattern', 'courses', ['slug'], unique=False, postgresql_ops={'slug': 'text_pattern_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_courses_slug_pattern', table_name='courses')
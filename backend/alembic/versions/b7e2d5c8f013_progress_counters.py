@@ -0,0 +1,42 @@
+"""denormalized progress counters: courses.lesson_count, enrollments.completed_lessons
+
+Revision ID: b7e2d5c8f013
+Revises: 9c41f3b7a2e8
+Create Date: 2026-10-18 12:14:52.730116
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d5c8f013'
+down_revision = '9c41f3b7a2e8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('courses', sa.Column('lesson_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('enrollments', sa.Column('completed_lessons', sa.Integer(), server_default='0', nullable=False))
+    # backfill; same statements as app/services/progress_counters.reconcile()
+    op.execute("""
+        UPDATE courses c SET lesson_count = t.n
+        FROM (SELECT s.course_id, count(*) AS n
+              FROM lessons l JOIN sections s ON s.id = l.section_id
+              GROUP BY s.course_id) t
+        WHERE c.id = t.course_id
+    """)
+    op.execute("""
+        UPDATE enrollments e SET completed_lessons = t.n
+        FROM (SELECT sl.user_id, s.course_id, count(*) AS n
+              FROM student_lessons sl
+              JOIN lessons l ON l.id = sl.lesson_id
+              JOIN sections s ON s.id = l.section_id
+              GROUP BY sl.user_id, s.course_id) t
+        WHERE e.user_id = t.user_id AND e.course_id = t.course_id
+    """)
+
+def downgrade():
+    op.drop_column('enrollments', 'completed_lessons')
+    op.drop_column('courses', 'lesson_count')
@@ -0,0 +1,35 @@
+"""courses.preview_lesson_id: first lesson of the course, kept up to date by structure edits
+
+Revision ID: c3a9e1f4d7b2
+Revises: b7e2d5c8f013
+Create Date: 2026-10-18 12:58:09.416287
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a9e1f4d7b2'
+down_revision = 'b7e2d5c8f013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('courses', sa.Column('preview_lesson_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('courses_preview_lesson_id_fkey', 'courses', 'lessons', ['preview_lesson_id'], ['id'], ondelete='SET NULL')
+    op.create_index('ix_courses_preview_lesson_id', 'courses', ['preview_lesson_id'], unique=False)
+    # backfill; same ordering as app/services/preview_lessons.py
+    op.execute("""
+        UPDATE courses c SET preview_lesson_id = f.lesson_id
+        FROM (SELECT DISTINCT ON (s.course_id) s.course_id, l.id AS lesson_id
+              FROM lessons l JOIN sections s ON s.id = l.section_id
+              ORDER BY s.course_id, s."order", s.id, l."order", l.id) f
+        WHERE c.id = f.course_id
+    """)
+
+def downgrade():
+    op.drop_index('ix_courses_preview_lesson_id', table_name='courses')
+    op.drop_constraint('courses_preview_lesson_id_fkey', 'courses', type_='foreignkey')
+    op.drop_column('courses', 'preview_lesson_id')
@@ -0,0 +1,45 @@
+"""grading_jobs: durable queue for asynchronous assessment grading
+
+Revision ID: d8f2a6b1c4e7
+Revises: c3a9e1f4d7b2
+Create Date: 2026-10-18 13:41:27.902644
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f2a6b1c4e7'
+down_revision = 'c3a9e1f4d7b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('grading_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('attempt_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('assessment_id', sa.Integer(), nullable=False),
+    sa.Column('choice_ids', postgresql.ARRAY(sa.Integer()), nullable=False),
+    sa.Column('status', sa.String(), server_default='queued', nullable=False),
+    sa.Column('tries', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['attempt_id'], ['assessment_attempts.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('attempt_id', name='uq_grading_jobs_attempt_id')
+    )
+    # workers only ever scan pending work; keep that index small
+    op.create_index('ix_grading_jobs_pending', 'grading_jobs', ['status', 'id'], unique=False,
+                    postgresql_where=sa.text("status IN ('queued', 'running')"))
+
+def downgrade():
+    op.drop_index('ix_grading_jobs_pending', table_name='grading_jobs')
+    op.drop_table('grading_jobs')
@@ -0,0 +1,54 @@
+"""assessment_attempt_counters + unique attempt numbers per (user, assessment)
+
+Revision ID: e4b7c9d2a5f1
+Revises: d8f2a6b1c4e7
+Create Date: 2026-10-18 14:22:51.630918
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7c9d2a5f1'
+down_revision = 'd8f2a6b1c4e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('assessment_attempt_counters',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('assessment_id', sa.Integer(), nullable=False),
+    sa.Column('last_number', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['assessment_id'], ['assessments.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'assessment_id')
+    )
+    # the old max()+1 numbering could hand out the same number twice under concurrent submits:
+    # renumber (in creation order) only the (user, assessment) pairs that have duplicates or NULLs
+    op.execute("""
+        UPDATE assessment_attempts a SET attempt_number = r.rn
+        FROM (SELECT id, row_number() OVER (PARTITION BY user_id, assessment_id
+                                            ORDER BY attempt_number NULLS LAST, id) AS rn
+              FROM assessment_attempts
+              WHERE (user_id, assessment_id) IN (
+                  SELECT user_id, assessment_id FROM assessment_attempts
+                  GROUP BY user_id, assessment_id
+                  HAVING count(*) <> count(DISTINCT attempt_number))) r
+        WHERE a.id = r.id
+    """)
+    op.alter_column('assessment_attempts', 'attempt_number', existing_type=sa.Integer(), nullable=False)
+    op.create_unique_constraint('uq_assessment_attempts_user_assessment_number', 'assessment_attempts',
+                                ['user_id', 'assessment_id', 'attempt_number'])
+    op.execute("""
+        INSERT INTO assessment_attempt_counters (user_id, assessment_id, last_number)
+        SELECT user_id, assessment_id, max(attempt_number) FROM assessment_attempts
+        GROUP BY user_id, assessment_id
+    """)
+
+
+def downgrade():
+    op.drop_constraint('uq_assessment_attempts_user_assessment_number', 'assessment_attempts', type_='unique')
+    op.alter_column('assessment_attempts', 'attempt_number', existing_type=sa.Integer(), nullable=True)
+    op.drop_table('assessment_attempt_counters')
@@ -0,0 +1,24 @@
+"""assessments.key_version: cross-process freshness check for cached answer keys
+
+Revision ID: f1a3c5e7b9d2
+Revises: e4b7c9d2a5f1
+Create Date: 2026-10-18 15:07:33.184502
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a3c5e7b9d2'
+down_revision = 'e4b7c9d2a5f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('assessments', sa.Column('key_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    op.drop_column('assessments', 'key_version')
@@ -0,0 +1,77 @@
+"""
+Compiled answer keys, so grading doesn't rebuild the key from every choice row per submission.
+
+Per assessment we keep a grading.AnswerKey: choice ids as a sorted int array, the correct
+flags as bytes, the first correct choice and the explanation, tagged with the
+assessments.key_version it was built from.
+
+Freshness is checked against the database on every use, so it holds across worker processes:
+grading resolves the submitted choice ids to (assessment_id, key_version) in one indexed query
+and a cached key is only used when its version matches. Writers call mark_changed(db,
+assessment_ids), which bumps key_version in the writer's own transaction - the new version
+becomes visible exactly when the edit commits - and drops the local copies right away.
+The TTL only bounds memory held by keys nobody grades against anymore.
+"""
+import threading
+import time
+
+from sqlalchemy import update
+
+from app import models
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+_lock = threading.Lock()
+_keys = LRUCache(maxsize=settings.ANSWER_KEY_CACHE_SIZE)   # assessment_id -> AnswerKey
+
+
+def lookup(versions: dict):
+    """versions: {assessment_id: current key_version}. Returns ({assessment_id: AnswerKey}, [stale/missing ids])."""
+    keys, missing = {}, []
+    for assessment_id, version in versions.items():
+        key = _keys.get(assessment_id)
+        if key is None or key.version != version:
+            missing.append(assessment_id)
+        else:
+            keys[assessment_id] = key
+    return keys, missing
+
+
+def store(keys):
+    expires_at = time.time() + settings.ANSWER_KEY_CACHE_TTL_SECONDS
+    with _lock:
+        for key in keys:
+            current = _keys.get(key.assessment_id)
+            # two graders racing across an edit: never replace a newer key with an older one
+            if current is None or current.version <= key.version:
+                _keys.set(key.assessment_id, key, expires_at=expires_at)
+
+
+def invalidate(assessment_ids):
+    with _lock:
+        for assessment_id in set(assessment_ids):
+            _keys.pop(assessment_id)
+
+
+def mark_changed(db, assessment_ids):
+    """Call from any write that touches assessments or their choices, inside its transaction."""
+    assessment_ids = sorted({aid for aid in assessment_ids if aid is not None})
+    if not assessment_ids:
+        return
+    A = models.Assessment
+    db.execute(
+        update(A)
+        .where(A.id.in_(assessment_ids))
+        .values(key_version=A.key_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    invalidate(assessment_ids)
+
+
+def clear():
+    with _lock:
+        _keys.clear()
+
+
+def stats() -> dict:
+    return {"keys": _keys.stats()}
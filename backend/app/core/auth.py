@@ -3,20 +3,18 @@ from fastapi import Depends, HTTPException, status, Response, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError, ExpiredSignatureError
 from app.core.config import settings
-from app.db.sessions import SessionLocal
-from app import models
+from app.core import principal_cache
+from app.core.cache import LRUCache
+# Use the same get_db callable as the routes: FastAPI caches a dependency per request,
+# so auth and the handler share one session (one pooled connection, one transaction).
+from app.db.sessions import get_db, get_async_db
+from app import models, crud
 from typing import Optional
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 security = HTTPBearer()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 def decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
@@ -25,8 +23,7 @@ def decode_token(token: str) -> dict:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid authentication")
 
 
-#def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db=Depends(get_db)):
-def get_current_user(request: Request, db: Session = Depends(get_db)) -> models.User:
+def _token_from_request(request: Request) -> str:
     token = request.cookies.get("access_token")
     # token = credentials.credentials
     if not token:
@@ -35,8 +32,11 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> models.
     # Some setups send cookies like: "Bearer eyJhbGciOi..."
     if token.startswith("Bearer "):
         token = token.split(" ")[1]
+    return token
 
 
+def _verify_token(token: str):
+    """Decode + validate the JWT. Returns (claims, user_id)."""
     try:
         payload = decode_token(token)
         sub = payload.get("sub")
@@ -52,13 +52,42 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> models.
         raise HTTPException(status_code=401, detail="Invalid token")
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid authentication")
-    
+    return payload, user_id
+
+
+#def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db=Depends(get_db)):
+def get_current_user(request: Request, db: Session = Depends(get_db)) -> principal_cache.Principal:
+    token = _token_from_request(request)
+
+    # fast path: token already verified and user snapshot cached
+    principal = principal_cache.get_principal(token)
+    if principal is not None:
+        return principal
+
+    payload, user_id = _verify_token(token)
     user = db.query(models.User).get(user_id)
     
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     
-    return user
+    return principal_cache.store(token, payload, user)
+
+
+# Same as get_current_user, for async endpoints (AsyncSession, no threadpool hop)
+async def get_current_user_async(request: Request, db: AsyncSession = Depends(get_async_db)) -> principal_cache.Principal:
+    token = _token_from_request(request)
+
+    principal = principal_cache.get_principal(token)
+    if principal is not None:
+        return principal
+
+    payload, user_id = _verify_token(token)
+    user = await db.get(models.User, user_id)
+
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+
+    return principal_cache.store(token, payload, user)
 
 # CSRF verifier dependency: compares header to cookie (double submit)
 def verify_csrf(request: Request):
@@ -69,24 +98,57 @@ def verify_csrf(request: Request):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid CSRF token")
     return True
 
+def _check_role(role: str, current_user):
+    # we store boolean is_educator in user model; map to instructor
+    if role == "student":
+        # any authenticated user is a student unless blocked
+        return current_user
+    if role == "instructor":
+        if not getattr(current_user, "is_educator", False):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Instructor role required")
+        return current_user
+    if role == "admin":
+        # assume user.is_admin flag if you have it; else check email or DB role
+        if not getattr(current_user, "is_admin", False):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin role required")
+        return current_user
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Invalid role config")
+
 def require_role(role: str):
     """
     Dependency factory that ensures current_user has given role.
     role: one of 'student', 'instructor', 'admin' (depends on your model)
     """
     def _require_role(current_user: models.User = Depends(get_current_user)):
-        # we store boolean is_educator in user model; map to instructor
-        if role == "student":
-            # any authenticated user is a student unless blocked
-            return current_user
-        if role == "instructor":
-            if not getattr(current_user, "is_educator", False):
-                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Instructor role required")
-            return current_user
-        if role == "admin":
-            # assume user.is_admin flag if you have it; else check email or DB role
-            if not getattr(current_user, "is_admin", False):
-                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin role required")
-            return current_user
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Invalid role config")
-    return _require_role
\ No newline at end of file
+        return _check_role(role, current_user)
+    return _require_role
+
+def require_role_async(role: str):
+    """require_role for async endpoints (resolves the user through get_current_user_async)."""
+    async def _require_role(current_user=Depends(get_current_user_async)):
+        return _check_role(role, current_user)
+    return _require_role
+
+
+# --- course ownership ---
+# course_id -> educator_id. A course never changes owner, so entries stay valid;
+# a deleted course only means a stale hit ends in a 404 later in the handler.
+_course_owner_cache = LRUCache(maxsize=settings.COURSE_OWNER_CACHE_SIZE)
+
+def check_course_owner(db: Session, course_id: int, user_id: int):
+    """404 if the course does not exist, 403 if user_id is not its educator. One-column query on a miss."""
+    educator_id = _course_owner_cache.get(course_id)
+    if educator_id is None:
+        educator_id = crud.get_course_educator_id(db, course_id)
+        if educator_id is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
+        _course_owner_cache.set(course_id, educator_id)
+    if educator_id != user_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed. You are not the educator of this course.")
+
+def require_course_owner(course_id: int,
+                         current_user=Depends(require_role("instructor")),
+                         db: Session = Depends(get_db)):
+    """Dependency for /courses/{course_id}/... instructor routes; returns the current user."""
+    check_course_owner(db, course_id, current_user.id)
+    return current_user
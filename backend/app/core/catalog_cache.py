@@ -0,0 +1,126 @@
+"""
+Catalog cache for the anonymous course pages (/public/courses and /public/courses/{slug}).
+
+Courses only change when an instructor edits them, so we keep:
+  - list pages, keyed by the catalog generation (bumped on every course change) + query args
+  - a slug -> course_id index and a version per course; the detail bodies themselves live in
+    app/core/snapshot_store.py, keyed by (course_id, version)
+Writers call mark_changed(db, course_ids) inside their transaction. The courses are
+invalidated once the session commits - not before, or a reader could cache the pre-commit tree
+under the new version - and forgotten if it rolls back.
+Readers must take the generation *before* querying, so a result that raced with
+a write is stored under the old stamp and never served.
+TTL caps staleness across workers, since invalidation is per process.
+"""
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core import snapshot_store
+
+_lock = threading.Lock()
+_versions = {}          # course_id -> generation of its last change
+_version_floor = 0      # version of courses not in _versions (raised when _versions is reset)
+_generation = 0         # bumped whenever any course changes (list pages depend on all courses)
+_slug_index = {}        # slug -> course_id
+
+_lists = LRUCache(maxsize=settings.CATALOG_CACHE_LIST_SIZE)
+
+_PENDING = "catalog_changed"   # session.info key
+
+
+def _expiry():
+    return time.time() + settings.CATALOG_CACHE_TTL_SECONDS
+
+
+def generation() -> int:
+    return _generation
+
+
+def course_version(course_id: int) -> int:
+    return _versions.get(course_id, _version_floor)
+
+
+# --- list pages ---
+def get_list(generation_seen: int, key):
+    return _lists.get((generation_seen, key))
+
+
+def set_list(generation_seen: int, key, value):
+    if generation_seen == _generation:
+        _lists.set((generation_seen, key), value, expires_at=_expiry())
+
+
+# --- slug index ---
+def course_id_for_slug(slug: str):
+    return _slug_index.get(slug)
+
+
+def remember_slug(slug: str, course_id: int, generation_seen: int):
+    """
+    Record slug -> course_id after a DB lookup. The id is only known after the query, so we guard
+    with the catalog generation instead: returns the course version to stamp a snapshot with,
+    or None if any course changed meanwhile (result must not be cached).
+    """
+    with _lock:
+        if generation_seen != _generation:
+            return None
+        if len(_slug_index) >= settings.CATALOG_CACHE_SLUG_INDEX_SIZE:
+            _slug_index.clear()
+        _slug_index[slug] = course_id
+        return course_version(course_id)
+
+
+def invalidate_course(course_id: int):
+    """Drop everything cached for the course now. Writers use mark_changed instead."""
+    global _generation, _version_floor
+    with _lock:
+        _generation += 1
+        # versions are generation stamps, so they never repeat; when the map is full every course
+        # moves to a fresh floor, which no snapshot stored so far can match
+        if len(_versions) >= settings.CATALOG_CACHE_SLUG_INDEX_SIZE:
+            _versions.clear()
+            _version_floor = _generation
+        _versions[course_id] = _generation
+        for slug in [s for s, cid in _slug_index.items() if cid == course_id]:
+            del _slug_index[slug]
+    snapshot_store.discard(course_id)
+    _lists.clear()   # every page is stale now; the generation bump guards in-flight readers
+
+
+def mark_changed(db, course_ids):
+    """Call from any write that changes a course row or its tree (sections/lessons/assessments)."""
+    db.info.setdefault(_PENDING, set()).update(cid for cid in course_ids if cid is not None)
+
+
+def clear():
+    global _generation
+    with _lock:
+        _generation += 1
+        _slug_index.clear()
+    _lists.clear()
+    snapshot_store.clear()
+
+
+def stats() -> dict:
+    return {"lists": _lists.stats(), "slugs": len(_slug_index), "versions": len(_versions), "generation": _generation}
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    # also fires when a savepoint is released; only the outermost commit makes the change visible
+    if session.in_nested_transaction():
+        return
+    for course_id in session.info.pop(_PENDING, ()):
+        invalidate_course(course_id)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _forget_after_rollback(session, transaction):
+    # outermost transaction over without a commit (rollback/close): nothing to invalidate
+    if transaction.parent is None:
+        session.info.pop(_PENDING, None)
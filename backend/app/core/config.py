@@ -1,12 +1,27 @@
 from pydantic import BaseSettings
 #from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 import ast
 
 
 class Settings(BaseSettings):
     SECRET_KEY: str
     DATABASE_URL: str
+    ASYNC_DATABASE_URL: Optional[str] = None   # defaults to DATABASE_URL with the asyncpg driver
+
+    # connection pool (applied to every engine, see app/db/sessions.py)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30            # seconds to wait for a connection before erroring
+    DB_POOL_RECYCLE: int = 1800          # seconds; -1 disables
+    DB_POOL_PRE_PING: str = "idle"       # always | idle | never
+    DB_POOL_PRE_PING_IDLE_SECONDS: int = 30
+
+    # read replicas: GET/HEAD requests read from these, writes stay on DATABASE_URL
+    DATABASE_REPLICA_URLS: list[str] = []
+    ASYNC_DATABASE_REPLICA_URLS: list[str] = []   # defaults to DATABASE_REPLICA_URLS with asyncpg
+    READ_YOUR_WRITES_SECONDS: int = 10            # after a write, that client reads from the primary this long
+
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
     # cookie config
     COOKIE_SECURE: bool = False          # set False in development
@@ -15,6 +30,46 @@ class Settings(BaseSettings):
 
     CORS_ORIGINS: list[str]
 
+    # principal cache (see app/core/principal_cache.py)
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 300   # upper bound, entries never outlive the token exp
+
+    # bcrypt worker pool used by /auth/token and /auth/signup (see app/core/security.py)
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64     # running + queued; beyond this we answer 503
+    PASSWORD_HASH_RETRY_AFTER_SECONDS: int = 2
+
+    # public catalog cache (see app/core/catalog_cache.py)
+    CATALOG_CACHE_LIST_SIZE: int = 256       # cached list pages
+    CATALOG_CACHE_SLUG_INDEX_SIZE: int = 10000   # slug -> course_id entries
+    COURSE_SNAPSHOT_MAX_BYTES: int = 64 * 1024 * 1024   # total size of pre-encoded course detail JSON
+    CATALOG_CACHE_TTL_SECONDS: int = 60
+    COURSE_OWNER_CACHE_SIZE: int = 10000     # course_id -> educator_id (app/core/auth.py)
+
+    # compiled answer keys for grading (see app/core/answer_key_cache.py)
+    ANSWER_KEY_CACHE_SIZE: int = 5000             # assessments
+    ANSWER_KEY_CACHE_TTL_SECONDS: int = 600       # memory bound only; freshness is checked via assessments.key_version
+
+    # JSON Lines course import/export (see app/services/course_transfer.py)
+    COURSE_IMPORT_BATCH_SIZE: int = 200      # courses per insert batch / transaction
+    COURSE_IMPORT_MAX_BYTES: int = 512 * 1024 * 1024
+    COURSE_IMPORT_SPOOL_DIR: Optional[str] = None   # None = system temp dir
+    COURSE_EXPORT_BATCH_SIZE: int = 100      # courses fetched (yield_per) and expanded per round
+
+    # async grading queue (see app/services/grading_queue.py)
+    GRADING_WORKERS: int = 2                 # grading threads per process; 0 = this process only enqueues
+    GRADING_POLL_INTERVAL_SECONDS: float = 0.5   # idle wait between claims
+    GRADING_CLAIM_BATCH: int = 20            # jobs claimed per round trip
+    GRADING_JOB_TIMEOUT_SECONDS: int = 120   # "running" longer than this = worker died, requeue
+    GRADING_MAX_TRIES: int = 3
+
+    # instructor item analysis (see app/services/item_analysis.py)
+    ITEM_ANALYSIS_CACHE_SIZE: int = 256      # courses
+    ITEM_ANALYSIS_CACHE_TTL_SECONDS: int = 3600   # results are versioned; this only bounds memory use
+
+    # /internal/metrics: callers must send it in the X-Metrics-Token header; unset = endpoint disabled (404)
+    METRICS_TOKEN: Optional[str] = None
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
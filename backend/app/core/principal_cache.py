@@ -0,0 +1,80 @@
+"""
+Cache of authenticated principals, keyed by a digest of the access token.
+
+get_current_user used to decode the JWT and load the User row on every request.
+A hit here skips both: we keep the verified claims plus a slim user snapshot
+until the token expires (capped by PRINCIPAL_CACHE_TTL_SECONDS so that changes
+made through another worker become visible eventually).
+"""
+import hashlib
+import time
+
+from sqlalchemy import event
+
+from app import models
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+
+class Principal:
+    """Session-independent view of the logged-in user (what routes actually read)."""
+
+    __slots__ = ("id", "email", "full_name", "is_educator")
+
+    def __init__(self, id: int, email: str, full_name: str = None, is_educator: bool = False):
+        self.id = id
+        self.email = email
+        self.full_name = full_name
+        self.is_educator = bool(is_educator)
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        return cls(id=user.id, email=user.email, full_name=user.full_name, is_educator=user.is_educator)
+
+
+_cache = LRUCache(maxsize=settings.PRINCIPAL_CACHE_SIZE)
+
+
+def token_digest(token: str) -> str:
+    # never keep raw tokens in memory longer than needed
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def get_principal(token: str):
+    """Return the cached Principal for this token, or None on miss/expiry."""
+    entry = _cache.get(token_digest(token))
+    return entry[1] if entry else None
+
+
+def store(token: str, claims: dict, user: models.User) -> Principal:
+    principal = Principal.from_user(user)
+    expires_at = time.time() + settings.PRINCIPAL_CACHE_TTL_SECONDS
+    exp = claims.get("exp")
+    if exp is not None:
+        expires_at = min(expires_at, float(exp))
+    _cache.set(token_digest(token), (claims, principal), expires_at=expires_at)
+    return principal
+
+
+def invalidate_token(token: str):
+    _cache.pop(token_digest(token))
+
+
+def invalidate_user(user_id: int) -> int:
+    """Drop every cached token that belongs to user_id (call when the user row changes)."""
+    return _cache.remove_where(lambda entry: entry[1].id == user_id)
+
+
+def clear():
+    _cache.clear()
+
+
+def stats() -> dict:
+    return _cache.stats()
+
+
+# Invalidation hooks: any ORM update/delete of a User drops that user's cached principals.
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _on_user_changed(mapper, connection, target):
+    invalidate_user(target.id)
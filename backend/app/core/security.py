@@ -1,5 +1,10 @@
 # core/security.py
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
+from app.core.config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -12,3 +17,58 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     if hasattr(plain_password, "get_secret_value"):
         plain_password = plain_password.get_secret_value()
     return pwd_context.verify(plain_password.strip(), hashed_password)
+
+
+# --- bounded bcrypt pool ---
+# bcrypt is slow on purpose (~0.2s per call). Running it in Starlette's shared threadpool lets a
+# login storm starve every other sync endpoint, so the async login/signup path sends it here instead.
+# The bcrypt C extension releases the GIL, so these threads hash in parallel.
+_hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_lock = threading.Lock()
+_hash_pending = 0    # running + queued jobs in the pool
+_hash_rejected = 0
+
+
+def _hash_job_done(_future):
+    # runs when the pool job really ends (or is cancelled before it started), not when the
+    # awaiting request goes away: a disconnected client's bcrypt still occupies a worker
+    global _hash_pending
+    with _hash_lock:
+        _hash_pending -= 1
+
+
+async def _run_in_hash_pool(fn, *args):
+    global _hash_pending, _hash_rejected
+    # admission control: refuse early instead of queueing work nobody will wait for
+    with _hash_lock:
+        admitted = _hash_pending < settings.PASSWORD_HASH_MAX_PENDING
+        if admitted:
+            _hash_pending += 1
+        else:
+            _hash_rejected += 1
+    if not admitted:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts in progress, please retry shortly",
+            headers={"Retry-After": str(settings.PASSWORD_HASH_RETRY_AFTER_SECONDS)},
+        )
+    job = _hash_executor.submit(fn, *args)
+    job.add_done_callback(_hash_job_done)
+    return await asyncio.wrap_future(job)
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_in_hash_pool(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_in_hash_pool(verify_password, plain_password, hashed_password)
+
+
+def hash_pool_stats() -> dict:
+    return {
+        "workers": settings.PASSWORD_HASH_WORKERS,
+        "pending": _hash_pending,
+        "max_pending": settings.PASSWORD_HASH_MAX_PENDING,
+        "rejected": _hash_rejected,
+    }
@@ -0,0 +1,91 @@
+"""
+Pre-serialized course detail snapshots.
+
+For a big course, building CourseDetailOut means hydrating the whole ORM tree and running
+pydantic orm_mode over every section/lesson/assessment/choice. We do that once per
+(course_id, version) and keep the encoded JSON bytes; hits are returned as a raw Response.
+Versions come from catalog_cache.course_version(), which crud bumps on every course edit,
+so a changed course simply misses and gets rebuilt on the next request.
+Memory is bounded by total payload bytes (COURSE_SNAPSHOT_MAX_BYTES), LRU eviction.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Response
+
+from app import schemas
+from app.core.config import settings
+
+_lock = threading.Lock()
+_data = OrderedDict()     # course_id -> (version, body, expires_at)
+_bytes = 0
+_hits = 0
+_misses = 0
+_evictions = 0
+
+
+def encode_course_detail(course) -> bytes:
+    return schemas.CourseDetailOut.from_orm(course).json().encode("utf-8")
+
+
+def as_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+
+def get(course_id: int, version: int):
+    global _hits, _misses
+    with _lock:
+        entry = _data.get(course_id)
+        if entry is None or entry[0] != version or entry[2] <= time.time():
+            _misses += 1
+            return None
+        _data.move_to_end(course_id)
+        _hits += 1
+        return entry[1]
+
+
+def _drop(course_id):
+    global _bytes
+    entry = _data.pop(course_id, None)
+    if entry is not None:
+        _bytes -= len(entry[1])
+
+
+def put(course_id: int, version: int, body: bytes):
+    global _bytes, _evictions
+    if len(body) > settings.COURSE_SNAPSHOT_MAX_BYTES:
+        return   # never worth evicting everything for one course
+    with _lock:
+        _drop(course_id)
+        _data[course_id] = (version, body, time.time() + settings.CATALOG_CACHE_TTL_SECONDS)
+        _bytes += len(body)
+        while _bytes > settings.COURSE_SNAPSHOT_MAX_BYTES:
+            oldest = next(iter(_data))
+            _drop(oldest)
+            _evictions += 1
+
+
+def discard(course_id: int):
+    with _lock:
+        _drop(course_id)
+
+
+def clear():
+    global _bytes
+    with _lock:
+        _data.clear()
+        _bytes = 0
+
+
+def stats() -> dict:
+    lookups = _hits + _misses
+    return {
+        "entries": len(_data),
+        "bytes": _bytes,
+        "max_bytes": settings.COURSE_SNAPSHOT_MAX_BYTES,
+        "hits": _hits,
+        "misses": _misses,
+        "evictions": _evictions,
+        "hit_ratio": round(_hits / lookups, 4) if lookups else 0.0,
+    }
@@ -1,12 +1,17 @@
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, lazyload, raiseload, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from app import models, schemas
-from sqlalchemy import func
+from sqlalchemy import case, func, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from passlib.context import CryptContext
 from datetime import datetime
 from fastapi import HTTPException, status
 from datetime import timezone
-from app.core import security
+from app.core import security, catalog_cache, pagination, answer_key_cache
+from app.services import course_sync, course_delete, progress_counters, preview_lessons, grading
 from slugify import slugify
+import re
 
 # creates a password hashing helper using the bcrypt algorithm
 # deprecated="auto" ensures compatibility with future versions, If I ever change hashing algorithms later, automatically treat the older ones as deprecated.
@@ -14,9 +19,9 @@ from slugify import slugify
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
-def create_user(db: Session, user: schemas.UserCreate):
-
-    hashed = security.hash_password(user.password)
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str = None):
+    # callers on the async path hash in the bcrypt pool and pass the result in
+    hashed = hashed_password or security.hash_password(user.password)
     db_user = models.User(email=user.email, full_name=user.full_name, hashed_password=hashed, is_educator=user.is_educator, is_google_account=False, created_at=datetime.now(timezone.utc))
     db.add(db_user); db.commit(); db.refresh(db_user)
     return db_user
@@ -24,58 +29,171 @@ def create_user(db: Session, user: schemas.UserCreate):
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
+# Login/signup lookups for the async auth routes: they read what bcrypt needs and end the
+# transaction, so the pooled connection is back in the pool while the caller awaits the hash pool.
+def get_login_credentials(db: Session, email: str):
+    """(id, hashed_password) for the email, or None."""
+    try:
+        return db.execute(
+            select(models.User.id, models.User.hashed_password).where(models.User.email == email)
+        ).first()
+    finally:
+        db.rollback()
+
+def email_registered(db: Session, email: str) -> bool:
+    try:
+        return db.execute(select(models.User.id).where(models.User.email == email)).first() is not None
+    finally:
+        db.rollback()
 
 
+
+# Course creation is one transaction with a fixed number of round trips, whatever the tree size:
+# slug lookup + INSERT course (in a savepoint), then one INSERT ... RETURNING per level that has rows
+# (sections, lessons, assessments, choices - course_sync.insert_tree), then COMMIT.
 def create_course(db: Session, course_in: schemas.CourseCreate):
-    course = models.Course(title=course_in.title, slug=course_in.slug, description=course_in.description,
+    course = models.Course(title=course_in.title, description=course_in.description,
                            is_udemy=course_in.is_udemy, udemy_url=course_in.udemy_url)
-    db.add(course); db.commit(); db.refresh(course)
-    # # Only create sections and lessons for non-udemy courses
-    if not course.is_udemy:
-
-        for s_idx, s in enumerate(course_in.sections or []):
-            sec = models.Section(course_id=course.id, title=s.title, order=s_idx)
-            db.add(sec); db.commit(); db.refresh(sec)
-            for l_idx, l in enumerate(s.lessons or []):
-                lesson = models.Lesson(section_id=sec.id, title=l.title, type=l.type,
-                                    youtube_url=l.youtube_url, pdf_url=l.pdf_url, order=l_idx)
-                db.add(lesson)
-            db.commit()
+    try:
+        add_course_with_unique_slug(db, course, course_in.title)
+        # # Only create sections and lessons for non-udemy courses
+        if not course.is_udemy:
+            sections = []
+            for s_idx, s in enumerate(course_in.sections or []):
+                sec = s.dict()
+                sec["order"] = s_idx
+                for l_idx, l in enumerate(sec.get("lessons") or []):
+                    l["order"] = l_idx
+                sections.append(sec)
+            course_sync.insert_tree(db, course.id, sections)
+            refresh_course_derived(db, [course.id])
+        catalog_cache.mark_changed(db, [course.id])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
     return course
 
-def list_courses(db: Session, skip=0, limit=50):
-    return db.query(models.Course).offset(skip).limit(limit).all()
-
-def list_public_courses(db: Session, skip=0, limit=50):
-    return (
-        db.query(models.Course)
-        .filter(models.Course.is_published == True)
-        .offset(skip)
+# Course listings are ordered newest first on (created_at, id), backed by ix_courses_created_at_id /
+# ix_courses_educator_created_at_id. Pass `cursor` (from pagination.next_cursor) for keyset paging:
+# Postgres seeks straight to the position instead of scanning and discarding `skip` rows.
+# skip/limit still work for old clients.
+def _course_list_order(query, cursor=None, skip=0):
+    if cursor:
+        created_at, course_id = pagination.decode_cursor(cursor)
+        query = query.filter(tuple_(models.Course.created_at, models.Course.id) < tuple_(created_at, course_id))
+    elif skip:
+        query = query.offset(skip)
+    return query.order_by(models.Course.created_at.desc(), models.Course.id.desc())
+
+def list_courses(db: Session, skip=0, limit=50, cursor=None):
+    return _course_list_order(db.query(models.Course), cursor, skip).limit(limit).all()
+
+def list_public_courses(db: Session, skip=0, limit=50, cursor=None):
+    query = db.query(models.Course).filter(models.Course.is_published == True)
+    return _course_list_order(query, cursor, skip).limit(limit).all()
+
+def list_instructor_courses(db, instructor_id, limit=None, cursor=None):
+    query = db.query(models.Course).filter(models.Course.educator_id == instructor_id)
+    query = _course_list_order(query, cursor)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+
+# --- async read helpers (hot read endpoints on the asyncpg engine) ---
+# List views never touch the course tree, so skip the selectin cascade on Course.sections.
+
+async def list_courses_async(db: AsyncSession, skip=0, limit=50, cursor=None):
+    query = _course_list_order(select(models.Course), cursor, skip)
+    result = await db.execute(query.options(raiseload(models.Course.sections)).limit(limit))
+    return result.scalars().all()
+
+async def search_courses_async(db: AsyncSession, q: str, limit=20):
+    """
+    Ranked full-text search over title (weight A) and description (weight B) using the
+    GIN-indexed courses.search_vector. When nothing matches (typos, partial words) fall back
+    to trigram similarity on the title, which ix_courses_title_trgm also serves from an index.
+    """
+    ts_query = func.websearch_to_tsquery("english", q)
+    rank = func.ts_rank_cd(models.Course.search_vector, ts_query)
+    result = await db.execute(
+        select(models.Course)
+        .filter(models.Course.is_published == True, models.Course.search_vector.op("@@")(ts_query))
+        .order_by(rank.desc(), models.Course.id.desc())
+        .options(raiseload(models.Course.sections))
         .limit(limit)
-        .all()
     )
+    courses = result.scalars().all()
+    if courses:
+        return courses
+
+    # `%` = similarity above pg_trgm.similarity_threshold (0.3 by default)
+    similarity = func.similarity(models.Course.title, q)
+    result = await db.execute(
+        select(models.Course)
+        .filter(models.Course.is_published == True, models.Course.title.op("%")(q))
+        .order_by(similarity.desc(), models.Course.id.desc())
+        .options(raiseload(models.Course.sections))
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+async def list_student_courses_async(db: AsyncSession, user_id: int):
+    result = await db.execute(
+        select(models.Course, models.Enrollment.progress_percent)
+        .join(models.Enrollment, models.Enrollment.course_id == models.Course.id)
+        .filter(models.Enrollment.user_id == user_id)
+        .options(raiseload(models.Course.sections))
+    )
+    return result.all()
 
-def list_instructor_courses(db, instructor_id):
-    return (
-        db.query(models.Course)
-        .filter(models.Course.educator_id == instructor_id)
-        .all()
+async def get_enrollment_progress_async(db: AsyncSession, user_id: int, course_id: int):
+    """progress_percent of the enrollment, or None when the user is not enrolled (one query)."""
+    result = await db.execute(
+        select(models.Enrollment.progress_percent)
+        .filter(models.Enrollment.user_id == user_id, models.Enrollment.course_id == course_id)
     )
+    row = result.first()
+    if row is None:
+        return None
+    return row[0] or 0.0
 
 
 
 # ---------- helper lookups ----------
+# Load the whole course tree with one query per level (selectin: WHERE parent_id IN (...)).
+# A joinedload chain here returned one row per choice - sections x lessons x assessments x choices -
+# repeating every course/section/lesson column on each row.
+def _course_tree_options():
+    return selectinload(models.Course.sections).selectinload(models.Section.lessons).selectinload(models.Lesson.assessments).selectinload(models.Assessment.choices)
+
 def get_course_by_id(db: Session, course_id: int):
-    return db.query(models.Course).options(
-        joinedload(models.Course.sections).joinedload(models.Section.lessons).joinedload(models.Lesson.assessments).joinedload(models.Assessment.choices)
-    ).filter(models.Course.id == course_id).first()
+    return db.query(models.Course).options(_course_tree_options()).filter(models.Course.id == course_id).first()
 
 
 #def get_course_by_id(db, course_id: int):
 #    return db.query(models.Course).get(course_id)
 
+def get_course_row_by_slug(db: Session, slug: str):
+    """The course row only; touching .sections raises instead of loading the tree."""
+    return db.query(models.Course).options(raiseload(models.Course.sections)).filter(models.Course.slug == slug).first()
+
 def get_course_by_slug(db: Session, slug: str):
-    return db.query(models.Course).filter(models.Course.slug == slug).first()
+    # same loader as get_course_by_id; choices would otherwise lazy-load once per assessment
+    return db.query(models.Course).options(_course_tree_options()).filter(models.Course.slug == slug).first()
+
+def get_course_educator_id(db: Session, course_id: int):
+    """educator_id of the course (single column, no tree), or None if the course does not exist."""
+    return db.query(models.Course.educator_id).filter(models.Course.id == course_id).scalar()
+
+def get_lesson_course_id(db: Session, lesson_id: int):
+    return (
+        db.query(models.Section.course_id)
+        .join(models.Lesson, models.Lesson.section_id == models.Section.id)
+        .filter(models.Lesson.id == lesson_id)
+        .scalar()
+    )
 
 def get_lesson(db: Session, lesson_id: int):
     return db.query(models.Lesson).get(lesson_id)
@@ -92,22 +210,32 @@ def is_user_enrolled(db: Session, user_id: int, course_id: int) -> bool:
     return e is not None
 
 def is_preview_lesson(db: Session, lesson_id: int) -> bool:
-    # find if lesson is first lesson of first section in its course
-    lesson = get_lesson(db, lesson_id)
-    if not lesson:
-        return False
-    # assuming Section.order and Lesson.order exist
-    first_section = db.query(models.Section).filter_by(course_id=lesson.section.course_id).order_by(models.Section.order).first()
-    if not first_section:
-        return False
-    first_lesson = db.query(models.Lesson).filter_by(section_id=first_section.id).order_by(models.Lesson.order).first()
-    return first_lesson and first_lesson.id == lesson_id
+    # first lesson of first section in its course = courses.preview_lesson_id (ix_courses_preview_lesson_id)
+    return db.query(select(models.Course.id).where(models.Course.preview_lesson_id == lesson_id).exists()).scalar()
+
+def get_first_lesson_for_course(db: Session, course_id: int):
+    """The course's preview lesson (with its assessments), or None for a course without lessons."""
+    return (
+        db.query(models.Lesson)
+        .join(models.Course, models.Course.preview_lesson_id == models.Lesson.id)
+        .filter(models.Course.id == course_id)
+        .options(selectinload(models.Lesson.assessments).selectinload(models.Assessment.choices))
+        .first()
+    )
+
+def refresh_course_derived(db: Session, course_ids):
+    """Call after changing a course's sections/lessons, before commit: counters, progress, preview lesson."""
+    progress_counters.refresh_courses(db, course_ids)
+    preview_lessons.refresh(db, course_ids)
 
 def enroll_user(db: Session, user_id: int, course_id: int):
     e = db.query(models.Enrollment).filter(models.Enrollment.user_id==user_id, models.Enrollment.course_id==course_id).first()
     if e:
         return e
-    e = models.Enrollment(user_id=user_id, course_id=course_id, progress_percent=0.0)
+    # a preview lesson may have been completed before enrolling
+    completed = completed_lessons_for_user(db, user_id, course_id)
+    e = models.Enrollment(user_id=user_id, course_id=course_id, completed_lessons=completed,
+                          progress_percent=progress_counters.course_progress_expr(completed, course_id))
     db.add(e); db.commit(); db.refresh(e)
     return e
 
@@ -123,7 +251,6 @@ def update_progress(db: Session, user_id: int, course_id: int, progress: float):
 
 def create_course_with_educator(db: Session, course_in: schemas.CourseCreate, educator_id: int):
     # create the course and set educator_id
-    slug = generate_unique_slug(db, course_in.title)
     # course = models.Course(title=course_in.title, slug=course_in.slug, description=course_in.description, is_udemy=course_in.is_udemy, udemy_url=course_in.udemy_url, educator_id=educator_id)
     
     #pricing rules
@@ -134,19 +261,23 @@ def create_course_with_educator(db: Session, course_in: schemas.CourseCreate, ed
         price_cents = course_in.price_cents if course_in.price_cents is not None else 0
         currency = course_in.currency if course_in.currency is not None else "INR"
 
-    course = models.Course(title=course_in.title, slug=slug, description=course_in.description, is_udemy=course_in.is_udemy, udemy_url=course_in.udemy_url, educator_id=educator_id, price_cents=price_cents, currency=currency)
-    
-    db.add(course)
-    db.commit()
-    db.refresh(course)
+    course = models.Course(title=course_in.title, description=course_in.description, is_udemy=course_in.is_udemy, udemy_url=course_in.udemy_url, educator_id=educator_id, price_cents=price_cents, currency=currency)
     
-    # create default section for self-hosted courses
-
-    if not course.is_udemy:
-        sec = models.Section(course_id=course.id, title="Introduction", order=0)
-        db.add(sec)
+    try:
+        # slug picked here; retried on a concurrent duplicate
+        add_course_with_unique_slug(db, course, course_in.title)
+
+        # self-hosted courses get their sections/lessons/assessments/choices in the same transaction,
+        # or a default section when none were sent (see the round-trip note above create_course)
+        if not course.is_udemy:
+            sections = [s.dict() for s in course_in.sections] if course_in.sections else [{"title": "Introduction", "order": 0}]
+            course_sync.insert_tree(db, course.id, sections)
+            refresh_course_derived(db, [course.id])
+        catalog_cache.mark_changed(db, [course.id])
         db.commit()
-        db.refresh(sec)
+    except Exception:
+        db.rollback()
+        raise
 
     # create sections/lessons if present
     #for s_idx, s in enumerate(course_in.sections or []):
@@ -190,15 +321,23 @@ def list_enrollments_for_course(db: Session, course_id: int):
 
 
 # --- Assessments / Choices ---
-def create_assessment(db: Session, a: schemas.AssessmentCreate):
+def create_assessment(db: Session, a: schemas.AssessmentCreate, choices=None):
+    # choices (dicts with text / is_correct / explanation) go in the same transaction, so the
+    # question is never visible - or its answer key cached - without them
     ass = models.Assessment(lesson_id=a.lesson_id, question_markdown=a.question_markdown,
                             image_url=a.image_url, max_score=a.max_score, explanation=a.explanation)
-    db.add(ass); db.commit(); db.refresh(ass)
+    ass.choices = [models.Choice(text=ch["text"], is_correct=ch.get("is_correct", False),
+                                 explanation=ch.get("explanation")) for ch in choices or []]
+    db.add(ass); db.flush()
+    answer_key_cache.mark_changed(db, [ass.id])
+    db.commit(); db.refresh(ass)
     return ass
 
 def add_choice(db: Session, assessment_id: int, text: str, is_correct: bool=False, explanation: str=None):
     ch = models.Choice(assessment_id=assessment_id, text=text, is_correct=is_correct, explanation=explanation)
-    db.add(ch); db.commit(); db.refresh(ch)
+    db.add(ch)
+    answer_key_cache.mark_changed(db, [assessment_id])
+    db.commit(); db.refresh(ch)
     return ch
 
 def get_assessments_for_lesson(db: Session, lesson_id: int):
@@ -212,12 +351,14 @@ def get_assessments_for_lesson(db: Session, lesson_id: int):
 
 # --- Attempts & student answers ---
 def create_assessment_attempt(db: Session, user_id: int, assessment_id: int):
-    # find last attempt number
-    last = db.query(func.max(models.AssessmentAttempt.attempt_number)).filter_by(user_id=user_id, assessment_id=assessment_id).scalar()
-    next_attempt = (last or 0) + 1
-    attempt = models.AssessmentAttempt(user_id=user_id, assessment_id=assessment_id, attempt_number=next_attempt)
-    db.add(attempt); db.commit(); db.refresh(attempt)
-    return attempt
+    # attempt number comes from the per-user counter in the same INSERT (safe under parallel submits)
+    try:
+        attempt_id = grading.insert_attempt(db, user_id, assessment_id).id
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return db.get(models.AssessmentAttempt, attempt_id)
 
 def record_student_answer_on_attempt(db: Session, attempt_id: int, choice_id: int):
     choice = db.query(models.Choice).get(choice_id)
@@ -266,21 +407,27 @@ def completed_lessons_for_user(db: Session, user_id: int, course_id: int) -> int
 
 
 def calculate_and_update_progress(db: Session, user_id: int, course_id: int):
-    total_lessons = course_total_lessons(db, course_id)
-    completed = completed_lessons_for_user(db, user_id, course_id)
-    progress = round((completed / total_lessons) * 100, 2) if total_lessons > 0 else 0.0
-    enrollment = db.query(models.Enrollment).filter_by(user_id=user_id, course_id=course_id).first()
+    # progress from the counters (enrollments.completed_lessons / courses.lesson_count), one UPDATE ... RETURNING;
+    # course_total_lessons / completed_lessons_for_user are the slow recount, kept for reconciliation
+    total_lessons = select(models.Course.lesson_count).where(models.Course.id == course_id).scalar_subquery()
+    progress = progress_counters.progress_expr(models.Enrollment.completed_lessons, total_lessons)
+    enrollment = db.execute(
+        update(models.Enrollment)
+        .where(models.Enrollment.user_id == user_id, models.Enrollment.course_id == course_id)
+        .values(
+            progress_percent=progress,
+            status=case((progress >= 100, "completed"), else_=models.Enrollment.status),
+        )
+        .returning(models.Enrollment.progress_percent)
+        .execution_options(synchronize_session=False)
+    ).first()
     if not enrollment:
         # in production we enforce enrollment; here ensure update only if exists
+        db.rollback()
         raise HTTPException(status_code=403, detail="Must enroll before accessing lessons")
-        
-    else:
-        enrollment.progress_percent = progress
-        if progress >= 100:
-            enrollment.status = "completed"
 
-    db.commit(); db.refresh(enrollment)
-    return progress
+    db.commit()
+    return enrollment.progress_percent
 
 def course_progress_percent(db: Session, user_id: int, course_id: int):
     e = db.query(models.Enrollment).filter(models.Enrollment.user_id==user_id, models.Enrollment.course_id==course_id).first()
@@ -289,15 +436,88 @@ def course_progress_percent(db: Session, user_id: int, course_id: int):
 def mark_lesson_completed(db, user_id: int, lesson_id: int):
     """
     Insert StudentLesson if not exists. Return the StudentLesson instance.
+    A new completion bumps enrollments.completed_lessons in the same transaction.
+    """
+    inserted = db.execute(
+        pg_insert(models.StudentLesson)
+        .values(user_id=user_id, lesson_id=lesson_id, completed_at=datetime.now(timezone.utc))
+        .on_conflict_do_nothing(index_elements=["user_id", "lesson_id"])
+        .returning(models.StudentLesson.lesson_id)
+    ).first()
+    if inserted:
+        lesson_course = (
+            select(models.Section.course_id)
+            .join(models.Lesson, models.Lesson.section_id == models.Section.id)
+            .where(models.Lesson.id == lesson_id)
+            .scalar_subquery()
+        )
+        db.execute(
+            update(models.Enrollment)
+            .where(models.Enrollment.user_id == user_id, models.Enrollment.course_id == lesson_course)
+            .values(completed_lessons=models.Enrollment.completed_lessons + 1)
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    return db.get(models.StudentLesson, (user_id, lesson_id))
+
+# --- Lesson-complete hot path: one context query, then one insert+progress statement ---
+def get_lesson_complete_context(db: Session, user_id: int, course_id: int, lesson_id: int):
+    """
+    Everything POST .../lessons/{lesson_id}/complete checks, in one query.
+    Returns None if the course doesn't exist, else a row with
+      lesson_course_id (None if the lesson doesn't exist), is_preview, is_enrolled.
     """
-    existing = db.query(models.StudentLesson).filter_by(user_id=user_id, lesson_id=lesson_id).first()
-    if existing:
-        return existing
-    sl = models.StudentLesson(user_id=user_id, lesson_id=lesson_id)
-    db.add(sl)
+    lesson_course_id = (
+        select(models.Section.course_id)
+        .join(models.Lesson, models.Lesson.section_id == models.Section.id)
+        .where(models.Lesson.id == lesson_id)
+        .scalar_subquery()
+    )
+    enrolled = (
+        select(models.Enrollment.id)
+        .where(models.Enrollment.user_id == user_id, models.Enrollment.course_id == course_id)
+        .exists()
+    )
+    return db.execute(
+        select(
+            lesson_course_id.label("lesson_course_id"),
+            func.coalesce(models.Course.preview_lesson_id == lesson_id, False).label("is_preview"),
+            enrolled.label("is_enrolled"),
+        ).where(models.Course.id == course_id)
+    ).first()
+
+def complete_lesson(db: Session, user_id: int, course_id: int, lesson_id: int) -> float:
+    """
+    mark_lesson_completed + calculate_and_update_progress as a single statement:
+      WITH ins AS (INSERT INTO student_lessons ... ON CONFLICT DO NOTHING RETURNING ...)
+      UPDATE enrollments SET completed_lessons = completed_lessons + (SELECT count(*) FROM ins), progress_percent = ...
+    The completion is kept even without an enrollment (preview lesson), then 403 like before.
+    """
+    inserted = (
+        pg_insert(models.StudentLesson)
+        .values(user_id=user_id, lesson_id=lesson_id, completed_at=datetime.now(timezone.utc))
+        .on_conflict_do_nothing(index_elements=["user_id", "lesson_id"])
+        .returning(models.StudentLesson.lesson_id)
+        .cte("inserted")
+    )
+    completed = models.Enrollment.completed_lessons + select(func.count()).select_from(inserted).scalar_subquery()
+    total_lessons = select(models.Course.lesson_count).where(models.Course.id == course_id).scalar_subquery()
+    progress = progress_counters.progress_expr(completed, total_lessons)
+    enrollment = db.execute(
+        update(models.Enrollment)
+        .where(models.Enrollment.user_id == user_id, models.Enrollment.course_id == course_id)
+        .values(
+            completed_lessons=completed,
+            progress_percent=progress,
+            status=case((progress >= 100, "completed"), else_=models.Enrollment.status),
+        )
+        .returning(models.Enrollment.progress_percent)
+        .execution_options(synchronize_session=False)
+    ).first()
     db.commit()
-    db.refresh(sl)
-    return sl
+    if not enrollment:
+        raise HTTPException(status_code=403, detail="Must enroll before accessing lessons")
+    return enrollment.progress_percent
 
 def completed_lesson_ids_for_user(db: Session, user_id: int, course_id: int) -> list[int]:
     lesson_ids = (
@@ -314,16 +534,70 @@ def completed_lesson_ids_for_user(db: Session, user_id: int, course_id: int) ->
 # ---------- Upsert helpers (create or update) ----------
 
 
-def generate_unique_slug(db, title):
-    base = slugify(title)
-    slug = base
-    counter = 1
-
-    while db.query(models.Course).filter(models.Course.slug == slug).first():
-        slug = f"{base}-{counter}"
-        counter += 1
+SLUG_INSERT_ATTEMPTS = 5
+# the -N suffixes we hand out; a longer or zero-padded number (python-basics-2024) is part of
+# someone's title, not a counter, and must not push the next counter to 2025
+SLUG_COUNTER = re.compile(r"[1-9][0-9]{0,2}")
 
-    return slug
+def generate_unique_slug(db, title):
+    """
+    `base` if free, else `base-N` with N one past the highest suffix in use.
+    One prefix query (served by ix_courses_slug_pattern) however many collisions the title has.
+    Concurrent creators can still pick the same slug; add_course_with_unique_slug retries on that.
+    """
+    return generate_unique_slugs(db, [slugify(title)])[0]
+
+def generate_unique_slugs(db, bases):
+    """generate_unique_slug for a batch of already-slugified bases, still one query; repeated bases get distinct slugs."""
+    unique_bases = sorted(set(bases))
+    # slugify only emits [a-z0-9-], so the bases need no LIKE escaping
+    taken = set(db.execute(
+        select(models.Course.slug).where(or_(
+            models.Course.slug.in_(unique_bases),
+            *[models.Course.slug.like(f"{base}-%") for base in unique_bases],
+        ))
+    ).scalars().all())
+
+    highest = {}
+    for slug in taken:
+        for base in unique_bases:
+            suffix = slug[len(base) + 1:]
+            if slug.startswith(base + "-") and SLUG_COUNTER.fullmatch(suffix):
+                highest[base] = max(highest.get(base, 0), int(suffix))
+
+    slugs = []
+    for base in bases:
+        if base not in taken:
+            slug = base
+        else:
+            slug = None
+            while slug is None or slug in taken:
+                highest[base] = highest.get(base, 0) + 1
+                slug = f"{base}-{highest[base]}"
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+def is_slug_violation(exc: IntegrityError) -> bool:
+    constraint = getattr(getattr(exc.orig, "diag", None), "constraint_name", None)
+    return constraint == "ix_courses_slug" or (constraint is None and "ix_courses_slug" in str(exc.orig))
+
+def add_course_with_unique_slug(db: Session, course: models.Course, title: str):
+    """
+    Insert course with a fresh slug inside a savepoint; if another request took the same slug
+    in the meantime, roll back just the savepoint and try the next one.
+    """
+    for attempt in range(SLUG_INSERT_ATTEMPTS):
+        course.slug = generate_unique_slug(db, title)
+        try:
+            with db.begin_nested():
+                db.add(course)
+                db.flush()
+            return course
+        except IntegrityError as exc:
+            if not is_slug_violation(exc) or attempt == SLUG_INSERT_ATTEMPTS - 1:
+                raise
+    return course
 
 
 
@@ -343,6 +617,7 @@ def _upsert_choice(db: Session, assessment: models.Assessment, choice_in: dict):
         ch = models.Choice(assessment_id=assessment.id, text=choice_in["text"], is_correct=choice_in.get("is_correct", False), explanation=choice_in.get("explanation"))
         db.add(ch)
     db.flush()
+    answer_key_cache.mark_changed(db, [assessment.id, ch.assessment_id])
     return ch
 
 def _upsert_assessment(db: Session, lesson: models.Lesson, ass_in: dict):
@@ -372,108 +647,26 @@ def _upsert_assessment(db: Session, lesson: models.Lesson, ass_in: dict):
 
     # Sync choices: incoming choices are the desired final set. We'll upsert by id and delete any choices not present.
     incoming_choice_ids = []
-    for ch_in in ass_in.get("choices", []):
+    for ch_in in ass_in.get("choices") or []:
         ch = _upsert_choice(db, ass, ch_in)
         incoming_choice_ids.append(ch.id)
 
     # delete choices not in incoming set
     existing_choice_ids = [c.id for c in ass.choices]
-    for rid in existing_choice_ids:
-        if rid not in incoming_choice_ids:
-            db.query(models.Choice).filter_by(id=rid).delete()
+    course_delete.delete_subtree(db, choice_ids=[rid for rid in existing_choice_ids if rid not in incoming_choice_ids])
 
     db.flush()
+    answer_key_cache.mark_changed(db, [ass.id])
     return ass
 
-def _upsert_lesson(db: Session, section: models.Section, lesson_in: dict):
-    if lesson_in.get("id"):
-        lesson = db.query(models.Lesson).get(lesson_in["id"])
-        if not lesson:
-            lesson = models.Lesson(section_id=section.id,
-                                   title=lesson_in["title"],
-                                   type=lesson_in["type"],
-                                   youtube_url=lesson_in.get("youtube_url"),
-                                   pdf_url=lesson_in.get("pdf_url"),
-                                   order=lesson_in.get("order", 0))
-            db.add(lesson)
-            db.flush()
-        else:
-            lesson.title = lesson_in["title"]
-            lesson.type = lesson_in["type"]
-            lesson.youtube_url = lesson_in.get("youtube_url")
-            lesson.pdf_url = lesson_in.get("pdf_url")
-            lesson.order = lesson_in.get("order", lesson.order if hasattr(lesson, "order") else 0)
-    else:
-        lesson = models.Lesson(section_id=section.id,
-                               title=lesson_in["title"],
-                               type=lesson_in["type"],
-                               youtube_url=lesson_in.get("youtube_url"),
-                               pdf_url=lesson_in.get("pdf_url"),
-                               order=lesson_in.get("order", 0))
-        db.add(lesson)
-        db.flush()
-
-    # Sync assessments
-    incoming_assessment_ids = []
-    for ass_in in lesson_in.get("assessments", []):
-        ass = _upsert_assessment(db, lesson, ass_in)
-        incoming_assessment_ids.append(ass.id)
-
-    # delete assessments not in incoming set
-    existing_ass_ids = [a.id for a in lesson.assessments]
-    for rid in existing_ass_ids:
-        if rid not in incoming_assessment_ids:
-            # delete related student attempts/answers first (safe cleanup)
-            db.query(models.StudentAnswer).filter(models.StudentAnswer.choice_id.in_(
-                db.query(models.Choice.id).filter(models.Choice.assessment_id == rid)
-            )).delete(synchronize_session=False)
-            db.query(models.AssessmentAttempt).filter_by(assessment_id=rid).delete()
-            db.query(models.Choice).filter_by(assessment_id=rid).delete()
-            db.query(models.Assessment).filter_by(id=rid).delete()
-
-    db.flush()
-    return lesson
-
-def _upsert_section(db: Session, course: models.Course, section_in: dict):
-    if section_in.get("id"):
-        sec = db.query(models.Section).get(section_in["id"])
-        if not sec:
-            sec = models.Section(course_id=course.id, title=section_in["title"], order=section_in.get("order", 0))
-            db.add(sec)
-            db.flush()
-        else:
-            sec.title = section_in["title"]
-            sec.order = section_in.get("order", sec.order if hasattr(sec, "order") else 0)
-    else:
-        sec = models.Section(course_id=course.id, title=section_in["title"], order=section_in.get("order", 0))
-        db.add(sec)
-        db.flush()
-
-    incoming_lesson_ids = []
-    for lesson_in in section_in.get("lessons", []):
-        l = _upsert_lesson(db, sec, lesson_in)
-        incoming_lesson_ids.append(l.id)
-
-    # delete lessons not in incoming set (and cascade delete assessments/attempts)
-    existing_lesson_ids = [l.id for l in sec.lessons]
-    for rid in existing_lesson_ids:
-        if rid not in incoming_lesson_ids:
-            # delete student lesson completions
-            db.query(models.StudentLesson).filter_by(lesson_id=rid).delete()
-            # delete assessments under lesson (handled in _upsert_lesson when removing assessments)
-            db.query(models.Lesson).filter_by(id=rid).delete()
-
-    db.flush()
-    return sec
-
-
 # ---------- Top-level course updater ----------
 def update_course_full(db: Session, course_id: int, course_in: dict, educator_id: int):
     """
     course_in: dict representation (matching CourseCreate/CourseUpdate schema)
     This function synchronizes DB to reflect course_in. Atomic.
+    The tree is diffed in memory and written with set-based statements (app/services/course_sync.py).
     """
-    course = db.query(models.Course).get(course_id)
+    course = db.query(models.Course).options(lazyload(models.Course.sections)).get(course_id)
     if not course:
         return None
 
@@ -481,45 +674,27 @@ def update_course_full(db: Session, course_id: int, course_in: dict, educator_id
     if course.educator_id != educator_id:
         raise PermissionError("Not allowed. You are not the educator of this course.")
 
-    # Begin transaction for atomicity
-    with db.begin():
-        # Update course meta
-        course.title = course_in.get("title", course.title)
-        course.slug = course_in.get("slug", course.slug)
-        course.description = course_in.get("description", course.description)
-        course.is_udemy = course_in.get("is_udemy", course.is_udemy)
-        course.udemy_url = course_in.get("udemy_url", course.udemy_url)
-
-        # Sync sections
-        incoming_section_ids = []
-        for sec_in in course_in.get("sections", []):
-            sec = _upsert_section(db, course, sec_in)
-            incoming_section_ids.append(sec.id)
-
-        # delete sections not in incoming set
-        existing_section_ids = [s.id for s in course.sections]
-        for rid in existing_section_ids:
-            if rid not in incoming_section_ids:
-                # delete lessons & assessments recursively
-                # delete student progress for lessons in this section
-                lesson_ids = [l.id for l in db.query(models.Lesson).filter_by(section_id=rid).all()]
-                for lid in lesson_ids:
-                    db.query(models.StudentLesson).filter_by(lesson_id=lid).delete()
-                    # delete attempts and choices and assessments
-                    ass_ids = [a.id for a in db.query(models.Assessment).filter_by(lesson_id=lid).all()]
-                    for aid in ass_ids:
-                        db.query(models.StudentAnswer).filter_by(attempt_id=aid).delete()
-                    db.query(models.AssessmentAttempt).filter(models.AssessmentAttempt.assessment_id.in_(ass_ids)).delete()
-                    db.query(models.Choice).filter(models.Choice.assessment_id.in_(ass_ids)).delete()
-                    db.query(models.Assessment).filter_by(lesson_id=lid).delete()
-                db.query(models.Lesson).filter_by(section_id=rid).delete()
-                db.query(models.Section).filter_by(id=rid).delete()
-
+    try:
+        # Update course meta (same rules as the tree: None clears only the nullable columns)
+        for field in ("title", "slug", "description", "is_udemy", "udemy_url"):
+            if field not in course_in:
+                continue
+            value = course_in[field]
+            if value is not None or field in course_sync.CLEARABLE_FIELDS:
+                setattr(course, field, value)
         db.flush()
 
-    # Refresh and return full course detail
-    db.refresh(course)
-    return get_course_by_id(db, course_id)  # returns joined load nested object
+        course_sync.sync_course_tree(db, course_id, course_in.get("sections"))
+        refresh_course_derived(db, [course_id])
+        catalog_cache.mark_changed(db, [course_id])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    # bulk statements bypass the identity map, so drop what this session holds before reloading
+    db.expire_all()
+    return get_course_by_id(db, course_id)  # returns the nested object
 
 def create_default_section(db: Session, course_id: int, title: str = "Section 1"):
     """Create and return a default/first section for course if none exists."""
@@ -552,62 +727,37 @@ def create_lesson_simple(db: Session, course_id: int, lesson_in: dict):
     lesson = models.Lesson(
         section_id=section.id,
         title=lesson_in.get("title"),
-        type=lesson_in.get("type", "video"),
+        type=lesson_in.get("type") or "video",
         youtube_url=lesson_in.get("youtube_url"),
         pdf_url=lesson_in.get("pdf_url"),
-        order=lesson_in.get("order", 0)
+        order=lesson_in.get("order") or 0
     )
     db.add(lesson)
     db.flush()
 
     # Optional: create assessments if provided (use your existing _upsert_assessment or create_assessment)
-    for ass_in in lesson_in.get("assessments", []):
+    for ass_in in lesson_in.get("assessments") or []:
         # Use your existing upsert helper if it is accessible here
         # If the helper is private (prefixed with _), you can call it:
         ass = _upsert_assessment(db, lesson, ass_in)  # reuse existing helper
         # _upsert_assessment flushes and returns the assessment
 
     db.flush()
+    refresh_course_derived(db, [course_id])
+    catalog_cache.mark_changed(db, [course_id])   # applied when the caller commits
     return lesson
 
 def delete_lesson_simple(db: Session, lesson_id: int):
     """
-    Delete a lesson and cascade-clean related entities:
-    - StudentLesson (progress)
-    - AssessmentAttempt and StudentAnswer
-    - Choice and Assessment
+    Delete a lesson. Progress (StudentLesson), assessments, choices, attempts and answers
+    go with it through the ON DELETE CASCADE foreign keys (app/services/course_delete.py).
     """
-    # delete student lesson completions
-    db.query(models.StudentLesson).filter_by(lesson_id=lesson_id).delete(synchronize_session=False)
-
-    # gather associated assessment ids
-    ass_ids = [a.id for a in db.query(models.Assessment).filter_by(lesson_id=lesson_id).all()]
+    course_id = get_lesson_course_id(db, lesson_id)
 
-    if ass_ids:
-        # student answers referencing choices/attempts
-        # delete StudentAnswer rows referencing attempts for safety
-        # first delete answers that reference attempts (attempts will be deleted next)
-        # note: your existing code sometimes did StudentAnswer.filter(attempt_id==aid) - consistent approach:
-        db.query(models.StudentAnswer).filter(models.StudentAnswer.attempt_id.in_(
-            db.query(models.AssessmentAttempt.id).filter(models.AssessmentAttempt.assessment_id.in_(ass_ids))
-        )).delete(synchronize_session=False)
-
-        # delete AssessmentAttempt rows
-        db.query(models.AssessmentAttempt).filter(models.AssessmentAttempt.assessment_id.in_(ass_ids)).delete(synchronize_session=False)
-
-        # delete StudentAnswer rows that reference choice ids (if any remain)
-        db.query(models.StudentAnswer).filter(models.StudentAnswer.choice_id.in_(
-            db.query(models.Choice.id).filter(models.Choice.assessment_id.in_(ass_ids))
-        )).delete(synchronize_session=False)
-
-        # delete choice rows
-        db.query(models.Choice).filter(models.Choice.assessment_id.in_(ass_ids)).delete(synchronize_session=False)
-
-        # delete assessment rows
-        db.query(models.Assessment).filter(models.Assessment.id.in_(ass_ids)).delete(synchronize_session=False)
-
-    # finally delete lesson
-    db.query(models.Lesson).filter_by(id=lesson_id).delete(synchronize_session=False)
+    course_delete.delete_lessons(db, [lesson_id])
+    if course_id is not None:
+        refresh_course_derived(db, [course_id])
+        catalog_cache.mark_changed(db, [course_id])   # applied when the caller commits
 
     db.flush()
     return True
@@ -623,6 +773,7 @@ def update_course_structure(db, course_id, sections, instructor_id):
 
     existing_sections = {s.id: s for s in course.sections}
     seen_section_ids = set()
+    removed_lesson_ids = []
 
     for sec in sections:
         if sec.id and sec.id in existing_sections:
@@ -665,15 +816,15 @@ def update_course_structure(db, course_id, sections, instructor_id):
 
             seen_lesson_ids.add(lesson.id)
 
-        # delete removed lessons
-        for lid, lesson in existing_lessons.items():
-            if lid not in seen_lesson_ids:
-                db.delete(lesson)
+        # removed lessons
+        removed_lesson_ids.extend(lid for lid in existing_lessons if lid not in seen_lesson_ids)
 
-    # delete removed sections
-    for sid, section in existing_sections.items():
-        if sid not in seen_section_ids:
-            db.delete(section)
+    # removed sections; one statement per level, the database cascades the rest
+    removed_section_ids = [sid for sid in existing_sections if sid not in seen_section_ids]
+    course_delete.delete_subtree(db, section_ids=removed_section_ids, lesson_ids=removed_lesson_ids)
+    db.flush()
+    refresh_course_derived(db, [course_id])
+    catalog_cache.mark_changed(db, [course_id])
 
     db.commit()
     return {"ok": True}
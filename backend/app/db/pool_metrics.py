@@ -0,0 +1,162 @@
+"""
+Connection pool telemetry + the checkout pre-ping strategy.
+
+Every engine created in app/db/sessions.py is registered here. We collect:
+  - checkout wait time histogram (time spent inside the pool waiting for a connection)
+  - in-use / idle gauges and current overflow, read live from the pool
+  - counters: checkouts, overflow checkouts, timeouts, new connections, invalidations, pings
+Snapshots are served by GET /internal/metrics (app/routes/metrics.py).
+"""
+import threading
+import time
+
+from sqlalchemy import event, exc
+
+# upper bounds in seconds; the last bucket is +Inf
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PRE_PING_STRATEGIES = ("always", "idle", "never")
+
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self.engine = None
+        self._lock = threading.Lock()
+        self.bucket_counts = [0] * (len(WAIT_BUCKETS) + 1)
+        self.wait_count = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.checkouts = 0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.pings = 0
+        self.ping_failures = 0
+
+    def observe_wait(self, seconds: float, overflow: bool):
+        idx = len(WAIT_BUCKETS)
+        for i, bound in enumerate(WAIT_BUCKETS):
+            if seconds <= bound:
+                idx = i
+                break
+        with self._lock:
+            self.bucket_counts[idx] += 1
+            self.wait_count += 1
+            self.wait_sum += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self.checkouts += 1
+            if overflow:
+                self.overflow_checkouts += 1
+
+    def snapshot(self) -> dict:
+        pool = self.engine.pool if self.engine is not None else None
+        gauges = {}
+        if pool is not None and hasattr(pool, "checkedout"):
+            gauges = {
+                "size": pool.size(),
+                "in_use": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+            }
+        # cumulative buckets, prometheus style
+        buckets, running = {}, 0
+        for bound, count in zip(list(WAIT_BUCKETS) + ["+Inf"], self.bucket_counts):
+            running += count
+            buckets[str(bound)] = running
+        return {
+            **gauges,
+            "checkouts": self.checkouts,
+            "overflow_checkouts": self.overflow_checkouts,
+            "timeouts": self.timeouts,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "pings": self.pings,
+            "ping_failures": self.ping_failures,
+            "checkout_wait_seconds": {
+                "count": self.wait_count,
+                "sum": round(self.wait_sum, 6),
+                "max": round(self.wait_max, 6),
+                "buckets": buckets,
+            },
+        }
+
+
+_registry = {}
+
+
+class _TimedCheckoutMixin:
+    """Times QueuePool._do_get, i.e. the wait for a free (or new) connection."""
+
+    _lms_metrics = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        overflow_before = self.overflow()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self._lms_metrics.timeouts += 1
+            raise
+        # overflow() counts every connection opened beyond pool_size; it only grows when this
+        # checkout had to open one (reading it alone would tag every checkout made while others hold overflow)
+        overflow_after = self.overflow()
+        opened_overflow = overflow_after > 0 and overflow_after > overflow_before
+        self._lms_metrics.observe_wait(time.perf_counter() - start, overflow=opened_overflow)
+        return conn
+
+
+def timed_pool_class(base, metrics: PoolMetrics):
+    # a class per engine: pool.recreate() (engine.dispose) builds self.__class__, so the link survives
+    return type(f"Timed{base.__name__}_{metrics.name}", (_TimedCheckoutMixin, base), {"_lms_metrics": metrics})
+
+
+def new_metrics(name: str) -> PoolMetrics:
+    metrics = PoolMetrics(name)
+    _registry[name] = metrics
+    return metrics
+
+
+def instrument_engine(engine, metrics: PoolMetrics, pre_ping: str = "always", idle_seconds: int = 30):
+    """
+    Attach pool event listeners to a sync Engine (for async engines pass engine.sync_engine).
+    pre_ping="idle" pings only connections that sat unused for more than idle_seconds,
+    so hot connections skip the extra round trip that pool_pre_ping=True costs on every checkout.
+    """
+    metrics.engine = engine
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.connects += 1
+        connection_record.info["last_checkin"] = time.monotonic()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        connection_record.info["last_checkin"] = time.monotonic()
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.invalidations += 1
+
+    if pre_ping == "idle":
+        @event.listens_for(engine, "checkout")
+        def _ping_if_idle(dbapi_connection, connection_record, connection_proxy):
+            last = connection_record.info.get("last_checkin")
+            if last is not None and time.monotonic() - last < idle_seconds:
+                return
+            metrics.pings += 1
+            try:
+                cursor = dbapi_connection.cursor()
+                cursor.execute("SELECT 1")
+                cursor.close()
+            except Exception:
+                metrics.ping_failures += 1
+                # tells the pool to discard this connection and retry with a fresh one
+                raise exc.DisconnectionError()
+
+    return engine
+
+
+def snapshot() -> dict:
+    return {name: m.snapshot() for name, m in _registry.items()}
@@ -0,0 +1,45 @@
+"""
+Read-replica routing.
+
+A RoutingSession sends plain SELECTs to a replica when the session was opened for a
+read-only request (session.info["use_replica"], set by get_db/get_async_db), and
+everything else - flushes, INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE - to the primary.
+With no replicas configured it always returns the primary, i.e. a normal Session.
+"""
+import random
+
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+# set after a successful write so the same browser keeps reading from the primary for a while
+READ_YOUR_WRITES_COOKIE = "lms_rw"
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class RoutingSession(Session):
+    primary_bind = None
+    replica_binds = ()
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            self.replica_binds
+            and self.info.get("use_replica")
+            and not self._flushing
+            and isinstance(clause, Select)
+            and clause._for_update_arg is None
+        ):
+            return random.choice(self.replica_binds)
+        return self.primary_bind
+
+
+def routing_session_class(primary, replicas):
+    """Build a RoutingSession subclass bound to these (sync) engines."""
+    return type("RoutingSession", (RoutingSession,), {"primary_bind": primary, "replica_binds": tuple(replicas)})
+
+
+def wants_replica(request) -> bool:
+    # only idempotent requests from clients that have not written recently
+    if request is None or request.method not in SAFE_METHODS:
+        return False
+    return not request.cookies.get(READ_YOUR_WRITES_COOKIE)
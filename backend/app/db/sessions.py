@@ -1,7 +1,13 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from app.core.config import settings
 from app.db.base import Base
+from app.db import pool_metrics
+from app.db.routing import routing_session_class, wants_replica
+from fastapi import Request
 
 
 
@@ -12,21 +18,90 @@ from app.db.base import Base
 # settings → Loads DATABASE_URL from .env
 
 # engine = actual connection to database
-# pool_pre_ping=True → checks DB connection is alive before using (avoids stale connections)
+# pool sizing / recycle / pre-ping strategy come from settings (DB_POOL_*)
+# DB_POOL_PRE_PING: "always" → ping on every checkout (pool_pre_ping=True)
+#                   "idle"   → ping only connections idle longer than DB_POOL_PRE_PING_IDLE_SECONDS
+#                   "never"  → rely on DB_POOL_RECYCLE and error-time invalidation
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+def _engine_kwargs(metrics, base_pool_class) -> dict:
+    if settings.DB_POOL_PRE_PING not in pool_metrics.PRE_PING_STRATEGIES:
+        raise ValueError(f"DB_POOL_PRE_PING must be one of {pool_metrics.PRE_PING_STRATEGIES}")
+    return dict(
+        poolclass=pool_metrics.timed_pool_class(base_pool_class, metrics),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING == "always",
+    )
+
+def _instrument(sync_engine, metrics):
+    return pool_metrics.instrument_engine(
+        sync_engine, metrics,
+        pre_ping=settings.DB_POOL_PRE_PING,
+        idle_seconds=settings.DB_POOL_PRE_PING_IDLE_SECONDS,
+    )
+
+_primary_metrics = pool_metrics.new_metrics("primary")
+engine = create_engine(settings.DATABASE_URL, **_engine_kwargs(_primary_metrics, QueuePool))
+_instrument(engine, _primary_metrics)
+
+# --- read replicas (optional) ---
+# DATABASE_REPLICA_URLS empty → every session talks to the primary, exactly as before.
+replica_engines = []
+for _i, _url in enumerate(settings.DATABASE_REPLICA_URLS):
+    _m = pool_metrics.new_metrics(f"replica_{_i}")
+    replica_engines.append(_instrument(create_engine(_url, **_engine_kwargs(_m, QueuePool)), _m))
 
 # SessionLocal() will give a database session object
 # autocommit=False → you must explicitly commit changes
 # autoflush=False → session won’t automatically push pending changes until commit
-# bind=engine → connects session to our DB engine
+# class_ → RoutingSession: reads of read-only requests go to a replica, writes to the primary (app/db/routing.py)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, class_=routing_session_class(engine, replica_engines))
 
 # simple dependency for FastAPI endpoints
-def get_db():
+def get_db(request: Request = None):
     db = SessionLocal()
+    db.info["use_replica"] = wants_replica(request)
     try:
         yield db
     finally:
         db.close()
+
+
+# --- async engine (asyncpg) ---
+# Lives next to the sync engine; only the hot read endpoints use it, everything else stays sync.
+# ASYNC_DATABASE_URL / ASYNC_DATABASE_REPLICA_URLS are optional: by default we reuse the sync URLs with the asyncpg driver.
+def _asyncpg_url(url: str) -> str:
+    return make_url(url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+def _async_database_url() -> str:
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    return _asyncpg_url(settings.DATABASE_URL)
+
+_primary_async_metrics = pool_metrics.new_metrics("primary_async")
+async_engine = create_async_engine(_async_database_url(), **_engine_kwargs(_primary_async_metrics, AsyncAdaptedQueuePool))
+_instrument(async_engine.sync_engine, _primary_async_metrics)
+
+async_replica_engines = []
+for _i, _url in enumerate(settings.ASYNC_DATABASE_REPLICA_URLS or [_asyncpg_url(u) for u in settings.DATABASE_REPLICA_URLS]):
+    _m = pool_metrics.new_metrics(f"replica_{_i}_async")
+    _e = create_async_engine(_url, **_engine_kwargs(_m, AsyncAdaptedQueuePool))
+    _instrument(_e.sync_engine, _m)
+    async_replica_engines.append(_e)
+
+# expire_on_commit=False → objects stay readable after commit (no implicit IO in async code)
+# routing happens on the sync Session underneath, so it is handed the engines' sync_engine
+AsyncSessionLocal = async_sessionmaker(
+    class_=AsyncSession,
+    sync_session_class=routing_session_class(async_engine.sync_engine, [e.sync_engine for e in async_replica_engines]),
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+async def get_async_db(request: Request = None):
+    async with AsyncSessionLocal() as db:
+        db.info["use_replica"] = wants_replica(request)
+        yield db
@@ -1,10 +1,11 @@
 """
 FastAPI app factory. Register routers here.
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.db.sessions import engine, Base
+from app.db.routing import READ_YOUR_WRITES_COOKIE, SAFE_METHODS
 
 # Routers:
 from app.routes import auth
@@ -14,6 +15,8 @@ from app.routes.public import router as public_router
 from app.routes.logs import router as logs_router
 from app.routes.enrollment import router as enrollment_router
 from app.routes.feedback import router as feedback_router
+from app.routes.metrics import router as metrics_router
+from app.services import grading_queue
 #feedback
 
 def create_app():
@@ -28,9 +31,27 @@ def create_app():
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     #allow_methods=["*"],
     allow_headers=["Authorization", "Content-Type", "Accept", "X-CSRF-Token", "X-Requested-With", "Cookie"],
-    expose_headers=["Set-Cookie"],
+    expose_headers=["Set-Cookie", "X-Next-Cursor"],
     )
 
+    # Read-your-writes: after a successful write, pin this client to the primary for a few seconds
+    # so e.g. a student who just enrolled sees the enrollment even if the replica lags.
+    if settings.DATABASE_REPLICA_URLS:
+        @app.middleware("http")
+        async def read_your_writes(request: Request, call_next):
+            response = await call_next(request)
+            if request.method not in SAFE_METHODS and response.status_code < 400:
+                response.set_cookie(
+                    key=READ_YOUR_WRITES_COOKIE,
+                    value="1",
+                    max_age=settings.READ_YOUR_WRITES_SECONDS,
+                    httponly=True,
+                    secure=settings.COOKIE_SECURE,
+                    samesite=settings.COOKIE_SAMESITE,
+                    path="/",
+                )
+            return response
+
     # Create DB tables automatically in dev (for MVP simplicity)
     #Base.metadata.create_all(bind=engine)
 
@@ -58,11 +79,23 @@ def create_app():
     #app.include_router(assessments.router, prefix="/api/v1/assessments", tags=["assessments"])
     app.include_router(feedback_router, prefix="/api/v1/feedback", tags=["feedback"])
 
+    # Internal telemetry (pool stats, cache hit ratios) - keep off the public API prefix
+    app.include_router(metrics_router, prefix="/internal", tags=["internal"])
+
     # For Future extension
     # app.include_router(admin_router, prefix="/admin", tags=["admin"])
     # app.include_router(payments_router, prefix="/payments", tags=["payments"])
 
 
+    # background graders for /students/assessments/{id}/submit-async (GRADING_WORKERS=0 disables)
+    @app.on_event("startup")
+    def start_grading_workers():
+        grading_queue.start_workers()
+
+    @app.on_event("shutdown")
+    def stop_grading_workers():
+        grading_queue.stop_workers()
+
     @app.get("/healthz")
     def health():
         return {"status": "ok"}
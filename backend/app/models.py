@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, text, Float, UniqueConstraint
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, text, Float, UniqueConstraint, Index, Computed
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy import DateTime, func
 from datetime import datetime, timezone
 from app.db.base import Base
@@ -45,35 +46,58 @@ class Course(Base):
     currency = Column(String(3), default="INR", nullable=False)
      # optional
     is_published = Column(Boolean, default=True)
+    # maintained by app/services/progress_counters.py
+    lesson_count = Column(Integer, default=0, server_default="0", nullable=False)
+    # first lesson, open without enrollment; maintained by app/services/preview_lessons.py
+    preview_lesson_id = Column(Integer, ForeignKey("lessons.id", ondelete="SET NULL", use_alter=True, name="courses_preview_lesson_id_fkey"), nullable=True, index=True)
     #created_at = Column(DateTime(timezone=True), default=datetime.now(timezone.utc))
     #created_at = Column(DateTime(timezone=True), server_default=func.now())
     created_at = Column(DateTime(timezone=True), server_default=text("NOW()"))
     updated_at = Column(DateTime(timezone=True), default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
 
+    # full-text search document, maintained by Postgres on every insert/update (generated column).
+    # deferred → never loaded unless asked for; it only exists for the GIN index.
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')",
+        persisted=True,
+    )))
+
+    __table_args__ = (
+        # keyset pagination of course lists (crud._course_list_order)
+        Index("ix_courses_created_at_id", "created_at", "id"),
+        Index("ix_courses_educator_created_at_id", "educator_id", "created_at", "id"),
+        # course search (crud.search_courses_async): ranked FTS + trigram fallback for typos
+        Index("ix_courses_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_courses_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+        # slug prefix lookup (crud.generate_unique_slugs): LIKE 'base-%' needs a C-ordered index
+        Index("ix_courses_slug_pattern", "slug", postgresql_ops={"slug": "text_pattern_ops"}),
+    )
+
     # sections = relationship("Section", back_populates="course")
     educator = relationship("User", backref="courses")  # NEW RELATION
     enrollments = relationship("Enrollment", back_populates="course")
     feedbacks = relationship("CourseFeedback", back_populates="course")
-    sections = relationship("Section", back_populates="course", cascade="all, delete-orphan", lazy="selectin")
+    sections = relationship("Section", back_populates="course", cascade="all, delete-orphan", passive_deletes=True, lazy="selectin")
     payments = relationship("Payment", back_populates="course")
 
 
 class Section(Base):
     __tablename__ = "sections"
     id = Column(Integer, primary_key=True, index=True)
-    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
+    course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"), nullable=False, index=True)
     title = Column(String, nullable=False)
     order = Column(Integer, default=0)
 
     #relationships
     course = relationship("Course", back_populates="sections")
     # lessons = relationship("Lesson", back_populates="section")
-    lessons = relationship("Lesson", back_populates="section", cascade="all, delete-orphan", lazy="selectin")
+    lessons = relationship("Lesson", back_populates="section", cascade="all, delete-orphan", passive_deletes=True, lazy="selectin")
 
 class Lesson(Base):
     __tablename__ = "lessons"
     id = Column(Integer, primary_key=True, index=True)
-    section_id = Column(Integer, ForeignKey("sections.id"), nullable=False)
+    section_id = Column(Integer, ForeignKey("sections.id", ondelete="CASCADE"), nullable=False, index=True)
     title = Column(String, nullable=False)
     type = Column(String, nullable=False)  # "video" or "pdf"
     youtube_url = Column(String, nullable=True)
@@ -81,8 +105,8 @@ class Lesson(Base):
     order = Column(Integer, default=0)
 
     section = relationship("Section", back_populates="lessons")
-    assessments = relationship("Assessment", back_populates="lesson", cascade="all, delete-orphan", lazy="selectin")
-    student_lessons = relationship("StudentLesson", back_populates="lesson", cascade="all, delete-orphan")
+    assessments = relationship("Assessment", back_populates="lesson", cascade="all, delete-orphan", passive_deletes=True, lazy="selectin")
+    student_lessons = relationship("StudentLesson", back_populates="lesson", cascade="all, delete-orphan", passive_deletes=True)
 
 class Enrollment(Base):
     __tablename__ = "enrollments"
@@ -91,6 +115,7 @@ class Enrollment(Base):
     course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
     progress_percent = Column(Float, default=0.0)
     status = Column(String, default="enrolled")  # enrolled | completed
+    completed_lessons = Column(Integer, default=0, server_default="0", nullable=False)  # StudentLesson rows in this course
 
     __table_args__ = (
         UniqueConstraint("user_id", "course_id", name="uq_user_course"),
@@ -101,43 +126,93 @@ class Enrollment(Base):
 class Assessment(Base):
     __tablename__ = "assessments"
     id = Column(Integer, primary_key=True, index=True)
-    lesson_id = Column(Integer, ForeignKey("lessons.id"), nullable=False)
+    lesson_id = Column(Integer, ForeignKey("lessons.id", ondelete="CASCADE"), nullable=False, index=True)
     question_markdown = Column(Text, nullable=False)
     image_url = Column(String, nullable=True)
     max_score = Column(Integer, default=1)
     explanation = Column(Text, nullable=True)
+    key_version = Column(Integer, server_default="0", nullable=False)   # bumped by answer_key_cache.mark_changed
     # relationships
     # choices = relationship("Choice", back_populates="assessment")
-    choices = relationship("Choice",  back_populates="assessment", cascade="all, delete-orphan")
-    assessment_attempts = relationship("AssessmentAttempt", back_populates="assessment", cascade="all, delete-orphan")
+    choices = relationship("Choice",  back_populates="assessment", cascade="all, delete-orphan", passive_deletes=True)
+    assessment_attempts = relationship("AssessmentAttempt", back_populates="assessment", cascade="all, delete-orphan", passive_deletes=True)
     # Must match back_populates in Lesson
     lesson = relationship("Lesson", back_populates="assessments")
 
 class Choice(Base):
     __tablename__ = "choices"
     id = Column(Integer, primary_key=True, index=True)
-    assessment_id = Column(Integer, ForeignKey("assessments.id"), nullable=False)
+    assessment_id = Column(Integer, ForeignKey("assessments.id", ondelete="CASCADE"), nullable=False, index=True)
     text = Column(String, nullable=False)
     is_correct = Column(Boolean, default=False)
     explanation = Column(Text, nullable=True)
     # relationships
     assessment = relationship("Assessment", back_populates="choices")
-    answers = relationship("StudentAnswer", back_populates="choice", cascade="all, delete-orphan")
+    answers = relationship("StudentAnswer", back_populates="choice", passive_deletes=True)
 
 
 class AssessmentAttempt(Base):
     __tablename__ = "assessment_attempts"
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    assessment_id = Column(Integer, ForeignKey("assessments.id"), nullable=False)
-    attempt_number = Column(Integer, default=1)
+    assessment_id = Column(Integer, ForeignKey("assessments.id", ondelete="CASCADE"), nullable=False, index=True)
+    attempt_number = Column(Integer, nullable=False)   # from AssessmentAttemptCounter, see grading.insert_attempt
     score = Column(Float, default=0.0)
     #created_at = Column(DateTime(timezone=True), default=datetime.now(timezone.utc))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     # relationship: answers will reference this attempt
     user = relationship("User", back_populates="assessment_attempts")
     assessment = relationship("Assessment", back_populates="assessment_attempts")
-    answers = relationship("StudentAnswer", back_populates="assessment_attempts", cascade="all, delete-orphan")
+    answers = relationship("StudentAnswer", back_populates="assessment_attempts", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "assessment_id", "attempt_number", name="uq_assessment_attempts_user_assessment_number"),
+    )
+
+
+class AssessmentAttemptCounter(Base):
+    # last attempt number handed out per (user, assessment); bumped atomically by an upsert
+    __tablename__ = "assessment_attempt_counters"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    assessment_id = Column(Integer, ForeignKey("assessments.id", ondelete="CASCADE"), primary_key=True)
+    last_number = Column(Integer, server_default="0", nullable=False)
+
+
+class GradingJob(Base):
+    # asynchronous grading queue (app/services/grading_queue.py); one job per attempt
+    __tablename__ = "grading_jobs"
+    id = Column(Integer, primary_key=True)
+    attempt_id = Column(Integer, ForeignKey("assessment_attempts.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    assessment_id = Column(Integer, nullable=False)
+    choice_ids = Column(ARRAY(Integer), nullable=False)   # raw submission
+    status = Column(String, server_default="queued", nullable=False)  # queued | running | done | failed
+    tries = Column(Integer, server_default="0", nullable=False)
+    error = Column(Text, nullable=True)
+    result = Column(JSONB, nullable=True)   # AttemptResultOut once graded
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("attempt_id", name="uq_grading_jobs_attempt_id"),
+        Index("ix_grading_jobs_pending", "status", "id", postgresql_where=text("status IN ('queued', 'running')")),
+    )
+
+
+class CourseImport(Base):
+    # bulk JSON Lines import progress (app/services/course_transfer.py), readable from any worker
+    __tablename__ = "course_imports"
+    id = Column(String(32), primary_key=True)   # uuid4 hex
+    educator_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    status = Column(String, server_default="queued", nullable=False)  # queued | running | done | failed
+    lines_read = Column(Integer, server_default="0", nullable=False)
+    imported = Column(Integer, server_default="0", nullable=False)
+    failed = Column(Integer, server_default="0", nullable=False)
+    errors = Column(ARRAY(Text), server_default="{}", nullable=False)   # first MAX_REPORTED_ERRORS
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
 
 
 class StudentAnswer(Base):
@@ -145,10 +220,10 @@ class StudentAnswer(Base):
     id = Column(Integer, primary_key=True, index=True)
     #user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     #assessment_id = Column(Integer, ForeignKey("assessments.id"), nullable=False)
-    choice_id = Column(Integer, ForeignKey("choices.id"), nullable=True)
+    choice_id = Column(Integer, ForeignKey("choices.id", ondelete="SET NULL"), nullable=True, index=True)
     #created_at = Column(DateTime(timezone=True), default=datetime.now(timezone.utc))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    attempt_id = Column(Integer, ForeignKey("assessment_attempts.id"), nullable=False)
+    attempt_id = Column(Integer, ForeignKey("assessment_attempts.id", ondelete="CASCADE"), nullable=False, index=True)
     is_correct = Column(Boolean, default=False)
     score = Column(Float, default=0.0)
     #relationships
@@ -179,7 +254,7 @@ class CourseFeedback(Base):
 class StudentLesson(Base):
     __tablename__ = "student_lessons"
     user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
-    lesson_id = Column(Integer, ForeignKey("lessons.id"), primary_key=True)
+    lesson_id = Column(Integer, ForeignKey("lessons.id", ondelete="CASCADE"), primary_key=True, index=True)
     completed_at = Column(DateTime(timezone=True), default=datetime.now(timezone.utc))
 
     # Optional relationships if you want easy access:
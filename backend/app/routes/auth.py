@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Response, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from app.db.sessions import get_db
 from app import crud, schemas, models
 from jose import jwt, JWTError, ExpiredSignatureError
 import time, secrets
 from app.core.config import settings
-from app.core import security, auth
+from app.core import security, auth, principal_cache
 from pydantic import SecretStr
 from passlib.context import CryptContext
 
@@ -18,26 +20,35 @@ def create_access_token(data: dict, expires_in=3600):
     token = jwt.encode(payload, settings.SECRET_KEY, algorithm="HS256")
     return token
 
+# signup/token are async so bcrypt runs in the bounded hash pool (app/core/security.py)
+# rather than holding one of Starlette's shared threadpool workers; DB calls still go to the threadpool.
+# No DB connection is held while hashing: the lookups end their transaction first, and signup
+# only opens the write transaction once the hash is ready.
 @router.post("/signup", response_model=schemas.UserOut)
-def signup(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
-    existing = crud.get_user_by_email(db, user_in.email)
-    if existing:
+async def signup(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
+    if await run_in_threadpool(crud.email_registered, db, user_in.email):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
+    hashed = await security.hash_password_async(user_in.password)
+    try:
+        user = await run_in_threadpool(crud.create_user, db, user_in, hashed)
+    except IntegrityError:
+        # same email signed up while we were hashing (users.email is unique)
+        await run_in_threadpool(db.rollback)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
-    user = crud.create_user(db, user_in)
     return user
 
 @router.post("/token")
-def token(response: Response, user_in: schemas.LoginRequest, db: Session = Depends(get_db)):
+async def token(response: Response, user_in: schemas.LoginRequest, db: Session = Depends(get_db)):
 #def token(response: Response, user_in: schemas.UserCreate, db: Session = Depends(get_db)):
     """Authenticate and set HttpOnly access_token cookie + csrf_token cookie (double-submit)."""
     # For MVP using email/password in JSON body
-    user = crud.get_user_by_email(db, user_in.email)
+    user = await run_in_threadpool(crud.get_login_credentials, db, user_in.email)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     # verify password with passlib (crud.authenticate_user could be added)
     #password = user_in.password.get_secret_value()
     password = user_in.password
-    if not security.verify_password(password, user.hashed_password):
+    if not await security.verify_password_async(password, user.hashed_password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     token = create_access_token({"sub": str(user.id)})
 
@@ -77,13 +88,19 @@ def token(response: Response, user_in: schemas.LoginRequest, db: Session = Depen
 
 
 @router.get("/me", response_model=schemas.UserOut)
-def get_me(current_user: models.User = Depends(auth.get_current_user)):
+async def get_me(current_user: models.User = Depends(auth.get_current_user_async)):
     return current_user
 
 
 
 @router.post("/logout")
-def logout(response: Response):
+def logout(request: Request, response: Response):
+    # forget the cached principal so the old cookie stops resolving in this worker
+    token = request.cookies.get("access_token")
+    if token:
+        if token.startswith("Bearer "):
+            token = token.split(" ")[1]
+        principal_cache.invalidate_token(token)
     # clear cookies by setting expiry 0
     response.delete_cookie("access_token", path="/")
     response.delete_cookie("csrf_token", path="/")
@@ -1,9 +1,15 @@
 # backend/app/routes/instructors.py
-from fastapi import APIRouter, Depends, HTTPException, status
+import os
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status, Response
+from fastapi.responses import StreamingResponse
+from typing import Optional
 from sqlalchemy.orm import Session
-from app.db.sessions import get_db
-from app.core.auth import require_role, verify_csrf
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.sessions import get_db, get_async_db
+from app.core.auth import require_role, require_role_async, require_course_owner, check_course_owner, verify_csrf
 from app import crud, schemas, models
+from app.core import catalog_cache, pagination, snapshot_store
+from app.services import course_transfer, item_analysis
 
 router = APIRouter()
 
@@ -29,62 +35,91 @@ def create_course(course_in: schemas.CourseCreate, current_user: models.User = D
 
 #@router.get("/courses", response_model=list[schemas.CourseDetailOut])
 @router.get("/courses", response_model=list[schemas.CourseListOut])
-def list_my_courses(current_user: models.User = Depends(require_role("instructor")),
+def list_my_courses(response: Response,
+                    limit: Optional[int] = None,
+                    cursor: Optional[str] = None,
+                    current_user: models.User = Depends(require_role("instructor")),
                     db: Session = Depends(get_db)):
-    courses = db.query(models.Course).filter_by(educator_id=current_user.id).all()
+    # no limit → all courses (old behaviour); with limit, follow X-Next-Cursor for the next page
+    courses = crud.list_instructor_courses(db, current_user.id, limit=limit, cursor=cursor)
+    next_cursor = pagination.next_cursor(courses, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return courses
 
+# Bulk JSON Lines import/export (app/services/course_transfer.py).
+# Declared before /courses/{course_id} so "export"/"import" aren't taken for a course id.
+@router.post("/courses/import", response_model=schemas.CourseImportStatus, status_code=status.HTTP_202_ACCEPTED)
+async def import_courses(request: Request,
+                         background_tasks: BackgroundTasks,
+                         current_user=Depends(require_role_async("instructor")),
+                         db: AsyncSession = Depends(get_async_db),
+                         _csrf=Depends(verify_csrf)):
+    # body: one course tree per line; poll /courses/imports/{id} for progress
+    path = await course_transfer.spool_request_body(request)
+    try:
+        job = await course_transfer.new_import(db, current_user.id)
+    except BaseException:
+        os.unlink(path)
+        raise
+    background_tasks.add_task(course_transfer.run_import, job.id, path)
+    return job
+
+@router.get("/courses/imports/{import_id}", response_model=schemas.CourseImportStatus)
+def get_import_status(import_id: str, current_user: models.User = Depends(require_role("instructor")), db: Session = Depends(get_db)):
+    job = course_transfer.get_import(db, import_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return job
+
+@router.get("/courses/export")
+def export_courses(current_user: models.User = Depends(require_role("instructor"))):
+    return StreamingResponse(
+        course_transfer.export_lines(current_user.id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="courses.jsonl"'},
+    )
+
+
 @router.post("/courses/{course_id}/sections", response_model=schemas.SectionOut)
 def create_section(
     course_id: int,
     section_in: schemas.SectionCreate,
-    current_user: models.User = Depends(require_role("instructor")),
+    current_user: models.User = Depends(require_course_owner),
     db: Session = Depends(get_db),
     _csrf=Depends(verify_csrf)
 ):
-    course = crud.get_course_by_id(db, course_id)
-    if not course or course.educator_id != current_user.id:
-        raise HTTPException(403, "Not allowed")
-
     section = models.Section(
         course_id=course_id,
         title=section_in.title,
         order=section_in.order or 0
     )
     db.add(section)
+    catalog_cache.mark_changed(db, [course_id])
     db.commit()
     db.refresh(section)
     return section
 
 
 @router.put("/courses/{course_id}", response_model=schemas.CourseDetailOut)
-def update_course(course_id: int, course_in: schemas.CourseUpdate, current_user: models.User = Depends(require_role("instructor")), db: Session = Depends(get_db), _csrf=Depends(verify_csrf)):
-    course = crud.get_course_by_id(db, course_id)
-    if not course:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
-    if course.educator_id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed. You are not the educator of this course.")
+def update_course(course_id: int, course_in: schemas.CourseUpdate, current_user: models.User = Depends(require_course_owner), db: Session = Depends(get_db), _csrf=Depends(verify_csrf)):
     try:
         updated = crud.update_course_full(db, course_id, course_in.dict(), educator_id=current_user.id)
     except PermissionError:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed")
     if not updated:
         raise HTTPException(status_code=404, detail="Course not found after update")
-    # return nested detail (APEX)
-    return crud.get_course_by_id(db, course_id)
+    # return nested detail (APEX) - update_course_full already reloaded the tree
+    return updated
 
 @router.put("/courses/{course_id}/structure", response_model=schemas.OkResponse)
 def update_course_structure(
     course_id: int,
     payload: schemas.CourseStructureUpdate,
-    current_user: models.User = Depends(require_role("instructor")),
+    current_user: models.User = Depends(require_course_owner),
     db: Session = Depends(get_db),
     _csrf=Depends(verify_csrf),
 ):
-    course = crud.get_course_by_id(db, course_id)
-    if not course or course.educator_id != current_user.id:
-        raise HTTPException(403, "Not allowed")
-
     return crud.update_course_structure(
         db=db,
         course_id=course_id,
@@ -95,30 +130,30 @@ def update_course_structure(
 #@router.get("/courses/{course_id}", response_model=schemas.CourseEditorOut)
 @router.get("/courses/{course_id}", response_model=schemas.CourseDetailOut)
 def get_course_detail(course_id: int,
-                      current_user: models.User = Depends(require_role("instructor")),
+                      current_user: models.User = Depends(require_course_owner),
                       db: Session = Depends(get_db)):
-    course = crud.get_course_by_id(db, course_id)
-    if not course:
-        raise HTTPException(404, "Course not found")
-    if course.educator_id != current_user.id:
-        raise HTTPException(403, "Not allowed")
-    return course
+    # this one returns the tree; served from the snapshot store when the course has not changed
+    version = catalog_cache.course_version(course_id)   # read before loading, see catalog_cache
+    body = snapshot_store.get(course_id, version)
+    if body is None:
+        db.info["use_replica"] = False   # fill from the primary, never from a lagging replica
+        course = crud.get_course_by_id(db, course_id)
+        if not course:
+            raise HTTPException(404, "Course not found")
+        body = snapshot_store.encode_course_detail(course)
+        snapshot_store.put(course_id, version, body)
+    return snapshot_store.as_response(body)
 
 @router.get("/courses/{course_id}/lessons", response_model=list[schemas.LessonOut])
 def list_course_lessons(course_id: int,
-                        current_user: models.User = Depends(require_role("instructor")),
+                        current_user: models.User = Depends(require_course_owner),
                         db: Session = Depends(get_db)):
-    course = crud.get_course_by_id(db, course_id)
-    if not course:
-        raise HTTPException(status_code=404, detail="Course not found")
-    if course.educator_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not allowed")
     lessons = crud.list_lessons_for_course(db, course_id)
     return lessons
 
 @router.post("/courses/{course_id}/lessons", response_model=schemas.LessonOut, status_code=status.HTTP_201_CREATED)
 def create_course_lesson(course_id: int, payload: schemas.LessonCreate,
-                         current_user: models.User = Depends(require_role("instructor")),
+                         current_user: models.User = Depends(require_course_owner),
                          db: Session = Depends(get_db),
                          _csrf=Depends(verify_csrf)):
     """
@@ -132,13 +167,9 @@ def create_course_lesson(course_id: int, payload: schemas.LessonCreate,
       "assessments": [ ... optional assessments dicts ... ]
     }
     """
-    course = crud.get_course_by_id(db, course_id)
-    if not course:
-        raise HTTPException(status_code=404, detail="Course not found")
-    if course.educator_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not allowed")
-
-    lesson = crud.create_lesson_simple(db, course_id, payload)
+    lesson = crud.create_lesson_simple(db, course_id, payload.dict())
+    db.commit()
+    db.refresh(lesson)
     return lesson
 
 @router.delete("/lessons/{lesson_id}", response_model=dict)
@@ -146,24 +177,19 @@ def delete_lesson(lesson_id: int,
                   current_user: models.User = Depends(require_role("instructor")),
                   db: Session = Depends(get_db),
                   _csrf=Depends(verify_csrf)):
-    # Ensure the instructor owns the course for this lesson
-    lesson = db.query(models.Lesson).filter_by(id=lesson_id).first()
-    if not lesson:
+    # Ensure the instructor owns the course for this lesson (lesson -> section -> course in one query)
+    course_id = crud.get_lesson_course_id(db, lesson_id)
+    if course_id is None:
         raise HTTPException(status_code=404, detail="Lesson not found")
-    # verify instructor owns the parent course
-    section = db.query(models.Section).filter_by(id=lesson.section_id).first()
-    if not section:
-        raise HTTPException(status_code=404, detail="Parent section not found")
-    course = db.query(models.Course).filter_by(id=section.course_id).first()
-    if not course or course.educator_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not allowed")
+    check_course_owner(db, course_id, current_user.id)
     # perform safe delete using crud helper
     crud.delete_lesson_simple(db, lesson_id)
+    db.commit()
     return {"ok": True}
 
 # add endpoints to upload content, add assessments etc. for instructor
 @router.post("/courses/{course_id}/assessments", response_model=dict)
-def instructor_create_assessment(course_id: int, payload: dict, current_user: models.User = Depends(require_role("instructor")), db: Session = Depends(get_db), _csrf=Depends(verify_csrf)):
+def instructor_create_assessment(course_id: int, payload: dict, current_user: models.User = Depends(require_course_owner), db: Session = Depends(get_db), _csrf=Depends(verify_csrf)):
     """
     payload example:
     {
@@ -178,10 +204,7 @@ def instructor_create_assessment(course_id: int, payload: dict, current_user: mo
       ]
     }
     """
-    # validate course ownership
-    course = crud.get_course_by_id(db, course_id)
-    if course.educator_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not allowed. You are not the educator of this course.")
+    # course ownership validated by require_course_owner
     a_in = schemas.AssessmentCreate(
         lesson_id=payload.get("lesson_id"),
         question_markdown=payload.get("question_markdown"),
@@ -189,9 +212,8 @@ def instructor_create_assessment(course_id: int, payload: dict, current_user: mo
         max_score=payload.get("max_score", 1),
         explanation=payload.get("explanation")
     )
-    ass = crud.create_assessment(db, a_in)
-    for ch in payload.get("choices", []):
-        crud.add_choice(db, ass.id, ch["text"], ch.get("is_correct", False), ch.get("explanation"))
+    catalog_cache.mark_changed(db, [course_id])   # applied by create_assessment's single commit
+    ass = crud.create_assessment(db, a_in, payload.get("choices"))
     return {"id": ass.id}
 
 # Also add instructor endpoints:
@@ -202,13 +224,8 @@ def instructor_create_assessment(course_id: int, payload: dict, current_user: mo
 #@router.get("/courses/{course_id}/students", response_model=list[dict])
 @router.get("/courses/{course_id}/students")
 def get_enrolled_students(course_id: int,
-                          current_user: models.User = Depends(require_role("instructor")),
+                          current_user: models.User = Depends(require_course_owner),
                           db: Session = Depends(get_db)):
-    course = crud.get_course_by_id(db, course_id)
-    if not course:
-        raise HTTPException(status_code=404, detail="Course not found")
-    if course.educator_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not allowed")
     return crud.list_enrollments_for_course(db, course_id)
 
 
@@ -227,17 +244,19 @@ def get_enrolled_students(course_id: int,
 
 # checking own courses
 
+@router.get("/courses/{course_id}/item-analysis", response_model=schemas.ItemAnalysisOut)
+def get_item_analysis(course_id: int,
+                      current_user: models.User = Depends(require_course_owner),
+                      db: Session = Depends(get_db)):
+    # difficulty, discrimination and distractor frequencies per question; cached per version
+    return item_analysis.course_item_analysis(db, course_id)
+
+
 @router.get("/courses/{course_id}/feedback")
 def instructor_view_feedback(course_id: int,
-                             current_user: models.User = Depends(require_role("instructor")),
+                             current_user: models.User = Depends(require_course_owner),
                              db: Session = Depends(get_db)):
 
-    course = crud.get_course_by_id(db, course_id)
-    if not course:
-        raise HTTPException(404, "Course not found")
-    if course.educator_id != current_user.id:
-        raise HTTPException(403, "Not allowed")
-
     return {
         "summary": crud.get_feedback_summary(db, course_id),
         "reviews": crud.list_feedback_for_course(db, course_id)
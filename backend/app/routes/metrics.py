@@ -0,0 +1,34 @@
+# backend/app/routes/metrics.py
+# Internal telemetry: DB pool stats and in-process cache/queue counters.
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import Optional
+import secrets
+from app.core.config import settings
+from app.core import principal_cache, catalog_cache, snapshot_store, security, answer_key_cache
+from app.db import pool_metrics
+from app.db.sessions import get_db
+from app.services import grading_queue, item_analysis
+
+router = APIRouter()
+
+def verify_metrics_token(x_metrics_token: Optional[str] = Header(None)):
+    # closed unless METRICS_TOKEN is configured: the endpoint doesn't exist without it
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not secrets.compare_digest(x_metrics_token or "", settings.METRICS_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed")
+    return True
+
+@router.get("/metrics")
+def get_metrics(_auth=Depends(verify_metrics_token), db: Session = Depends(get_db)):
+    return {
+        "db_pools": pool_metrics.snapshot(),
+        "principal_cache": principal_cache.stats(),
+        "catalog_cache": catalog_cache.stats(),
+        "course_snapshots": snapshot_store.stats(),
+        "answer_keys": answer_key_cache.stats(),
+        "grading_queue": grading_queue.stats(db),
+        "item_analysis": item_analysis.stats(),
+        "password_hash_pool": security.hash_pool_stats(),
+    }
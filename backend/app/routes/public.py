@@ -1,39 +1,75 @@
 # backend/app/routes/public.py
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response, Query
 from sqlalchemy.orm import Session
-from app.db.sessions import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.sessions import get_db, get_async_db
 from app import crud, schemas
-from typing import List
+from app.core import catalog_cache, pagination, snapshot_store
+from typing import List, Optional
 
 router = APIRouter()
 #@router.get("/courses", response_model=List[schemas.CourseDetailOut])
 @router.get("/courses", response_model=List[schemas.PublicCourseListOut])
-def list_courses(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
+async def list_courses(response: Response, skip: int = 0, limit: int = 50, cursor: Optional[str] = None,
+                       db: AsyncSession = Depends(get_async_db)):
     #return crud.list_public_courses(db, skip=skip, limit=limit)
-    courses = crud.list_courses(db, skip=skip, limit=limit)
-    print("Courses fetched:", courses)
-    print(type(courses[0]))
-    return courses
+    # keyset paging: pass the X-Next-Cursor header of the previous page as ?cursor=
+    key = (cursor, skip, limit)
+    generation = catalog_cache.generation()
+    cached = catalog_cache.get_list(generation, key)
+    if cached is None:
+        courses = await crud.list_courses_async(db, skip=skip, limit=limit, cursor=cursor)
+        cached = ([schemas.PublicCourseListOut.from_orm(c) for c in courses], pagination.next_cursor(courses, limit))
+        catalog_cache.set_list(generation, key, cached)
+    page, next_cursor = cached
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return page
+
+
+# declared before /courses/{slug} so "search" is not taken for a slug
+@router.get("/courses/search", response_model=List[schemas.PublicCourseListOut])
+async def search_courses(q: str = Query(..., min_length=1, max_length=200),
+                         limit: int = Query(20, ge=1, le=100),
+                         db: AsyncSession = Depends(get_async_db)):
+    return await crud.search_courses_async(db, q.strip(), limit=limit)
     
 
 @router.get("/courses/{slug}", response_model=schemas.CourseDetailOut)
 def get_course(slug: str, db: Session = Depends(get_db)):
+    # hit: pre-encoded JSON bytes, no DB and no ORM/pydantic work
+    course_id = catalog_cache.course_id_for_slug(slug)
+    if course_id is not None:
+        body = snapshot_store.get(course_id, catalog_cache.course_version(course_id))
+        if body is not None:
+            return snapshot_store.as_response(body)
+    # generation taken before the query; a concurrent edit makes the result uncacheable
+    generation = catalog_cache.generation()
+    # the snapshot is filled from the primary only: a lagging replica would cache an old tree under the new version
+    db.info["use_replica"] = False
     c = crud.get_course_by_slug(db, slug)
     if not c:
         from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="Course not found")
-    return c
+    body = snapshot_store.encode_course_detail(c)
+    version = catalog_cache.remember_slug(slug, c.id, generation)
+    if version is not None:
+        snapshot_store.put(c.id, version, body)
+    return snapshot_store.as_response(body)
 
 # Preview endpoint: get first section/lesson (for preview)
 @router.get("/courses/{slug}/preview")
 def preview_course(slug: str, db: Session = Depends(get_db)):
-    course = crud.get_course_by_slug(db, slug)
+    course = crud.get_course_row_by_slug(db, slug)
     if not course:
         from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="Course not found")
-    # fetch first lesson (first section ordered, lesson order)
+    # first lesson = courses.preview_lesson_id, a key lookup (no tree load)
     first_lesson = crud.get_first_lesson_for_course(db, course.id)
-    return {"course": course, "preview": first_lesson}
+    return {
+        "course": schemas.CourseListOut.from_orm(course),
+        "preview": schemas.LessonOut.from_orm(first_lesson) if first_lesson else None,
+    }
 
 
 @router.get("/courses/{course_id}/feedback", response_model=schemas.PublicFeedbackResponse)
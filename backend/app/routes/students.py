@@ -2,9 +2,11 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from app.db.sessions import get_db
-from app.core.auth import require_role, get_current_user, verify_csrf
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.sessions import get_db, get_async_db
+from app.core.auth import require_role, require_role_async, get_current_user, verify_csrf
 from app import crud, schemas, models
+from app.services import grading, grading_queue
 from app.core.logging_config import logger
 from typing import List
 import logging
@@ -54,16 +56,11 @@ def enroll(enr: schemas.EnrollmentCreate, current_user: models.User = Depends(re
         raise HTTPException(status_code=500, detail="Unexpected server error")
     
 @router.get("/courses", response_model=list[schemas.StudentCourseOut])
-def my_courses(
-    current_user: models.User = Depends(require_role("student")),
-    db: Session = Depends(get_db)
+async def my_courses(
+    current_user: models.User = Depends(require_role_async("student")),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    rows = (
-        db.query(models.Course, models.Enrollment.progress_percent)
-        .join(models.Enrollment, models.Enrollment.course_id == models.Course.id)
-        .filter(models.Enrollment.user_id == current_user.id)
-        .all()
-    )
+    rows = await crud.list_student_courses_async(db, current_user.id)
 
     return [
         {
@@ -124,30 +121,36 @@ def list_assessments_for_course(course_id: int, current_user: models.User = Depe
 # Mark lesson complete (only enrolled except for preview logic inside crud or route)
 @router.post("/courses/{course_id}/lessons/{lesson_id}/complete")
 def mark_complete(course_id: int, lesson_id: int, current_user: models.User = Depends(require_role("student")), db: Session = Depends(get_db), _csrf=Depends(verify_csrf)):
-    # Check preview allowance (crud helper will ensure preview logic if you choose)
-    course = crud.get_course_by_id(db, course_id)
-    if not course:
+    # course / lesson / enrollment / preview checks in one query
+    ctx = crud.get_lesson_complete_context(db, current_user.id, course_id, lesson_id)
+    if not ctx:
         raise HTTPException(status_code=404, detail="Course not found")
 
-    lesson = crud.get_lesson(db, lesson_id)
-    if not lesson or not crud.lesson_belongs_to_course(db, lesson_id, course_id):
+    if ctx.lesson_course_id != course_id:
         raise HTTPException(status_code=400, detail="Invalid lesson")
 
     # preview logic: allow first lesson even if not enrolled
-    if not crud.is_user_enrolled(db, current_user.id, course_id):
-        if not crud.is_preview_lesson(db, lesson_id):
-            raise HTTPException(status_code=403, detail="Enroll to access full course")
+    if not ctx.is_enrolled and not ctx.is_preview:
+        raise HTTPException(status_code=403, detail="Enroll to access full course")
 
-    crud.mark_lesson_completed(db, current_user.id, lesson_id)
-    progress = crud.calculate_and_update_progress(db, current_user.id, course_id)
+    # insert-if-absent + counter + progress in one statement
+    progress = crud.complete_lesson(db, current_user.id, course_id, lesson_id)
     return {"message":"Lesson marked complete", "progress": progress}
 
 @router.get("/courses/{course_id}/progress")
-def get_progress(course_id: int, current_user: models.User = Depends(require_role("student")), db: Session = Depends(get_db)):
-    enrolled = crud.is_user_enrolled(db, current_user.id, course_id)
-    if not enrolled:
+async def get_progress(course_id: int, current_user: models.User = Depends(require_role_async("student")), db: AsyncSession = Depends(get_async_db)):
+    progress = await crud.get_enrollment_progress_async(db, current_user.id, course_id)
+    if progress is None:
         return {"is_enrolled": False, "progress_percent": 0}
-    return {"is_enrolled": True, "progress_percent": crud.course_progress_percent(db, current_user.id, course_id)}
+    return {"is_enrolled": True, "progress_percent": progress}
+
+
+def _submitted_choice_ids(payload: dict) -> list:
+    # choice_id null = nothing selected (scored as wrong); anything else must be an integer id
+    choice_ids = [a.get("choice_id") for a in payload.get("answers") or []]
+    if any(ch_id is not None and (isinstance(ch_id, bool) or not isinstance(ch_id, int)) for ch_id in choice_ids):
+        raise HTTPException(status_code=400, detail="Each answer needs an integer choice_id (or null when unanswered)")
+    return choice_ids
 
 
 @router.post("/assessments/{assessment_id}/submit", response_model=schemas.AttemptResultOut)
@@ -171,40 +174,27 @@ def submit_assessment(assessment_id: int, payload: dict, current_user: models.Us
     #if not crud.is_user_enrolled(db, current_user.id, course_id):
     #    raise HTTPException(403, "Enroll to attempt assessment")
 
-    answers = payload.get("answers", [])
-    # create attempt
-    attempt = crud.create_assessment_attempt(db, current_user.id, assessment_id)
-    q_results = []
-    for a in answers:
-        ch_id = a.get("choice_id")
-        sa = crud.record_student_answer_on_attempt(db, attempt.id, ch_id)
-        q_results.append({
-            "question_id": sa.attempt_id, # we'll populate properly below
-        })
-    attempt = crud.finalize_assessment_attempt(db, attempt.id)
-    # assemble question-level results: query answers, choices, correct ids etc.
-    question_results = []
-    answers_objs = db.query(models.StudentAnswer).filter_by(attempt_id=attempt.id).all()
-    for ans in answers_objs:
-        choice = db.query(models.Choice).get(ans.choice_id) if ans.choice_id else None
-        assessment = db.query(models.Assessment).get(choice.assessment_id) if choice else None
-        # find correct choice id for that assessment
-        correct_choice = db.query(models.Choice).filter_by(assessment_id=assessment.id, is_correct=True).first() if assessment else None
-        question_results.append({
-            "question_id": assessment.id if assessment else None,
-            "selected_choice_id": choice.id if choice else None,
-            "is_correct": ans.is_correct,
-            "correct_choice_id": correct_choice.id if correct_choice else None,
-            "score": ans.score,
-            "explanation": assessment.explanation if assessment and ans.is_correct else None
-        })
-    return {
-        "attempt_id": attempt.id,
-        "assessment_id": assessment_id,
-        "attempt_number": attempt.attempt_number,
-        "total_score": attempt.score,
-        "question_results": question_results
-    }
+    choice_ids = _submitted_choice_ids(payload)
+    # one answer-key query, scoring in memory, attempt + answers written in one transaction
+    return grading.grade_submission(db, current_user.id, assessment_id, choice_ids)
+
+
+@router.post("/assessments/{assessment_id}/submit-async", response_model=schemas.GradingJobOut, status_code=202)
+def submit_assessment_async(assessment_id: int, payload: dict, current_user: models.User = Depends(require_role("student")), db: Session = Depends(get_db), _csrf=Depends(verify_csrf)):
+    """
+    Same payload as /submit. Only records the attempt and queues it for grading (exam spikes);
+    poll GET /attempts/{attempt_id}/result for the outcome.
+    """
+    choice_ids = _submitted_choice_ids(payload)
+    return grading_queue.enqueue_submission(db, current_user.id, assessment_id, choice_ids)
+
+
+@router.get("/attempts/{attempt_id}/result", response_model=schemas.GradingJobOut)
+def get_attempt_result(attempt_id: int, current_user: models.User = Depends(require_role("student")), db: Session = Depends(get_db)):
+    job = grading_queue.get_job(db, attempt_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Attempt not found")
+    return job
 
 # Get feedbacks for a course
 @router.post("/courses/{course_id}/feedback", response_model=schemas.FeedbackOut)
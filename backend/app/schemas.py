@@ -111,8 +111,8 @@ class UserOut(BaseModel):
 # Course / Section / Lesson
 class LessonCreate(BaseModel):
     id: Optional[int] = None
-    title: Optional[str] = None
-    type: Optional[str] = None  # "video" or "pdf"
+    title: str
+    type: str = "video"  # "video" or "pdf"
     youtube_url: Optional[str] = None
     pdf_url: Optional[str] = None
     order: Optional[int] = 0
@@ -131,7 +131,7 @@ class LessonUpdate(BaseModel):
 
 class SectionCreate(BaseModel):
     id: Optional[int] = None
-    title: Optional[str] = None
+    title: str
     order: Optional[int] = 0
     #lessons: Optional[List[LessonCreate]] = []
     lessons: Optional[List[LessonCreate]] = None
@@ -154,6 +154,7 @@ class CourseCreate(BaseModel):
     price_cents: Optional[int] = None
     currency: Optional[str] = None
     #sections: Optional[List[SectionCreate]] = []
+    sections: Optional[List[SectionCreate]] = None
 
 #class CourseUpdate(CourseCreate):
     #id: Optional[int] = None  # optional for update if you want
@@ -375,6 +376,35 @@ class AttemptResultOut(BaseModel):
     class Config:
         orm_mode = True
 
+class GradingJobOut(BaseModel):
+    attempt_id: int
+    status: str   # queued | running | done | failed
+    result: Optional[AttemptResultOut] = None
+    error: Optional[str] = None
+
+# Item analysis (instructor)
+class ChoiceFrequencyOut(BaseModel):
+    choice_id: int
+    text: str
+    is_correct: bool
+    count: int
+    rate: Optional[float] = None   # share of the question's responses; None when unanswered
+
+class ItemStatsOut(BaseModel):
+    assessment_id: int
+    lesson_id: int
+    responses: int                           # students with a graded attempt (their latest counts)
+    unanswered: int = 0
+    p_value: Optional[float] = None          # difficulty: share answered correctly
+    point_biserial: Optional[float] = None   # discrimination against the rest score
+    choices: List[ChoiceFrequencyOut] = []
+
+class ItemAnalysisOut(BaseModel):
+    course_id: int
+    students: int
+    answers: int
+    items: List[ItemStatsOut] = []
+
 # Feedback
 class FeedbackCreate(BaseModel):
     # Client cannot impersonate another user - user_id will come from auth context. not from frontend. 
@@ -425,6 +455,25 @@ class OkResponse(BaseModel):
     ok: bool = True
 
 
+# ---- Bulk import / export (JSON Lines, one course tree per line) ----
+class CourseImportLine(CourseCreate):
+    slug: Optional[str] = None   # kept when free, otherwise a -N suffix is added
+    is_published: Optional[bool] = True
+
+class CourseImportStatus(BaseModel):
+    id: str
+    status: str   # queued | running | done | failed
+    lines_read: int = 0
+    imported: int = 0
+    failed: int = 0
+    errors: List[str] = []
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+
 # ---- Forward Reference Fix ----
 LessonCreate.update_forward_refs()
 LessonOut.update_forward_refs()
@@ -0,0 +1,70 @@
+"""
+Deleting parts of a course tree.
+
+The foreign keys below a course are ON DELETE CASCADE (student_answers.choice_id is SET NULL),
+see alembic revision 9c41f3b7a2e8. So removing a subtree is one DELETE per level we were asked
+to remove, and Postgres clears progress, attempts, answers and choices through the FK indexes.
+The statement count does not depend on how many learners have data on the rows
+(plus a SELECT and an UPDATE for the answer keys: every assessment that goes away or loses
+choices gets a new key_version, see app/core/answer_key_cache.py; and an UPDATE taking the
+deleted lessons' completions off enrollments.completed_lessons, see progress_counters).
+The caller owns the transaction; nothing here commits.
+"""
+from sqlalchemy import delete, or_, select
+
+from app import models
+from app.core import answer_key_cache
+from app.services import progress_counters
+
+
+def delete_subtree(db, section_ids=(), lesson_ids=(), assessment_ids=(), choice_ids=()):
+    """
+    Remove the given sections/lessons/assessments/choices and everything below them.
+    Ids may overlap (a lesson inside a removed section); already-cascaded rows simply don't match.
+    Returns the number of top-level rows deleted per level.
+    """
+    _forget_answer_keys(db, section_ids, lesson_ids, assessment_ids, choice_ids)
+    progress_counters.forget_completions(db, section_ids, lesson_ids)
+    counts = {}
+    # top-down: one statement per level covers every descendant
+    for key, model, ids in (
+        ("sections", models.Section, section_ids),
+        ("lessons", models.Lesson, lesson_ids),
+        ("assessments", models.Assessment, assessment_ids),
+        ("choices", models.Choice, choice_ids),
+    ):
+        ids = list(ids)
+        if not ids:
+            counts[key] = 0
+            continue
+        result = db.execute(
+            delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        counts[key] = result.rowcount
+    return counts
+
+
+def _forget_answer_keys(db, section_ids, lesson_ids, assessment_ids, choice_ids):
+    # cascaded assessments have no id in hand; one query finds every affected one
+    A, L, C = models.Assessment, models.Lesson, models.Choice
+    conditions = []
+    if section_ids:
+        conditions.append(L.section_id.in_(list(section_ids)))
+    if lesson_ids:
+        conditions.append(L.id.in_(list(lesson_ids)))
+    if assessment_ids:
+        conditions.append(A.id.in_(list(assessment_ids)))
+    if choice_ids:
+        conditions.append(A.id.in_(select(C.assessment_id).where(C.id.in_(list(choice_ids)))))
+    if not conditions:
+        return
+    affected = db.execute(select(A.id).join(L, A.lesson_id == L.id).where(or_(*conditions))).scalars().all()
+    answer_key_cache.mark_changed(db, affected)
+
+
+def delete_lessons(db, lesson_ids):
+    return delete_subtree(db, lesson_ids=lesson_ids)["lessons"]
+
+
+def delete_sections(db, section_ids):
+    return delete_subtree(db, section_ids=section_ids)["sections"]
@@ -0,0 +1,305 @@
+"""
+Set-based sync of a full course tree (used by crud.update_course_full).
+
+The old path walked _upsert_section -> _upsert_lesson -> _upsert_assessment -> _upsert_choice,
+doing a query().get() + flush() per entity and deleting missing children one id at a time.
+Here we:
+  1. load the current tree once: one flat query per level (sections, lessons, assessments, choices)
+  2. diff it against the incoming dict in memory
+  3. apply the diff level by level: bulk INSERT ... RETURNING id (parents first, so children can
+     reference new ids), bulk UPDATE by primary key for rows that actually changed, and one
+     DELETE ... WHERE id IN (...) per level for everything that disappeared (app/services/course_delete.py)
+The number of statements depends on the tree depth, not on its size. The caller owns the
+transaction (nothing here commits).
+
+Incoming semantics (same shape as schemas.CourseUpdate.dict()):
+  - an item whose id belongs to this course is updated (and may move to another parent);
+    anything else - no id, or an id from another course - is inserted
+  - a children list of None means "leave the existing children alone"; a list (even empty)
+    is the desired final set and everything missing from it is deleted
+  - a missing key keeps the current value; None clears the nullable columns (CLEARABLE_FIELDS)
+    and keeps the current value of the required ones (title, type, order, ...)
+  - a new lesson gets type "video" like schemas.LessonCreate; a new section or lesson without a
+    title (REQUIRED_ON_INSERT) fails the whole sync with a 422 before any statement is sent
+"""
+from fastapi import HTTPException, status
+from sqlalchemy import select, insert, update
+
+from app import models
+from app.core import answer_key_cache
+from app.services import course_delete
+
+SECTION_FIELDS = ("title", "order")
+LESSON_FIELDS = ("title", "type", "youtube_url", "pdf_url", "order")
+ASSESSMENT_FIELDS = ("question_markdown", "image_url", "max_score", "explanation")
+CHOICE_FIELDS = ("text", "is_correct", "explanation")
+# NOT NULL columns without a default: a new row must bring them (checked before any INSERT)
+REQUIRED_ON_INSERT = {"section": ("title",), "lesson": ("title",)}
+# nullable columns: an explicit None in the payload sets them to NULL
+CLEARABLE_FIELDS = frozenset(("description", "udemy_url", "youtube_url", "pdf_url", "image_url", "explanation"))
+
+
+class _Level:
+    """Pending writes for one table."""
+
+    def __init__(self):
+        self.inserts = []      # (row dict, parent ref, own _NewRef or None); parent ref is an id or a _NewRef
+        self.updates = []      # row dicts including "id"
+        self.keep = set()      # existing ids that survive
+
+
+class _NewRef:
+    """Placeholder for a row that gets its id from INSERT ... RETURNING."""
+
+    __slots__ = ("id",)
+
+    def __init__(self):
+        self.id = None
+
+
+def _resolve(ref):
+    return ref.id if isinstance(ref, _NewRef) else ref
+
+
+def load_tree(db, course_id: int) -> dict:
+    """Current rows of the course, one query per level, as {table: {id: row mapping}}."""
+    S, L, A, C = models.Section, models.Lesson, models.Assessment, models.Choice
+    sections = db.execute(select(S.id, S.title, S.order).where(S.course_id == course_id)).mappings().all()
+    lessons = db.execute(
+        select(L.id, L.section_id, L.title, L.type, L.youtube_url, L.pdf_url, L.order)
+        .join(S, L.section_id == S.id)
+        .where(S.course_id == course_id)
+    ).mappings().all()
+    assessments = db.execute(
+        select(A.id, A.lesson_id, A.question_markdown, A.image_url, A.max_score, A.explanation)
+        .join(L, A.lesson_id == L.id)
+        .join(S, L.section_id == S.id)
+        .where(S.course_id == course_id)
+    ).mappings().all()
+    choices = db.execute(
+        select(C.id, C.assessment_id, C.text, C.is_correct, C.explanation)
+        .join(A, C.assessment_id == A.id)
+        .join(L, A.lesson_id == L.id)
+        .join(S, L.section_id == S.id)
+        .where(S.course_id == course_id)
+    ).mappings().all()
+    return {
+        "sections": {r["id"]: r for r in sections},
+        "lessons": {r["id"]: r for r in lessons},
+        "assessments": {r["id"]: r for r in assessments},
+        "choices": {r["id"]: r for r in choices},
+    }
+
+
+def _values(item: dict, fields, current=None, defaults=None) -> dict:
+    # a missing key - or None for a required column - keeps the current value (default for new rows)
+    defaults = defaults or {}
+    values = {}
+    for f in fields:
+        v = item.get(f)
+        if f not in item or (v is None and f not in CLEARABLE_FIELDS):
+            v = current[f] if current is not None else defaults.get(f)
+        values[f] = v
+    return values
+
+
+def _new_values(kind: str, item: dict, fields, defaults) -> dict:
+    values = _values(item, fields, defaults=defaults)
+    missing = [f for f in REQUIRED_ON_INSERT.get(kind, ()) if values[f] is None]
+    if missing:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail=f"New {kind} is missing {', '.join(missing)}")
+    return values
+
+
+def _changed(current, values: dict, parent_key=None, parent_id=None) -> bool:
+    if parent_key and current[parent_key] != parent_id:
+        return True
+    return any(current[k] != v for k, v in values.items())
+
+
+class CourseDiff:
+    def __init__(self, tree: dict):
+        self.tree = tree
+        self.sections, self.lessons, self.assessments, self.choices = _Level(), _Level(), _Level(), _Level()
+
+    # --- walking the incoming payload ---
+    def add_sections(self, course_id: int, sections_in):
+        cur = self.tree["sections"]
+        for s_in in sections_in:
+            sid = s_in.get("id")
+            if sid in cur:
+                values = _values(s_in, SECTION_FIELDS, cur[sid])
+                if _changed(cur[sid], values):
+                    self.sections.updates.append({"id": sid, **values})
+                self.sections.keep.add(sid)
+                ref = sid
+            else:
+                ref = _NewRef()
+                self.sections.inserts.append((_new_values("section", s_in, SECTION_FIELDS, {"order": 0}), course_id, ref))
+            self._add_lessons(ref, s_in.get("lessons"))
+
+    def _add_lessons(self, section_ref, lessons_in):
+        cur = self.tree["lessons"]
+        if lessons_in is None:
+            self._keep_children("lessons", "section_id", section_ref, self._keep_lesson)
+            return
+        for l_in in lessons_in:
+            lid = l_in.get("id")
+            if lid in cur:
+                values = _values(l_in, LESSON_FIELDS, cur[lid])
+                if isinstance(section_ref, _NewRef) or _changed(cur[lid], values, "section_id", section_ref):
+                    self.lessons.updates.append({"id": lid, "section_id": section_ref, **values})
+                self.lessons.keep.add(lid)
+                ref = lid
+            else:
+                ref = _NewRef()
+                self.lessons.inserts.append((_new_values("lesson", l_in, LESSON_FIELDS, {"order": 0, "type": "video"}), section_ref, ref))
+            self._add_assessments(ref, l_in.get("assessments"))
+
+    def _add_assessments(self, lesson_ref, assessments_in):
+        cur = self.tree["assessments"]
+        if assessments_in is None:
+            self._keep_children("assessments", "lesson_id", lesson_ref, self._keep_assessment)
+            return
+        for a_in in assessments_in:
+            aid = a_in.get("id")
+            if aid in cur:
+                values = _values(a_in, ASSESSMENT_FIELDS, cur[aid])
+                if isinstance(lesson_ref, _NewRef) or _changed(cur[aid], values, "lesson_id", lesson_ref):
+                    self.assessments.updates.append({"id": aid, "lesson_id": lesson_ref, **values})
+                self.assessments.keep.add(aid)
+                ref = aid
+            else:
+                ref = _NewRef()
+                self.assessments.inserts.append((_values(a_in, ASSESSMENT_FIELDS, defaults={"max_score": 1, "question_markdown": ""}), lesson_ref, ref))
+            self._add_choices(ref, a_in.get("choices"))
+
+    def _add_choices(self, assessment_ref, choices_in):
+        cur = self.tree["choices"]
+        if choices_in is None:
+            self._keep_children("choices", "assessment_id", assessment_ref, None)
+            return
+        for c_in in choices_in:
+            cid = c_in.get("id")
+            if cid in cur:
+                values = _values(c_in, CHOICE_FIELDS, cur[cid])
+                if isinstance(assessment_ref, _NewRef) or _changed(cur[cid], values, "assessment_id", assessment_ref):
+                    self.choices.updates.append({"id": cid, "assessment_id": assessment_ref, **values})
+                self.choices.keep.add(cid)
+            else:
+                self.choices.inserts.append((_values(c_in, CHOICE_FIELDS, defaults={"is_correct": False}), assessment_ref, None))
+
+    # --- "None = leave alone" for existing parents ---
+    def _keep_children(self, table, parent_key, parent_ref, keep_fn):
+        if isinstance(parent_ref, _NewRef):
+            return
+        level = getattr(self, table)
+        for row_id, row in self.tree[table].items():
+            if row[parent_key] == parent_ref:
+                level.keep.add(row_id)
+                if keep_fn:
+                    keep_fn(row_id)
+
+    def _keep_lesson(self, lesson_id):
+        self._keep_children("assessments", "lesson_id", lesson_id, self._keep_assessment)
+
+    def _keep_assessment(self, assessment_id):
+        self._keep_children("choices", "assessment_id", assessment_id, None)
+
+    def keep_everything(self):
+        for table in ("sections", "lessons", "assessments", "choices"):
+            getattr(self, table).keep.update(self.tree[table].keys())
+
+    # --- result ---
+    def removed(self, table):
+        return sorted(set(self.tree[table]) - getattr(self, table).keep)
+
+
+def _bulk_insert(db, model, level, parent_key):
+    if not level.inserts:
+        return
+    rows = []
+    for values, parent_ref, _ in level.inserts:
+        rows.append(dict(values, **{parent_key: _resolve(parent_ref)}))
+    ids = db.execute(insert(model).returning(model.id, sort_by_parameter_order=True), rows).scalars().all()
+    for (_, _, ref), new_id in zip(level.inserts, ids):
+        if ref is not None:
+            ref.id = new_id
+
+
+def _bulk_update(db, model, level, parent_key=None):
+    if not level.updates:
+        return
+    rows = []
+    for row in level.updates:
+        row = dict(row)
+        if parent_key:
+            row[parent_key] = _resolve(row[parent_key])
+        rows.append(row)
+    db.execute(update(model), rows)
+
+
+def _changed_keys(diff: CourseDiff) -> set:
+    # call after the inserts, so refs to new assessments are resolved (those need no bump)
+    cur = diff.tree["choices"]
+    ids = {row["id"] for row in diff.assessments.updates}
+    ids.update(_resolve(ref) for _, ref, _ in diff.choices.inserts)
+    for row in diff.choices.updates:
+        ids.update((_resolve(row["assessment_id"]), cur[row["id"]]["assessment_id"]))
+    ids.update(cur[cid]["assessment_id"] for cid in diff.removed("choices"))
+    return ids & diff.tree["assessments"].keys()
+
+
+def apply(db, diff: CourseDiff) -> dict:
+    """Write the diff; returns per-table counts (handy for logs)."""
+    # parents first so children can reference freshly inserted ids
+    _bulk_insert(db, models.Section, diff.sections, "course_id")
+    _bulk_insert(db, models.Lesson, diff.lessons, "section_id")
+    _bulk_insert(db, models.Assessment, diff.assessments, "lesson_id")
+    _bulk_insert(db, models.Choice, diff.choices, "assessment_id")
+
+    _bulk_update(db, models.Section, diff.sections)
+    _bulk_update(db, models.Lesson, diff.lessons, "section_id")
+    _bulk_update(db, models.Assessment, diff.assessments, "lesson_id")
+    _bulk_update(db, models.Choice, diff.choices, "assessment_id")
+
+    # new key_version for existing assessments whose key changed (removed ones: course_delete)
+    answer_key_cache.mark_changed(db, _changed_keys(diff))
+
+    # deletes last: moved children are re-parented above before their old parent disappears
+    removed = {t: diff.removed(t) for t in ("sections", "lessons", "assessments", "choices")}
+    course_delete.delete_subtree(db, removed["sections"], removed["lessons"], removed["assessments"], removed["choices"])
+
+    return {
+        t: {"inserted": len(getattr(diff, t).inserts), "updated": len(getattr(diff, t).updates), "deleted": len(removed[t])}
+        for t in ("sections", "lessons", "assessments", "choices")
+    }
+
+
+def sync_course_tree(db, course_id: int, sections_in) -> dict:
+    """Make the course's sections/lessons/assessments/choices match sections_in (None = untouched)."""
+    tree = load_tree(db, course_id)
+    diff = CourseDiff(tree)
+    if sections_in is None:
+        diff.keep_everything()
+    else:
+        diff.add_sections(course_id, sections_in)
+    return apply(db, diff)
+
+
+def insert_tree(db, course_id: int, sections_in) -> dict:
+    """
+    Insert a brand-new tree under course_id (course creation).
+    One INSERT ... RETURNING per level that has rows - at most 4 statements whatever the tree size
+    (SQLAlchemy pages very large executemany batches by insertmanyvalues_page_size, 1000 rows).
+    """
+    return insert_trees(db, [(course_id, sections_in)])
+
+
+def insert_trees(db, trees) -> dict:
+    """insert_tree for many courses at once: trees is [(course_id, sections_in), ...] (bulk import)."""
+    diff = CourseDiff({"sections": {}, "lessons": {}, "assessments": {}, "choices": {}})
+    for course_id, sections_in in trees:
+        diff.add_sections(course_id, sections_in or [])
+    return apply(db, diff)
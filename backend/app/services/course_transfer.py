@@ -0,0 +1,251 @@
+"""
+Bulk course import/export as JSON Lines: one complete course tree per line
+(course -> sections -> lessons -> assessments -> choices, no database ids), so files move
+between environments and partner catalogs can be loaded without one POST per course.
+
+Import (POST /instructor/courses/import):
+  the request body is spooled to a temp file chunk by chunk, then a background task reads it
+  line by line and inserts COURSE_IMPORT_BATCH_SIZE courses per transaction: one INSERT ...
+  RETURNING for the courses plus one per tree level (course_sync.insert_trees). Bad lines are
+  counted and reported, they don't stop the import. Progress is written to course_imports after
+  every batch and served by GET /instructor/courses/imports/{id}, so a poll may land on any
+  worker and a finished import's report survives restarts.
+Export (GET /instructor/courses/export):
+  courses are streamed with yield_per and their trees loaded per batch with flat column queries,
+  so memory stays bounded by the batch size however big the catalog is.
+"""
+import json
+import os
+import tempfile
+import uuid
+from datetime import datetime, timezone
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from slugify import slugify
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import crud, models, schemas
+from app.core import catalog_cache
+from app.core.config import settings
+from app.db.sessions import SessionLocal
+from app.services import course_sync
+
+MAX_REPORTED_ERRORS = 50
+
+COURSE_FIELDS = ("title", "slug", "description", "is_udemy", "udemy_url", "price_cents", "currency", "is_published")
+
+PROGRESS_FIELDS = ("status", "lines_read", "imported", "failed", "errors", "started_at", "finished_at")
+
+
+# ---------- import ----------
+async def new_import(db, educator_id: int) -> models.CourseImport:
+    """Record a queued import (AsyncSession; the import endpoint is async)."""
+    job = models.CourseImport(id=uuid.uuid4().hex, educator_id=educator_id, status="queued",
+                              lines_read=0, imported=0, failed=0, errors=[])
+    db.add(job)
+    await db.commit()
+    return job
+
+
+def get_import(db, import_id: str, educator_id: int):
+    job = db.get(models.CourseImport, import_id)
+    if job is None or job.educator_id != educator_id:
+        return None
+    return job
+
+
+def _save_progress(db, job: dict):
+    CI = models.CourseImport
+    db.execute(update(CI).where(CI.id == job["id"]).values({f: job[f] for f in PROGRESS_FIELDS}))
+    db.commit()
+
+
+def _report_error(job: dict, message: str):
+    if len(job["errors"]) < MAX_REPORTED_ERRORS:
+        job["errors"].append(message)
+
+
+async def spool_request_body(request) -> str:
+    """Copy the request body to a temp file without holding it in memory; returns the path."""
+    fd, path = tempfile.mkstemp(prefix="course-import-", suffix=".jsonl", dir=settings.COURSE_IMPORT_SPOOL_DIR)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > settings.COURSE_IMPORT_MAX_BYTES:
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Import file too large")
+                spool.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+def _course_row(line: schemas.CourseImportLine, educator_id: int) -> dict:
+    # same pricing rules as crud.create_course_with_educator
+    return {
+        "educator_id": educator_id,
+        "title": line.title,
+        "description": line.description,
+        "is_udemy": line.is_udemy,
+        "udemy_url": line.udemy_url,
+        "price_cents": 0 if line.is_udemy else (line.price_cents or 0),
+        "currency": line.currency or "INR",
+        "is_published": True if line.is_published is None else line.is_published,
+    }
+
+
+def _insert_batch(db, educator_id: int, lines) -> list:
+    """One transaction for the batch: courses, then their trees. Returns the new course ids."""
+    rows = [_course_row(line, educator_id) for line in lines]
+    bases = [slugify(line.slug or line.title) for line in lines]
+    for attempt in range(crud.SLUG_INSERT_ATTEMPTS):
+        for row, slug in zip(rows, crud.generate_unique_slugs(db, bases)):
+            row["slug"] = slug
+        try:
+            with db.begin_nested():
+                course_ids = db.execute(
+                    insert(models.Course).returning(models.Course.id, sort_by_parameter_order=True), rows
+                ).scalars().all()
+                course_sync.insert_trees(db, [
+                    (course_id, [s.dict() for s in line.sections or []])
+                    for course_id, line in zip(course_ids, lines)
+                    if not line.is_udemy
+                ])
+                crud.refresh_course_derived(db, course_ids)
+                catalog_cache.mark_changed(db, course_ids)
+            break
+        except IntegrityError as exc:
+            # a concurrent creator took one of our slugs: recompute and retry the batch
+            if not crud.is_slug_violation(exc) or attempt == crud.SLUG_INSERT_ATTEMPTS - 1:
+                raise
+    db.commit()
+    return course_ids
+
+
+def _flush_batch(db, job: dict, batch: list):
+    first_line = batch[0][0]
+    try:
+        course_ids = _insert_batch(db, job["educator_id"], [line for _, line in batch])
+    except Exception as exc:
+        db.rollback()
+        job["failed"] += len(batch)
+        _report_error(job, f"lines {first_line}-{batch[-1][0]}: {exc.__class__.__name__}: {exc}")
+        return
+    job["imported"] += len(course_ids)
+
+
+def run_import(import_id: str, path: str):
+    """Background task: stream-parse the spooled file and insert it batch by batch."""
+    db = SessionLocal()
+    try:
+        row = db.get(models.CourseImport, import_id)
+        if row is None:
+            return
+        job = {"id": row.id, "educator_id": row.educator_id, "lines_read": 0, "imported": 0, "failed": 0,
+               "errors": [], "status": "running", "started_at": datetime.now(timezone.utc), "finished_at": None}
+        _save_progress(db, job)
+        _read_and_insert(db, job, path)
+    finally:
+        db.close()
+        os.unlink(path)
+
+
+def _read_and_insert(db, job: dict, path: str):
+    try:
+        batch = []
+        with open(path, "rb") as source:
+            for line_no, raw in enumerate(source, start=1):
+                job["lines_read"] = line_no
+                if not raw.strip():
+                    continue
+                try:
+                    line = schemas.CourseImportLine.parse_obj(json.loads(raw))
+                except (ValueError, ValidationError) as exc:
+                    job["failed"] += 1
+                    _report_error(job, f"line {line_no}: {exc}")
+                    continue
+                batch.append((line_no, line))
+                if len(batch) >= settings.COURSE_IMPORT_BATCH_SIZE:
+                    _flush_batch(db, job, batch)
+                    _save_progress(db, job)   # what pollers see until the next batch
+                    batch = []
+        if batch:
+            _flush_batch(db, job, batch)
+        job["status"] = "done"
+    except Exception as exc:
+        db.rollback()
+        job["status"] = "failed"
+        _report_error(job, f"{exc.__class__.__name__}: {exc}")
+    job["finished_at"] = datetime.now(timezone.utc)
+    _save_progress(db, job)
+
+
+# ---------- export ----------
+def _load_trees(db, course_ids) -> dict:
+    """course_id -> [section dicts] for a batch of courses, one flat query per level."""
+    S, L, A, C = models.Section, models.Lesson, models.Assessment, models.Choice
+    sections = db.execute(
+        select(S.id, S.course_id, S.title, S.order).where(S.course_id.in_(course_ids)).order_by(S.order, S.id)
+    ).mappings().all()
+    section_ids = [s["id"] for s in sections]
+    lessons = db.execute(
+        select(L.id, L.section_id, L.title, L.type, L.youtube_url, L.pdf_url, L.order)
+        .where(L.section_id.in_(section_ids)).order_by(L.order, L.id)
+    ).mappings().all() if section_ids else []
+    lesson_ids = [l["id"] for l in lessons]
+    assessments = db.execute(
+        select(A.id, A.lesson_id, A.question_markdown, A.image_url, A.max_score, A.explanation)
+        .where(A.lesson_id.in_(lesson_ids)).order_by(A.id)
+    ).mappings().all() if lesson_ids else []
+    assessment_ids = [a["id"] for a in assessments]
+    choices = db.execute(
+        select(C.assessment_id, C.text, C.is_correct, C.explanation)
+        .where(C.assessment_id.in_(assessment_ids)).order_by(C.id)
+    ).mappings().all() if assessment_ids else []
+
+    # build bottom-up, dropping ids (they mean nothing in the target database)
+    by_assessment = {}
+    for c in choices:
+        by_assessment.setdefault(c["assessment_id"], []).append({f: c[f] for f in course_sync.CHOICE_FIELDS})
+    by_lesson = {}
+    for a in assessments:
+        item = {f: a[f] for f in course_sync.ASSESSMENT_FIELDS}
+        item["choices"] = by_assessment.get(a["id"], [])
+        by_lesson.setdefault(a["lesson_id"], []).append(item)
+    by_section = {}
+    for l in lessons:
+        item = {f: l[f] for f in course_sync.LESSON_FIELDS}
+        item["assessments"] = by_lesson.get(l["id"], [])
+        by_section.setdefault(l["section_id"], []).append(item)
+    by_course = {}
+    for s in sections:
+        item = {f: s[f] for f in course_sync.SECTION_FIELDS}
+        item["lessons"] = by_section.get(s["id"], [])
+        by_course.setdefault(s["course_id"], []).append(item)
+    return by_course
+
+
+def export_lines(educator_id: int):
+    """Yield one JSON line per course owned by educator_id (feed to a StreamingResponse)."""
+    db = SessionLocal()
+    db.info["use_replica"] = True   # read-only; a replica is fine
+    try:
+        columns = [models.Course.id] + [getattr(models.Course, f) for f in COURSE_FIELDS]
+        result = db.execute(
+            select(*columns)
+            .where(models.Course.educator_id == educator_id)
+            .order_by(models.Course.id)
+            .execution_options(yield_per=settings.COURSE_EXPORT_BATCH_SIZE)
+        )
+        for courses in result.mappings().partitions():
+            trees = _load_trees(db, [c["id"] for c in courses])
+            for course in courses:
+                item = {f: course[f] for f in COURSE_FIELDS}
+                item["sections"] = trees.get(course["id"], [])
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+    finally:
+        db.close()
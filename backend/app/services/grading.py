@@ -0,0 +1,186 @@
+"""
+Grading engine for POST /students/assessments/{assessment_id}/submit.
+
+The old path did a Choice lookup + commit per answer, then three more queries per answer to
+build the results (~5 round trips per question). Here:
+  1. one indexed query resolves the submitted choices to (assessment, key_version); keys whose
+     version matches come from app/core/answer_key_cache.py, one more query loads the others
+  2. scoring and the per-question results are computed in memory
+  3. one transaction writes the attempt (INSERT ... RETURNING, attempt number taken from the
+     per-user counter in the same statement) and all StudentAnswer rows (one executemany INSERT)
+At most four statements plus COMMIT (three with warm keys), whatever the number of questions.
+
+Scoring is unchanged: 1 point per correct choice; the explanation is shown for correct answers.
+An answer with choice_id None (nothing selected) is a wrong answer to the submitted assessment,
+stored with choice_id NULL.
+"""
+from array import array
+from bisect import bisect_left
+
+from fastapi import HTTPException
+from sqlalchemy import insert, literal, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app import models
+from app.core import answer_key_cache
+
+
+class AnswerKey:
+    """Choices of one assessment: sorted choice ids (int array) + correct flags (bytes, same order)."""
+
+    __slots__ = ("assessment_id", "version", "choice_ids", "correct", "correct_choice_id", "explanation")
+
+    def __init__(self, assessment_id: int, choices, explanation: str = None, version: int = 0):
+        # choices: iterable of (choice_id, is_correct)
+        ordered = sorted(choices)
+        self.assessment_id = assessment_id
+        self.version = version
+        self.choice_ids = array("q", (cid for cid, _ in ordered))
+        self.correct = bytes(1 if ok else 0 for _, ok in ordered)
+        self.correct_choice_id = next((cid for cid, ok in ordered if ok), None)
+        self.explanation = explanation
+
+    def is_correct(self, choice_id: int):
+        """True/False, or None when the choice is not part of this assessment."""
+        i = bisect_left(self.choice_ids, choice_id)
+        if i == len(self.choice_ids) or self.choice_ids[i] != choice_id:
+            return None
+        return bool(self.correct[i])
+
+
+def load_answer_keys(db, choice_ids, assessment_ids=()) -> dict:
+    """assessment_id -> AnswerKey for every assessment owning one of choice_ids (plus assessment_ids); cache first."""
+    C, A = models.Choice, models.Assessment
+    owners = A.id.in_(select(C.assessment_id).where(C.id.in_(choice_ids)))
+    if assessment_ids:
+        owners = or_(owners, A.id.in_(list(assessment_ids)))
+    versions = dict(db.execute(select(A.id, A.key_version).where(owners)).all())
+    keys, missing = answer_key_cache.lookup(versions)
+    if missing:
+        loaded = query_answer_keys(db, missing)
+        answer_key_cache.store(loaded.values())
+        keys.update(loaded)
+    return keys
+
+
+def query_answer_keys(db, assessment_ids) -> dict:
+    """assessment_id -> AnswerKey for these assessments (one query)."""
+    C, A = models.Choice, models.Assessment
+    rows = db.execute(
+        select(A.id, A.key_version, A.explanation, C.id, C.is_correct)
+        .join(C, C.assessment_id == A.id)
+        .where(A.id.in_(assessment_ids))
+    ).all()
+    choices, meta = {}, {}
+    for assessment_id, version, explanation, choice_id, is_correct in rows:
+        choices.setdefault(assessment_id, []).append((choice_id, is_correct))
+        meta[assessment_id] = (explanation, version)
+    return {aid: AnswerKey(aid, chs, *meta[aid]) for aid, chs in choices.items()}
+
+
+def score_answers(keys: dict, choice_ids, assessment_id: int = None) -> list:
+    """Per-answer results in submission order; 400 if a choice id is unknown."""
+    by_choice = {}
+    for key in keys.values():
+        for cid in key.choice_ids:
+            by_choice[cid] = key
+    results = []
+    for choice_id in choice_ids:
+        if choice_id is None:
+            # unanswered: wrong, but still show the right choice of the submitted assessment
+            key = keys.get(assessment_id)
+            results.append({
+                "question_id": assessment_id,
+                "selected_choice_id": None,
+                "is_correct": False,
+                "correct_choice_id": key.correct_choice_id if key else None,
+                "score": 0.0,
+                "explanation": None,
+            })
+            continue
+        key = by_choice.get(choice_id)
+        if key is None:
+            raise HTTPException(status_code=400, detail=f"Unknown choice id {choice_id}")
+        is_correct = key.is_correct(choice_id)
+        results.append({
+            "question_id": key.assessment_id,
+            "selected_choice_id": choice_id,
+            "is_correct": is_correct,
+            "correct_choice_id": key.correct_choice_id,
+            "score": 1.0 if is_correct else 0.0,
+            "explanation": key.explanation if is_correct else None,
+        })
+    return results
+
+
+def score(db, choice_ids, assessment_id: int = None):
+    """(per-answer results, total score) for a submission; reads keys through the cache."""
+    choice_ids = [None if cid is None else int(cid) for cid in choice_ids]
+    answered = [cid for cid in choice_ids if cid is not None]
+    extra = [assessment_id] if len(answered) < len(choice_ids) and assessment_id is not None else []
+    keys = load_answer_keys(db, answered, extra) if answered or extra else {}
+    results = score_answers(keys, choice_ids, assessment_id)
+    return results, float(sum(r["score"] for r in results))
+
+
+def insert_attempt(db, user_id: int, assessment_id: int, score: float = 0.0):
+    """
+    INSERT the attempt with the next attempt number; returns (id, attempt_number).
+
+    One statement: the counter upsert (ON CONFLICT DO UPDATE ... RETURNING) runs as a CTE feeding
+    the attempt INSERT. The counter row lock serializes concurrent submits of the same user, so
+    numbers never repeat (uq_assessment_attempts_user_assessment_number backs that up) and no
+    max() over the user's attempts is needed.
+    """
+    AT, N = models.AssessmentAttempt, models.AssessmentAttemptCounter
+    bump = pg_insert(N).values(user_id=user_id, assessment_id=assessment_id, last_number=1)
+    counter = (
+        bump.on_conflict_do_update(
+            index_elements=[N.user_id, N.assessment_id],
+            set_={"last_number": N.last_number + 1},
+        )
+        .returning(N.last_number)
+        .cte("next_attempt_number")
+    )
+    return db.execute(
+        insert(AT)
+        .add_cte(counter)
+        .from_select(
+            ["user_id", "assessment_id", "attempt_number", "score"],
+            select(literal(user_id), literal(assessment_id), counter.c.last_number, literal(score)),
+        )
+        .returning(AT.id, AT.attempt_number)
+    ).one()
+
+
+def write_answers(db, attempt_id: int, results):
+    if results:
+        db.execute(insert(models.StudentAnswer), [
+            {"attempt_id": attempt_id, "choice_id": r["selected_choice_id"], "is_correct": r["is_correct"], "score": r["score"]}
+            for r in results
+        ])
+
+
+def result_payload(attempt_id: int, assessment_id: int, attempt_number: int, total: float, results) -> dict:
+    return {
+        "attempt_id": attempt_id,
+        "assessment_id": assessment_id,
+        "attempt_number": attempt_number,
+        "total_score": total,
+        "question_results": results,
+    }
+
+
+def grade_submission(db, user_id: int, assessment_id: int, choice_ids) -> dict:
+    """Score a submission and persist attempt + answers in one transaction; returns AttemptResultOut data."""
+    results, total = score(db, choice_ids, assessment_id)
+
+    try:
+        attempt = insert_attempt(db, user_id, assessment_id, total)
+        write_answers(db, attempt.id, results)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return result_payload(attempt.id, assessment_id, attempt.attempt_number, total, results)
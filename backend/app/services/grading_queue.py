@@ -0,0 +1,214 @@
+"""
+Asynchronous grading for exam spikes (POST /students/assessments/{id}/submit-async).
+
+Submitting only writes the attempt (score 0) and a grading_jobs row holding the raw choice
+ids, then returns 202 - two INSERTs, no grading work on the request worker. A bounded pool of
+GRADING_WORKERS threads per process grades in the background:
+  - claim: UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED) RETURNING, so any number
+    of workers/processes share the table without handing out a job twice
+  - grade: grading.score (answer keys from the cache), then one transaction marks the job done
+    with the result JSON, writes the StudentAnswer rows and the attempt score
+  - jobs stuck in "running" longer than GRADING_JOB_TIMEOUT_SECONDS (worker died, restart) are
+    requeued, or failed once they used GRADING_MAX_TRIES; the queue itself is the table, so
+    nothing is lost across restarts
+Clients poll GET /students/attempts/{attempt_id}/result. stats() feeds /internal/metrics.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import case, func, insert, select, update
+
+from app import models
+from app.core.config import settings
+from app.db.sessions import SessionLocal
+from app.services import grading
+
+logger = logging.getLogger(__name__)
+
+J = models.GradingJob
+
+_stop = threading.Event()
+_threads = []
+_counters_lock = threading.Lock()
+_counters = {"graded": 0, "failed": 0, "retried": 0, "requeued_stale": 0, "grading_seconds": 0.0}
+
+
+def _count(name: str, amount=1):
+    with _counters_lock:
+        _counters[name] += amount
+
+
+# ---------- producer side ----------
+def enqueue_submission(db, user_id: int, assessment_id: int, choice_ids) -> dict:
+    """Persist the attempt and its raw answers; grading happens later. One transaction."""
+    try:
+        attempt = grading.insert_attempt(db, user_id, assessment_id)
+        db.execute(insert(J).values(
+            attempt_id=attempt.id, user_id=user_id, assessment_id=assessment_id, choice_ids=list(choice_ids),
+        ))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return {"attempt_id": attempt.id, "status": "queued"}
+
+
+def get_job(db, attempt_id: int, user_id: int):
+    """Status/result for the student's own attempt, or None."""
+    row = db.execute(
+        select(J.attempt_id, J.status, J.result, J.error).where(J.attempt_id == attempt_id, J.user_id == user_id)
+    ).first()
+    return dict(row._mapping) if row else None
+
+
+# ---------- worker side ----------
+def claim(db, limit: int):
+    pending = (
+        select(J.id)
+        .where(J.status == "queued")
+        .order_by(J.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    jobs = db.execute(
+        update(J)
+        .where(J.id.in_(pending))
+        .values(status="running", started_at=func.now(), tries=J.tries + 1)
+        .returning(J.id, J.attempt_id, J.assessment_id, J.choice_ids, J.tries)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return jobs
+
+
+def requeue_stale(db) -> int:
+    """
+    Give timed-out jobs back to the queue. claim() already counted the run in tries, so a job that
+    keeps killing or hanging its worker stops at GRADING_MAX_TRIES like any other failure.
+    """
+    timed_out = J.started_at < func.now() - timedelta(seconds=settings.GRADING_JOB_TIMEOUT_SECONDS)
+    exhausted = J.tries >= settings.GRADING_MAX_TRIES
+    rows = db.execute(
+        update(J)
+        .where(J.status == "running", timed_out)
+        .values(
+            status=case((exhausted, "failed"), else_="queued"),
+            error=case((exhausted, "grading timed out on every try"), else_=J.error),
+            finished_at=case((exhausted, func.now()), else_=None),
+        )
+        .returning(J.status)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.commit()
+    failed = rows.count("failed")
+    if len(rows) - failed:
+        _count("requeued_stale", len(rows) - failed)
+    if failed:
+        _count("failed", failed)
+        logger.error("%s grading jobs timed out %s times, marked failed", failed, settings.GRADING_MAX_TRIES)
+    return len(rows)
+
+
+def process(db, job):
+    started = time.perf_counter()
+    try:
+        results, total = grading.score(db, job.choice_ids, job.assessment_id)
+        attempt_number = db.execute(
+            select(models.AssessmentAttempt.attempt_number).where(models.AssessmentAttempt.id == job.attempt_id)
+        ).scalar()
+        payload = grading.result_payload(job.attempt_id, job.assessment_id, attempt_number, total, results)
+        # only the claim that is still current may finish the job (a requeued one may be running elsewhere)
+        owned = db.execute(
+            update(J)
+            .where(J.id == job.id, J.status == "running", J.tries == job.tries)
+            .values(status="done", result=payload, error=None, finished_at=func.now())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not owned:
+            db.rollback()
+            return
+        grading.write_answers(db, job.attempt_id, results)
+        db.execute(
+            update(models.AssessmentAttempt)
+            .where(models.AssessmentAttempt.id == job.attempt_id)
+            .values(score=total)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        _count("graded")
+    except Exception as exc:
+        db.rollback()
+        # bad input (unknown choice) will never succeed; anything else is retried a few times
+        permanent = isinstance(exc, HTTPException) or job.tries >= settings.GRADING_MAX_TRIES
+        message = exc.detail if isinstance(exc, HTTPException) else f"{exc.__class__.__name__}: {exc}"
+        db.execute(
+            update(J)
+            .where(J.id == job.id, J.status == "running", J.tries == job.tries)
+            .values(status="failed" if permanent else "queued", error=message,
+                    finished_at=func.now() if permanent else None)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        _count("failed" if permanent else "retried")
+        if not permanent:
+            logger.warning("grading job %s failed (try %s), requeued: %s", job.id, job.tries, message)
+    finally:
+        _count("grading_seconds", time.perf_counter() - started)
+
+
+def _worker_loop(name: str):
+    next_requeue = 0.0
+    while not _stop.is_set():
+        jobs = []
+        try:
+            with SessionLocal() as db:
+                if time.monotonic() >= next_requeue:
+                    requeue_stale(db)
+                    next_requeue = time.monotonic() + settings.GRADING_JOB_TIMEOUT_SECONDS / 2
+                jobs = claim(db, settings.GRADING_CLAIM_BATCH)
+                for job in jobs:
+                    process(db, job)
+        except Exception:
+            logger.exception("grading worker %s crashed on a batch", name)
+        if not jobs:
+            _stop.wait(settings.GRADING_POLL_INTERVAL_SECONDS)
+
+
+def start_workers():
+    if _threads or settings.GRADING_WORKERS <= 0:
+        return
+    _stop.clear()
+    for i in range(settings.GRADING_WORKERS):
+        thread = threading.Thread(target=_worker_loop, args=(f"grader-{i}",), name=f"grader-{i}", daemon=True)
+        thread.start()
+        _threads.append(thread)
+
+
+def stop_workers(timeout: float = 10.0):
+    _stop.set()
+    for thread in _threads:
+        thread.join(timeout)
+    _threads.clear()
+
+
+def stats(db) -> dict:
+    """Queue depth and lag from the table (all processes) + this process's worker counters."""
+    row = db.execute(
+        select(
+            func.count().filter(J.status == "queued"),
+            func.count().filter(J.status == "running"),
+            func.extract("epoch", func.now() - func.min(J.created_at).filter(J.status == "queued")),
+        ).where(J.status.in_(("queued", "running")))
+    ).one()
+    with _counters_lock:
+        counters = dict(_counters)
+    return {
+        "depth": row[0],
+        "running": row[1],
+        "lag_seconds": round(float(row[2]), 3) if row[2] is not None else 0.0,
+        "workers": len(_threads),
+        **counters,
+    }
@@ -0,0 +1,213 @@
+"""
+Item analysis for a course's questions (GET /instructor/courses/{course_id}/item-analysis).
+
+A response is one student's latest graded attempt at a question (the frontend submits one
+question per attempt). Unanswered questions (choice_id NULL) are responses too, scored wrong;
+they are attributed to their question through the attempt.
+
+Per question (assessment):
+  - p_value: share of responses that picked a correct choice (difficulty; higher = easier)
+  - point_biserial: correlation between answering this question correctly and the student's
+    score on the course's other questions (rest score, so the item doesn't correlate with
+    itself); None when it is undefined (everyone right/wrong, or no spread in rest scores)
+  - unanswered: responses without a choice
+  - choices: how often each choice was picked (distractor frequencies), unpicked ones included
+
+Three queries: the course's answer keys (small), a version probe (below), and on a cache
+miss every response as one row of array_agg columns, so the driver hands back four flat
+arrays instead of a million row tuples. The statistics are grouped per student, per question
+and per choice with np.unique/np.bincount; no Python loop touches individual answers
+(tests/test_item_analysis.py times a million answers).
+
+Results are cached per course, keyed by a version made of the course's answer keys (choices,
+correct flags, texts) and its attempt set (count, newest id, still-queued grading jobs).
+Any key edit or new graded attempt produces a new version, in every process.
+"""
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import Integer, cast, func, select
+
+from app import models
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+A, C, L, S = models.Assessment, models.Choice, models.Lesson, models.Section
+AT, SA, J = models.AssessmentAttempt, models.StudentAnswer, models.GradingJob
+
+_cache = LRUCache(maxsize=settings.ITEM_ANALYSIS_CACHE_SIZE)   # course_id -> (version, result)
+_counters_lock = threading.Lock()
+_counters = {"computed": 0, "compute_seconds": 0.0}
+
+
+def _course_assessment_ids(course_id: int):
+    return (
+        select(A.id)
+        .join(L, L.id == A.lesson_id)
+        .join(S, S.id == L.section_id)
+        .where(S.course_id == course_id)
+    )
+
+
+def _load_keys(db, course_id: int):
+    return db.execute(
+        select(A.id, A.lesson_id, C.id, C.text, C.is_correct)
+        .join(C, C.assessment_id == A.id)
+        .where(A.id.in_(_course_assessment_ids(course_id)))
+        .order_by(A.id, C.id)
+    ).all()
+
+
+def _version(db, course_id: int, keys) -> tuple:
+    assessment_ids = _course_assessment_ids(course_id)
+    pending = (
+        select(func.count()).select_from(J)
+        .where(J.status.in_(("queued", "running")), J.assessment_id.in_(assessment_ids))
+        .scalar_subquery()
+    )
+    attempts = db.execute(
+        select(func.count(AT.id), func.max(AT.id), pending).where(AT.assessment_id.in_(assessment_ids))
+    ).one()
+    return (hash(tuple(keys)), *attempts)
+
+
+def _load_answers(db, course_id: int):
+    """Each student's latest graded answer per question of this course, as flat columns (one row of arrays)."""
+    latest = (
+        select(
+            AT.user_id,
+            AT.assessment_id,
+            func.coalesce(SA.choice_id, 0).label("choice_id"),   # 0: unanswered
+            func.coalesce(cast(SA.is_correct, Integer), 0).label("correct"),
+        )
+        .join(SA, SA.attempt_id == AT.id)
+        .where(AT.assessment_id.in_(_course_assessment_ids(course_id)))
+        .distinct(AT.user_id, AT.assessment_id)
+        .order_by(AT.user_id, AT.assessment_id, AT.id.desc(), SA.id.desc())
+        .subquery()
+    )
+    row = db.execute(
+        select(
+            func.array_agg(latest.c.user_id),
+            func.array_agg(latest.c.assessment_id),
+            func.array_agg(latest.c.choice_id),
+            func.array_agg(latest.c.correct),
+        )
+    ).one()
+    if row[0] is None:
+        return None
+    return {
+        "user_id": np.asarray(row[0], dtype=np.int64),
+        "assessment_id": np.asarray(row[1], dtype=np.int64),
+        "choice_id": np.asarray(row[2], dtype=np.int64),
+        "correct": np.asarray(row[3], dtype=np.float64),
+    }
+
+
+def _ratio(num, den):
+    out = np.full(num.shape, np.nan)
+    np.divide(num, den, out=out, where=den != 0)
+    return out
+
+
+def _none_if_nan(value):
+    return None if np.isnan(value) else round(float(value), 4)
+
+
+def compute(keys, answers) -> dict:
+    """Statistics from the answer keys and the answer columns (see _load_answers)."""
+    key_assessments = np.asarray([k[0] for k in keys], dtype=np.int64)
+    assessment_ids = np.unique(key_assessments)
+    choice_ids = np.asarray([k[2] for k in keys], dtype=np.int64)
+    choice_order = np.argsort(choice_ids)
+    sorted_ids = choice_ids[choice_order]
+    item_of = np.searchsorted(assessment_ids, key_assessments)[choice_order]   # sorted choice -> question index
+    n_items = len(assessment_ids)
+
+    if answers is not None:
+        # drop answers to questions or choices added after the keys were read (edit between the queries)
+        item = np.searchsorted(assessment_ids, answers["assessment_id"])
+        known = item < n_items
+        known[known] = assessment_ids[item[known]] == answers["assessment_id"][known]
+        position = np.searchsorted(sorted_ids, answers["choice_id"])
+        picked = answers["choice_id"] != 0
+        in_keys = position < len(sorted_ids)
+        in_keys[in_keys] = sorted_ids[position[in_keys]] == answers["choice_id"][in_keys]
+        known &= ~picked | in_keys
+        answers = {name: column[known] for name, column in answers.items()}
+        answers["item"] = item[known]
+        answers["position"] = position[known]
+        answers["picked"] = picked[known]
+        if not len(answers["item"]):
+            answers = None
+
+    if answers is None:
+        responses = unanswered = np.zeros(n_items)
+        p_value = point_biserial = np.full(n_items, np.nan)
+        picks = np.zeros(len(choice_ids))
+        students = 0
+    else:
+        item = answers["item"]
+        x = answers["correct"]
+        student_ids, student = np.unique(answers["user_id"], return_inverse=True)
+        rest = np.bincount(student, weights=x)[student] - x   # the student's score on the other questions
+        responses = np.bincount(item, minlength=n_items).astype(np.float64)
+        unanswered = np.bincount(item[~answers["picked"]], minlength=n_items)
+        p_value = _ratio(np.bincount(item, weights=x, minlength=n_items), responses)
+        mean_rest = _ratio(np.bincount(item, weights=rest, minlength=n_items), responses)
+        mean_rest_sq = _ratio(np.bincount(item, weights=rest * rest, minlength=n_items), responses)
+        mean_x_rest = _ratio(np.bincount(item, weights=x * rest, minlength=n_items), responses)
+        # population covariance / (sd_x * sd_rest); x is 0/1 so var_x = p(1-p)
+        cov = mean_x_rest - p_value * mean_rest
+        var_x = p_value * (1 - p_value)
+        var_rest = np.maximum(mean_rest_sq - mean_rest * mean_rest, 0)
+        point_biserial = _ratio(cov, np.sqrt(var_x * var_rest))
+
+        picks = np.zeros(len(choice_ids))
+        picks[choice_order] = np.bincount(answers["position"][answers["picked"]], minlength=len(choice_ids))
+        students = len(student_ids)
+
+    items, choices_by_item = [], {}
+    for (assessment_id, _, choice_id, text, is_correct), count in zip(keys, picks):
+        choices_by_item.setdefault(assessment_id, []).append(
+            {"choice_id": choice_id, "text": text, "is_correct": bool(is_correct), "count": int(count)}
+        )
+    lesson_of = {k[0]: k[1] for k in keys}
+    for i, assessment_id in enumerate(assessment_ids.tolist()):
+        n = int(responses[i])
+        choices = choices_by_item[assessment_id]
+        for choice in choices:
+            choice["rate"] = round(choice["count"] / n, 4) if n else None
+        items.append({
+            "assessment_id": assessment_id,
+            "lesson_id": lesson_of[assessment_id],
+            "responses": n,
+            "unanswered": int(unanswered[i]),
+            "p_value": _none_if_nan(p_value[i]),
+            "point_biserial": _none_if_nan(point_biserial[i]),
+            "choices": choices,
+        })
+    return {"students": students, "answers": int(responses.sum()), "items": items}
+
+
+def course_item_analysis(db, course_id: int) -> dict:
+    keys = _load_keys(db, course_id)
+    version = _version(db, course_id, keys)
+    cached = _cache.get(course_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    started = time.perf_counter()
+    result = {"course_id": course_id, **compute(keys, _load_answers(db, course_id) if keys else None)}
+    with _counters_lock:
+        _counters["computed"] += 1
+        _counters["compute_seconds"] += time.perf_counter() - started
+    _cache.set(course_id, (version, result), expires_at=time.time() + settings.ITEM_ANALYSIS_CACHE_TTL_SECONDS)
+    return result
+
+
+def stats() -> dict:
+    with _counters_lock:
+        counters = dict(_counters)
+    return {"cache": _cache.stats(), **counters}
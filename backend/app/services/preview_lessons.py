@@ -0,0 +1,36 @@
+"""
+courses.preview_lesson_id - the lesson anonymous visitors and non-enrolled students may open:
+first lesson of the first section, by (section.order, section.id, lesson.order, lesson.id).
+
+Structure edits call refresh() in their transaction (via crud.refresh_course_derived), so preview
+checks and the preview page are a key lookup instead of two ORDER BY queries per call.
+Deleting the lesson nulls the column (FK ON DELETE SET NULL) until the next refresh.
+"""
+from sqlalchemy import select, update
+
+from app import models
+
+C, S, L = models.Course, models.Section, models.Lesson
+
+
+def first_lesson_id(course_id_expr):
+    return (
+        select(L.id)
+        .join(S, L.section_id == S.id)
+        .where(S.course_id == course_id_expr)
+        .order_by(S.order, S.id, L.order, L.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+def refresh(db, course_ids=None) -> int:
+    """Recompute preview_lesson_id for these courses (all when None); one UPDATE, returns rows changed."""
+    first = first_lesson_id(C.id)
+    stmt = update(C).where(C.preview_lesson_id.is_distinct_from(first)).values(preview_lesson_id=first)
+    if course_ids is not None:
+        course_ids = list(course_ids)
+        if not course_ids:
+            return 0
+        stmt = stmt.where(C.id.in_(course_ids))
+    return db.execute(stmt.execution_options(synchronize_session=False)).rowcount
@@ -0,0 +1,145 @@
+"""
+Denormalized progress counters: courses.lesson_count and enrollments.completed_lessons.
+
+A lesson completion bumps one enrollment row (crud.mark_lesson_completed) and reads progress
+off the two counters (crud.calculate_and_update_progress) instead of running two join
+aggregates. Structure edits keep them in step in the same transaction, without recounting
+completions:
+  - course_delete calls forget_completions() before deleting lessons; it counts only the
+    completions of those lessons and takes them off the affected enrollments
+  - refresh_courses() then recounts the edited course's lessons and re-derives progress_percent
+    from the stored counters (adding a lesson changes the total, never the completions)
+
+reconcile() recounts everything from scratch and fixes whatever drifted; run it periodically:
+
+    python -m app.services.progress_counters
+"""
+from sqlalchemy import Float, Numeric, case, cast, func, or_, select, update
+
+from app import models
+
+C, E, S, L, SL = models.Course, models.Enrollment, models.Section, models.Lesson, models.StudentLesson
+
+
+def _actual_lesson_count():
+    return (
+        select(func.count(L.id))
+        .join(S, L.section_id == S.id)
+        .where(S.course_id == C.id)
+        .scalar_subquery()
+    )
+
+
+def _actual_completed_lessons():
+    return (
+        select(func.count())
+        .select_from(SL)
+        .join(L, SL.lesson_id == L.id)
+        .join(S, L.section_id == S.id)
+        .where(S.course_id == E.course_id, SL.user_id == E.user_id)
+        .scalar_subquery()
+    )
+
+
+def progress_expr(completed, total):
+    """SQL twin of the rounding in crud.calculate_and_update_progress."""
+    return case(
+        (total > 0, cast(func.round(cast(completed, Numeric) * 100 / total, 2), Float)),
+        else_=0.0,
+    )
+
+
+def course_progress_expr(completed, course_id):
+    """progress_expr against the stored lesson_count of course_id."""
+    return progress_expr(completed, select(C.lesson_count).where(C.id == course_id).scalar_subquery())
+
+
+def forget_completions(db, section_ids=(), lesson_ids=()) -> int:
+    """
+    Call before deleting these sections/lessons: subtract their completions from the enrollment
+    counters (the cascade is about to drop the rows). Reads only the completions of the deleted
+    lessons; touches only enrollments that had some. Returns the number of enrollments adjusted.
+    """
+    conditions = []
+    if section_ids:
+        conditions.append(L.section_id.in_(list(section_ids)))
+    if lesson_ids:
+        conditions.append(L.id.in_(list(lesson_ids)))
+    if not conditions:
+        return 0
+    removed = (
+        select(SL.user_id, S.course_id, func.count().label("n"))
+        .join(L, SL.lesson_id == L.id)
+        .join(S, L.section_id == S.id)
+        .where(or_(*conditions))
+        .group_by(SL.user_id, S.course_id)
+        .subquery()
+    )
+    return db.execute(
+        update(E)
+        .where(E.user_id == removed.c.user_id, E.course_id == removed.c.course_id)
+        .values(completed_lessons=func.greatest(E.completed_lessons - removed.c.n, 0))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def refresh_courses(db, course_ids) -> dict:
+    """
+    After a structure edit of these courses: recount their lessons and re-derive enrollment
+    progress from the stored counters. Only rows that are actually off get written; returns how
+    many of each were fixed. Two UPDATE statements whatever the number of courses. The caller commits.
+    """
+    course_ids = list(course_ids)
+    if not course_ids:
+        return {"courses": 0, "enrollments": 0}
+    lesson_count = _actual_lesson_count()
+    fixed_courses = db.execute(
+        update(C)
+        .where(C.id.in_(course_ids), C.lesson_count != lesson_count)
+        .values(lesson_count=lesson_count)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    # runs after the course update, so it already sees the corrected lesson_count
+    progress = course_progress_expr(E.completed_lessons, E.course_id)
+    fixed_enrollments = db.execute(
+        update(E)
+        .where(E.course_id.in_(course_ids), E.progress_percent.is_distinct_from(progress))
+        .values(progress_percent=progress)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    return {"courses": fixed_courses, "enrollments": fixed_enrollments}
+
+
+def reconcile(db) -> dict:
+    """Recount both counters across the whole catalog and fix any drift (one transaction)."""
+    try:
+        lesson_count = _actual_lesson_count()
+        fixed_courses = db.execute(
+            update(C).where(C.lesson_count != lesson_count).values(lesson_count=lesson_count)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+        completed = _actual_completed_lessons()
+        progress = course_progress_expr(completed, E.course_id)
+        fixed_enrollments = db.execute(
+            update(E)
+            .where(or_(E.completed_lessons != completed, E.progress_percent.is_distinct_from(progress)))
+            .values(completed_lessons=completed, progress_percent=progress)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return {"courses": fixed_courses, "enrollments": fixed_enrollments}
+
+
+if __name__ == "__main__":
+    from app.db.sessions import SessionLocal
+
+    session = SessionLocal()
+    try:
+        print(f"progress counters reconciled: {reconcile(session)}")
+    finally:
+        session.close()
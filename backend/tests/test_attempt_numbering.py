@@ -0,0 +1,52 @@
+"""Attempt numbers come from an atomic per-(user, assessment) counter (app/services/grading.py:insert_attempt)."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, select
+
+from app import crud, models
+from app.db.sessions import SessionLocal
+
+THREADS = 8
+ATTEMPTS_PER_THREAD = 50
+
+
+def _submit_attempts(user_id, assessment_id, start):
+    session = SessionLocal()
+    try:
+        start.wait()
+        return [crud.create_assessment_attempt(session, user_id, assessment_id).attempt_number
+                for _ in range(ATTEMPTS_PER_THREAD)]
+    finally:
+        session.close()
+
+
+def test_parallel_submits_never_share_an_attempt_number(db, make_user, make_assessment):
+    assessment = make_assessment()
+    alice, bob = make_user(), make_user()
+    # every thread submits for alice; bob's single thread checks counters are per user
+    start = threading.Barrier(THREADS + 1)
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS + 1) as pool:
+        alice_runs = [pool.submit(_submit_attempts, alice.id, assessment.id, start) for _ in range(THREADS)]
+        bob_run = pool.submit(_submit_attempts, bob.id, assessment.id, start)
+        alice_numbers = sorted(n for run in alice_runs for n in run.result())
+        bob_numbers = bob_run.result()
+    elapsed = time.perf_counter() - began
+
+    total = THREADS * ATTEMPTS_PER_THREAD
+    assert alice_numbers == list(range(1, total + 1))
+    assert bob_numbers == list(range(1, ATTEMPTS_PER_THREAD + 1))
+
+    AT = models.AssessmentAttempt
+    stored = db.execute(
+        select(func.count(), func.count(func.distinct(AT.attempt_number)), func.max(AT.attempt_number))
+        .where(AT.user_id == alice.id, AT.assessment_id == assessment.id)
+    ).one()
+    assert tuple(stored) == (total, total, total)
+
+    attempts = total + ATTEMPTS_PER_THREAD
+    print(f"\nattempt numbering: {attempts} attempts from {THREADS + 1} threads in {elapsed:.2f}s "
+          f"({attempts / elapsed:.0f} attempts/s)")
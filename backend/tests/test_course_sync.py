@@ -0,0 +1,125 @@
+"""Course tree updates (crud.update_course_full -> app/services/course_sync.py)."""
+import time
+
+import pytest
+from sqlalchemy import event
+
+from app import crud, schemas
+from app.db.sessions import engine
+
+TREE_SIZES = [(3, 10), (10, 20), (20, 50)]   # (sections, lessons per section)
+SYNC_ROUNDS = 5
+
+
+def _course(db, educator, lessons=2, **fields):
+    course_in = schemas.CourseCreate(title="Sync", description="About", sections=[{
+        "title": "Section",
+        "lessons": [{"title": f"Lesson {i}", "youtube_url": f"https://youtu.be/{i}"} for i in range(lessons)],
+    }], **fields)
+    return crud.get_course_by_id(db, crud.create_course_with_educator(db, course_in, educator.id).id)
+
+
+def _update(db, course, payload):
+    return crud.update_course_full(db, course.id, payload, educator_id=course.educator_id)
+
+
+def test_none_clears_nullable_fields_and_keeps_required_ones(db, make_user):
+    course = _course(db, make_user(is_educator=True))
+    section = course.sections[0]
+    first, second = section.lessons
+
+    updated = _update(db, course, {
+        "title": None,          # required: kept
+        "description": None,   # nullable: cleared
+        "sections": [{"id": section.id, "lessons": [
+            {"id": first.id, "title": None, "youtube_url": None},
+            {"id": second.id},  # missing keys: kept
+        ]}],
+    })
+
+    assert updated.title == "Sync"
+    assert updated.description is None
+    lessons = {l.id: l for l in updated.sections[0].lessons}
+    assert lessons[first.id].title == "Lesson 0" and lessons[first.id].youtube_url is None
+    assert lessons[second.id].youtube_url == "https://youtu.be/1"
+
+
+def test_lists_are_the_final_set_and_none_keeps_children(db, make_user):
+    course = _course(db, make_user(is_educator=True), lessons=3)
+    section = course.sections[0]
+    kept, _dropped, moved = section.lessons
+
+    updated = _update(db, course, {"sections": [
+        {"id": section.id, "lessons": [{"id": kept.id}]},
+        {"title": "New section", "order": 1, "lessons": [{"id": moved.id}, {"title": "Added", "type": "pdf"}]},
+    ]})
+
+    by_title = {s.title: s for s in updated.sections}
+    assert [l.id for l in by_title["Section"].lessons] == [kept.id]
+    assert sorted(l.title for l in by_title["New section"].lessons) == ["Added", "Lesson 2"]
+    assert updated.lesson_count == 3
+
+    unchanged = _update(db, updated, {"sections": [{"id": s.id, "lessons": None} for s in updated.sections]})
+    assert sum(len(s.lessons) for s in unchanged.sections) == 3
+
+
+def test_new_lesson_without_title_is_rejected_before_writing(db, make_user):
+    course = _course(db, make_user(is_educator=True))
+
+    with pytest.raises(Exception) as exc_info:
+        _update(db, course, {"sections": [{"title": "Extra", "lessons": [{"type": "pdf"}]}]})
+
+    assert getattr(exc_info.value, "status_code", None) == 422
+    assert len(crud.get_course_by_id(db, course.id).sections) == 1
+
+
+def test_statement_count_does_not_grow_with_the_tree(db, make_user):
+    educator = make_user(is_educator=True)
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def renamed(course):
+        # every lesson changes, and one more is added
+        lessons = [{"id": l.id, "title": l.title + "!"} for l in course.sections[0].lessons]
+        return {"sections": [{"id": course.sections[0].id, "lessons": lessons + [{"title": "More"}]}]}
+
+    counts = []
+    for size in (2, 40):
+        course = _course(db, educator, lessons=size)
+        payload = renamed(course)
+        statements.clear()
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            _update(db, course, payload)
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1]
+
+
+def test_sync_timings_at_realistic_tree_sizes(db, make_user):
+    educator = make_user(is_educator=True)
+    report = []
+    for sections, lessons in TREE_SIZES:
+        course = crud.create_course_with_educator(db, schemas.CourseCreate(title="Timed", sections=[{
+            "title": f"Section {s}", "order": s,
+            "lessons": [{"title": f"Lesson {l}", "order": l} for l in range(lessons)],
+        } for s in range(sections)]), educator.id)
+        course = crud.get_course_by_id(db, course.id)
+        timings = []
+        for round_ in range(SYNC_ROUNDS):
+            # a typical editor save: the whole tree sent back, every lesson renamed, one lesson added
+            payload = {"sections": [{"id": s.id, "lessons": [
+                {"id": l.id, "title": f"{l.title.split(' #')[0]} #{round_}"} for l in s.lessons
+            ] + ([{"title": f"Added {round_}"}] if i == 0 else [])} for i, s in enumerate(course.sections)]}
+            started = time.perf_counter()
+            course = _update(db, course, payload)
+            timings.append(time.perf_counter() - started)
+        assert course.lesson_count == sections * lessons + SYNC_ROUNDS
+        timings.sort()
+        report.append(f"{sections}x{lessons} lessons {timings[len(timings) // 2] * 1000:.0f}ms")
+
+    print("\ncourse tree sync, median of full-tree saves: " + "; ".join(report))
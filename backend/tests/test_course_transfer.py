@@ -0,0 +1,49 @@
+"""Bulk JSON Lines export/import (GET /instructor/courses/export, POST /instructor/courses/import)."""
+import json
+
+from app import crud, schemas
+
+
+def _tree():
+    return [
+        {"title": "Basics", "order": 0, "lessons": [
+            {"title": "Intro", "youtube_url": "https://youtu.be/a", "order": 0},
+            {"title": "Quiz", "type": "pdf", "pdf_url": "https://example.com/q.pdf", "order": 1, "assessments": [
+                {"question_markdown": "2 + 2?", "explanation": "Arithmetic", "choices": [
+                    {"text": "4", "is_correct": True, "explanation": "Yes"},
+                    {"text": "5", "is_correct": False},
+                ]},
+            ]},
+        ]},
+        {"title": "More", "order": 1, "lessons": []},
+    ]
+
+
+def _export(client):
+    response = client.get("/api/v1/instructor/courses/export")
+    assert response.status_code == 200, response.text
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_export_import_round_trip_reports_bad_lines_and_suffixes_slugs(db, make_user, login):
+    author, importer = make_user(is_educator=True), make_user(is_educator=True)
+    crud.create_course_with_educator(db, schemas.CourseCreate(title="Full Course", description="Trees",
+                                                              sections=_tree()), author.id)
+    crud.create_course_with_educator(db, schemas.CourseCreate(title="Empty Course", price_cents=500), author.id)
+    exported = _export(login(author))
+    assert [c["title"] for c in exported] == ["Full Course", "Empty Course"]
+
+    lines = [json.dumps(exported[0]), "{not json", json.dumps({"description": "no title"}), "", json.dumps(exported[1])]
+    client = login(importer)
+    # the import runs as a background task, which TestClient finishes before returning
+    queued = client.post("/api/v1/instructor/courses/import", content="\n".join(lines).encode())
+    assert queued.status_code == 202, queued.text
+
+    report = client.get(f"/api/v1/instructor/courses/imports/{queued.json()['id']}").json()
+    assert (report["status"], report["lines_read"], report["imported"], report["failed"]) == ("done", 5, 2, 2)
+    assert [e.split(":")[0] for e in report["errors"]] == ["line 2", "line 3"]
+
+    imported = _export(client)
+    for original, copy in zip(exported, imported):
+        assert copy["slug"] == f"{original['slug']}-1"   # the author's courses hold the original slugs
+        assert {**copy, "slug": None} == {**original, "slug": None}
@@ -0,0 +1,40 @@
+"""One request, one pooled connection: auth and the handler share the request's Session."""
+import pytest
+from sqlalchemy import event
+
+from app.core import auth, principal_cache
+from app.db.sessions import engine
+
+
+@pytest.fixture
+def checkouts():
+    """Counts pool checkouts on the primary engine while the test runs."""
+    seen = []
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        seen.append(connection_record)
+
+    event.listen(engine, "checkout", on_checkout)
+    try:
+        yield seen
+    finally:
+        event.remove(engine, "checkout", on_checkout)
+
+
+@pytest.mark.parametrize("path", [
+    "/api/v1/instructor/courses",                      # get_current_user + handler
+    "/api/v1/instructor/courses/{course_id}/lessons",  # + require_course_owner
+])
+def test_authenticated_request_checks_out_one_connection(path, db, make_user, make_assessment, login, checkouts):
+    educator = make_user(is_educator=True)
+    course_id = make_assessment(educator).lesson.section.course_id
+    client = login(educator)
+    # cold caches, so auth and the ownership check really go to the database
+    principal_cache.clear()
+    auth._course_owner_cache.clear()
+    checkouts.clear()
+
+    response = client.get(path.format(course_id=course_id))
+
+    assert response.status_code == 200, response.text
+    assert len(checkouts) == 1
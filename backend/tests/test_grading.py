@@ -0,0 +1,161 @@
+"""Synchronous grading (POST /students/assessments/{id}/submit, app/services/grading.py)."""
+import time
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app import crud, models, schemas
+from app.core import answer_key_cache
+from app.db.sessions import engine
+
+BENCH_SIZES = (10, 50, 200)   # questions per submission
+BENCH_ROUNDS = 20
+
+
+def _submit(client, assessment_id, choice_ids):
+    return client.post(f"/api/v1/students/assessments/{assessment_id}/submit",
+                       json={"answers": [{"choice_id": c} for c in choice_ids]})
+
+
+def test_submit_scores_answers_and_records_the_attempt(db, make_user, make_assessment, login):
+    assessment = make_assessment()
+    right, wrong = (c.id for c in assessment.choices)
+    client = login(make_user())
+
+    first = _submit(client, assessment.id, [right])
+    second = _submit(client, assessment.id, [wrong])
+
+    assert first.status_code == 200, first.text
+    assert first.json()["total_score"] == 1
+    assert first.json()["question_results"][0]["is_correct"] is True
+    assert second.json()["total_score"] == 0
+    assert second.json()["question_results"][0]["correct_choice_id"] == right
+    assert [first.json()["attempt_number"], second.json()["attempt_number"]] == [1, 2]
+
+
+def test_unanswered_question_is_scored_wrong_and_stored_as_null(db, make_user, make_assessment, login):
+    assessment = make_assessment()
+    right = assessment.choices[0].id
+    client = login(make_user())
+
+    response = _submit(client, assessment.id, [None])
+
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result["total_score"] == 0
+    assert result["question_results"] == [{
+        "question_id": assessment.id, "selected_choice_id": None, "is_correct": False,
+        "correct_choice_id": right, "score": 0.0, "explanation": None,
+    }]
+    answer = db.execute(select(models.StudentAnswer).where(models.StudentAnswer.attempt_id == result["attempt_id"])).scalar_one()
+    assert answer.choice_id is None and answer.is_correct is False
+
+
+def test_non_integer_choice_ids_are_rejected(db, make_user, make_assessment, login):
+    assessment = make_assessment()
+    client = login(make_user())
+
+    for bad in (True, "12", 1.5):
+        response = _submit(client, assessment.id, [bad])
+        assert response.status_code == 400, (bad, response.text)
+    assert db.execute(select(models.AssessmentAttempt)).first() is None
+
+
+def test_new_assessment_and_its_choices_are_committed_together(db, make_user, make_assessment, login):
+    educator = make_user(is_educator=True)
+    lesson = make_assessment(educator).lesson
+    client = login(educator)
+    commits = []
+    record = lambda session: commits.append(session)
+
+    event.listen(Session, "after_commit", record)
+    try:
+        response = client.post(f"/api/v1/instructor/courses/{lesson.section.course_id}/assessments", json={
+            "lesson_id": lesson.id, "question_markdown": "3 + 3?",
+            "choices": [{"text": "6", "is_correct": True}, {"text": "7"}],
+        })
+    finally:
+        event.remove(Session, "after_commit", record)
+
+    assert response.status_code == 200, response.text
+    assert len(commits) == 1
+    created = db.get(models.Assessment, response.json()["id"])
+    assert sorted((c.text, c.is_correct) for c in created.choices) == [("6", True), ("7", False)]
+    right = next(c.id for c in created.choices if c.is_correct)
+    assert _submit(login(make_user()), created.id, [right]).json()["total_score"] == 1
+
+
+def test_statements_per_submission_do_not_grow_with_the_questions(db, make_user, login):
+    educator = make_user(is_educator=True)
+    client = login(make_user())
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def submit_timed(assessment_id, choice_ids, cold):
+        timings = []
+        for _ in range(BENCH_ROUNDS):
+            if cold:
+                answer_key_cache.clear()
+            started = time.perf_counter()
+            response = _submit(client, assessment_id, choice_ids)
+            timings.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+        return response.json(), sorted(timings)[len(timings) // 2]
+
+    counts, report = {}, []
+    for size in BENCH_SIZES:
+        course = crud.create_course_with_educator(db, schemas.CourseCreate(title=f"Exam {size}", sections=[{
+            "title": "Section",
+            "lessons": [{"title": f"Lesson {i}", "assessments": [{
+                "question_markdown": f"Q{i}", "choices": [{"text": "yes", "is_correct": True}, {"text": "no"}],
+            }]} for i in range(size)],
+        }]), educator.id)
+        questions = [l.assessments[0] for l in crud.get_course_by_id(db, course.id).sections[0].lessons]
+        # every other question right
+        choice_ids = [q.choices[i % 2].id for i, q in enumerate(questions)]
+        _submit(client, questions[0].id, choice_ids)   # warms the principal cache, so only grading is counted
+
+        for cold in (True, False):
+            answer_key_cache.clear()
+            if not cold:
+                _submit(client, questions[0].id, choice_ids)
+            statements.clear()
+            event.listen(engine, "before_cursor_execute", count)
+            try:
+                result, median = submit_timed(questions[0].id, choice_ids, cold)
+            finally:
+                event.remove(engine, "before_cursor_execute", count)
+            counts[size, cold] = len(statements) / BENCH_ROUNDS
+            report.append(f"{size} questions {'cold' if cold else 'warm'} keys: "
+                          f"{counts[size, cold]:.0f} statements, median {median * 1000:.1f}ms")
+        assert result["total_score"] == (size + 1) // 2
+
+    for cold in (True, False):
+        assert len({counts[size, cold] for size in BENCH_SIZES}) == 1
+    assert counts[BENCH_SIZES[0], True] <= 4 and counts[BENCH_SIZES[0], False] <= 3
+    print("\ngrading: " + "; ".join(report))
+
+
+def test_editing_the_key_bumps_its_version_and_regrades(db, make_user, make_assessment, login):
+    assessment = make_assessment()
+    lesson = assessment.lesson
+    right, wrong = (c.id for c in assessment.choices)
+    client = login(make_user())
+
+    assert _submit(client, assessment.id, [right]).json()["total_score"] == 1
+    version = db.get(models.Assessment, assessment.id).key_version
+    assert assessment.id in answer_key_cache.lookup({assessment.id: version})[0]   # graded from the cache now
+
+    crud.update_course_full(db, lesson.section.course_id, {"sections": [{"id": lesson.section_id, "lessons": [
+        {"id": lesson.id, "assessments": [{"id": assessment.id, "choices": [
+            {"id": right, "is_correct": False}, {"id": wrong, "is_correct": True},
+        ]}]},
+    ]}]}, educator_id=lesson.section.course.educator_id)
+    db.expire_all()
+
+    assert db.get(models.Assessment, assessment.id).key_version > version
+    old_right, new_right = (_submit(client, assessment.id, [c]).json() for c in (right, wrong))
+    assert old_right["total_score"] == 0 and old_right["question_results"][0]["correct_choice_id"] == wrong
+    assert new_right["total_score"] == 1
@@ -0,0 +1,97 @@
+"""Queued grading (POST /students/assessments/{id}/submit-async, app/services/grading_queue.py)."""
+from sqlalchemy import select, text
+
+from app import models
+from app.core.config import settings
+from app.db.sessions import SessionLocal
+from app.services import grading_queue
+
+J = models.GradingJob
+
+
+def _age(db, job_id):
+    """Make a running job look like its worker died GRADING_JOB_TIMEOUT_SECONDS ago."""
+    db.execute(text("UPDATE grading_jobs SET started_at = now() - make_interval(secs => :s) WHERE id = :id"),
+               {"s": settings.GRADING_JOB_TIMEOUT_SECONDS + 1, "id": job_id})
+    db.commit()
+
+
+def _status(db, job_id):
+    db.expire_all()
+    return db.execute(select(J.status, J.tries, J.error).where(J.id == job_id)).one()
+
+
+def test_submission_is_queued_claimed_once_graded_and_polled(db, make_user, make_assessment, login):
+    assessment = make_assessment()
+    right = assessment.choices[0].id
+    student = make_user()
+    client = login(student)
+
+    queued = client.post(f"/api/v1/students/assessments/{assessment.id}/submit-async",
+                         json={"answers": [{"choice_id": right}]})
+    assert queued.status_code == 202, queued.text
+    attempt_id = queued.json()["attempt_id"]
+    assert client.get(f"/api/v1/students/attempts/{attempt_id}/result").json()["status"] == "queued"
+
+    jobs = grading_queue.claim(db, 10)
+    assert [(j.attempt_id, j.tries) for j in jobs] == [(attempt_id, 1)]
+    assert grading_queue.claim(db, 10) == []   # running jobs are not handed out again
+    grading_queue.process(db, jobs[0])
+
+    polled = client.get(f"/api/v1/students/attempts/{attempt_id}/result").json()
+    assert polled["status"] == "done" and polled["result"]["total_score"] == 1
+    assert db.get(models.AssessmentAttempt, attempt_id).score == 1
+    assert grading_queue.get_job(db, attempt_id, make_user().id) is None   # only the student's own attempt
+
+
+def test_claim_skips_jobs_locked_by_another_worker(db, make_user, make_assessment):
+    assessment = make_assessment()
+    student = make_user()
+    attempts = [grading_queue.enqueue_submission(db, student.id, assessment.id, [None])["attempt_id"] for _ in range(3)]
+    other = SessionLocal()
+    try:
+        # another worker is in the middle of claiming the first job
+        other.execute(select(J.id).where(J.attempt_id == attempts[0]).with_for_update())
+        assert [j.attempt_id for j in grading_queue.claim(db, 10)] == attempts[1:]
+    finally:
+        other.close()
+    assert [j.attempt_id for j in grading_queue.claim(db, 10)] == attempts[:1]
+
+
+def test_timed_out_runs_are_requeued_until_max_tries(db, make_user, make_assessment):
+    assessment = make_assessment()
+    grading_queue.enqueue_submission(db, make_user().id, assessment.id, [None])
+
+    for attempt in range(1, settings.GRADING_MAX_TRIES + 1):
+        job, = grading_queue.claim(db, 10)
+        assert job.tries == attempt
+        assert grading_queue.requeue_stale(db) == 0   # still within its timeout
+        _age(db, job.id)
+        assert grading_queue.requeue_stale(db) == 1
+        status, tries, error = _status(db, job.id)
+        if attempt < settings.GRADING_MAX_TRIES:
+            assert status == "queued"
+        else:
+            assert (status, error) == ("failed", "grading timed out on every try")
+    assert grading_queue.claim(db, 10) == []
+
+
+def test_only_the_current_claim_may_finish_a_requeued_job(db, make_user, make_assessment):
+    assessment = make_assessment()
+    right = assessment.choices[0].id
+    attempt_id = grading_queue.enqueue_submission(db, make_user().id, assessment.id, [right])["attempt_id"]
+    stale, = grading_queue.claim(db, 10)
+    _age(db, stale.id)
+    grading_queue.requeue_stale(db)
+    current, = grading_queue.claim(db, 10)
+    assert current.tries == stale.tries + 1
+
+    # the timed-out worker comes back to life: its claim is no longer the job's
+    grading_queue.process(db, stale)
+    assert _status(db, stale.id)[0] == "running"
+    assert db.execute(select(models.StudentAnswer).where(models.StudentAnswer.attempt_id == attempt_id)).first() is None
+
+    grading_queue.process(db, current)
+    assert _status(db, current.id)[0] == "done"
+    answers = db.execute(select(models.StudentAnswer).where(models.StudentAnswer.attempt_id == attempt_id)).scalars().all()
+    assert [a.choice_id for a in answers] == [right]
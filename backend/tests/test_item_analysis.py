@@ -0,0 +1,115 @@
+"""Instructor item analysis (GET /instructor/courses/{id}/item-analysis, app/services/item_analysis.py)."""
+import time
+
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+from app import crud, schemas
+from app.services import grading, item_analysis
+
+BENCH_QUESTIONS = 50
+BENCH_STUDENTS = 20_000   # x BENCH_QUESTIONS = 1M answers
+
+
+def _course(db, educator, questions, choices=2):
+    """A course with one question per lesson; the first choice of each question is the correct one."""
+    course = crud.create_course_with_educator(db, schemas.CourseCreate(title="Quiz", sections=[{
+        "title": "Section",
+        "lessons": [{"title": f"Lesson {i}", "assessments": [{
+            "question_markdown": f"Q{i}",
+            "choices": [{"text": f"c{k}", "is_correct": k == 0} for k in range(choices)],
+        }]} for i in range(questions)],
+    }]), educator.id)
+    course = crud.get_course_by_id(db, course.id)
+    return course, [l.assessments[0] for l in course.sections[0].lessons]
+
+
+def test_discrimination_is_the_correlation_with_the_rest_score(db, make_user, login):
+    educator = make_user(is_educator=True)
+    course, questions = _course(db, educator, questions=3)
+    R, W, SKIP = "right", "wrong", "skip"   # None: never attempted
+    final = [
+        [R, R, R],
+        [R, W, R],
+        [W, W, R],
+        [W, R, W],
+        [R, W, W],
+        [W, W, SKIP],
+        [R, R, None],
+        [R, W, R],
+    ]
+    for row in final:
+        student = make_user()
+        for question, answer in zip(questions, row):
+            if answer is None:
+                continue
+            right, wrong = (c.id for c in question.choices)
+            # an earlier, opposite attempt that the latest one replaces
+            grading.grade_submission(db, student.id, question.id, [wrong if answer == R else right])
+            choice = {R: right, W: wrong, SKIP: None}[answer]
+            grading.grade_submission(db, student.id, question.id, [choice])
+
+    response = login(educator).get(f"/api/v1/instructor/courses/{course.id}/item-analysis")
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["students"] == len(final)
+    assert body["answers"] == sum(a is not None for row in final for a in row)
+    correct = np.array([[np.nan if a is None else float(a == R) for a in row] for row in final])
+    for i, item in enumerate(body["items"]):
+        answered = ~np.isnan(correct[:, i])
+        x = correct[answered, i]
+        rest = np.nansum(correct[answered], axis=1) - x
+        assert item["responses"] == answered.sum()
+        assert item["unanswered"] == sum(row[i] == SKIP for row in final)
+        assert item["p_value"] == pytest.approx(x.mean(), abs=1e-4)
+        assert item["point_biserial"] == pytest.approx(np.corrcoef(x, rest)[0, 1], abs=1e-4)
+        assert sum(c["count"] for c in item["choices"]) == item["responses"] - item["unanswered"]
+
+
+def test_item_analysis_of_a_million_answers(db, make_user):
+    educator = make_user(is_educator=True)
+    course, questions = _course(db, educator, questions=BENCH_QUESTIONS, choices=4)
+    started = time.perf_counter()
+    db.execute(text(
+        "INSERT INTO users (email, full_name, hashed_password) "
+        "SELECT 'bench' || g || '@example.com', 'Bench', '-' FROM generate_series(1, :n) g"
+    ), {"n": BENCH_STUDENTS})
+    db.execute(text(
+        "INSERT INTO assessment_attempts (user_id, assessment_id, attempt_number, score) "
+        "SELECT u.id, a, 1, 0 FROM users u, unnest(CAST(:questions AS int[])) a WHERE u.email LIKE 'bench%'"
+    ), {"questions": [q.id for q in questions]})
+    # student ability grows with the user id, so every question discriminates; about 1% unanswered
+    db.execute(text(
+        "INSERT INTO student_answers (attempt_id, choice_id, is_correct, score) "
+        "SELECT t.id, CASE WHEN t.id % 97 = 0 THEN NULL ELSE c.first_id + t.pick END, t.pick = 0 AND t.id % 97 <> 0, 0 "
+        "FROM (SELECT at.id, at.assessment_id, "
+        "             CASE WHEN (hashint4(at.id) & 1023) < at.user_id % 1024 THEN 0 ELSE 1 + at.id % 3 END AS pick "
+        "      FROM assessment_attempts at) t "
+        "JOIN (SELECT assessment_id, min(id) AS first_id FROM choices GROUP BY assessment_id) c "
+        "  ON c.assessment_id = t.assessment_id"
+    ))
+    db.execute(text("ANALYZE"))
+    db.commit()
+    seeded = time.perf_counter() - started
+
+    started = time.perf_counter()
+    answers = item_analysis._load_answers(db, course.id)
+    query_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    result = item_analysis.course_item_analysis(db, course.id)   # cold: keys, version probe, query and numpy
+    cold_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    item_analysis.course_item_analysis(db, course.id)
+    warm_seconds = time.perf_counter() - started
+
+    total = BENCH_STUDENTS * BENCH_QUESTIONS
+    assert len(answers["user_id"]) == total
+    assert result["answers"] == total and result["students"] == BENCH_STUDENTS
+    assert all(item["point_biserial"] > 0 for item in result["items"])
+    assert sum(item["unanswered"] for item in result["items"]) == total // 97
+
+    print(f"\nitem analysis: {total} answers ({BENCH_QUESTIONS} questions x {BENCH_STUDENTS} students, "
+          f"seeded in {seeded:.1f}s); array_agg query {query_seconds * 1000:.0f}ms, "
+          f"cold {cold_seconds * 1000:.0f}ms, cached {warm_seconds * 1000:.1f}ms")
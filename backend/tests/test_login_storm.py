@@ -0,0 +1,75 @@
+"""
+Login storm benchmark: bcrypt runs in the bounded hash pool (app/core/security.py), so unrelated
+requests keep their latency while hundreds of logins are in flight, and logins beyond
+PASSWORD_HASH_MAX_PENDING are turned away with 503 + Retry-After instead of queueing.
+"""
+import asyncio
+import time
+
+import httpx
+
+from app.core.config import settings
+from app.main import app
+from app.routes.auth import create_access_token
+
+LOGINS = settings.PASSWORD_HASH_MAX_PENDING + 32   # more than admission control lets in
+PROBES = 50
+PROBE_PATH = "/api/v1/instructor/courses"            # sync endpoint, DB query, no bcrypt
+
+
+def _percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+async def _probe(client):
+    started = time.perf_counter()
+    response = await client.get(PROBE_PATH)
+    return response.status_code, time.perf_counter() - started
+
+
+async def _storm(student_email, password, educator_token):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as logins_client, \
+            httpx.AsyncClient(transport=transport, base_url="http://testserver",
+                              cookies={"access_token": educator_token}) as probe_client:
+        quiet = [await _probe(probe_client) for _ in range(PROBES)]
+
+        started = time.perf_counter()
+        logins = [
+            asyncio.create_task(logins_client.post("/api/v1/auth/token",
+                                                   json={"email": student_email, "password": password}))
+            for _ in range(LOGINS)
+        ]
+        await asyncio.sleep(0.05)   # let the storm fill the hash pool
+        during = [await _probe(probe_client) for _ in range(PROBES)]
+        overlapped = not all(task.done() for task in logins)
+        responses = await asyncio.gather(*logins)
+        storm_seconds = time.perf_counter() - started
+    return quiet, during, overlapped, responses, storm_seconds
+
+
+def test_login_storm_leaves_other_requests_fast(db, make_user, password):
+    student = make_user()
+    educator = make_user(is_educator=True)
+
+    quiet, during, overlapped, responses, storm_seconds = asyncio.run(
+        _storm(student.email, password, create_access_token({"sub": str(educator.id)}))
+    )
+
+    assert all(status_code == 200 for status_code, _ in quiet + during)
+    assert overlapped, "the storm was over before the probes finished; raise LOGINS"
+    statuses = [r.status_code for r in responses]
+    assert set(statuses) <= {200, 503}
+    assert statuses.count(200) >= settings.PASSWORD_HASH_WORKERS
+    assert all("retry-after" in r.headers for r in responses if r.status_code == 503)
+
+    quiet_p99 = _percentile([t for _, t in quiet], 99)
+    during_p50 = _percentile([t for _, t in during], 50)
+    during_p99 = _percentile([t for _, t in during], 99)
+    # a GET stuck behind the bcrypt work would take about as long as the storm itself
+    assert during_p99 < storm_seconds / 4
+
+    print(f"\nlogin storm: {LOGINS} logins ({statuses.count(200)} ok, {statuses.count(503)} rejected) "
+          f"in {storm_seconds:.2f}s; GET {PROBE_PATH} p99 {quiet_p99 * 1000:.1f}ms quiet, "
+          f"p50 {during_p50 * 1000:.1f}ms / p99 {during_p99 * 1000:.1f}ms during the storm")
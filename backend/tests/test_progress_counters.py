@@ -0,0 +1,36 @@
+"""Denormalized progress counters (app/services/progress_counters.py) through the routes that move them."""
+from app import crud, models, schemas
+from app.services import progress_counters
+
+
+def _state(db, enrollment):
+    db.expire_all()
+    enrollment = db.get(models.Enrollment, enrollment.id)
+    return db.get(models.Course, enrollment.course_id).lesson_count, enrollment.completed_lessons, enrollment.progress_percent
+
+
+def test_counters_follow_completions_and_structure_edits(db, make_user, login):
+    educator, student = make_user(is_educator=True), make_user()
+    course = crud.create_course_with_educator(db, schemas.CourseCreate(title="Counted", sections=[{
+        "title": "Section", "lessons": [{"title": f"Lesson {i}"} for i in range(4)],
+    }]), educator.id)
+    lessons = [l.id for l in crud.get_course_by_id(db, course.id).sections[0].lessons]
+    enrollment = crud.enroll_user(db, student.id, course.id)
+
+    client = login(student)
+    for lesson_id in (lessons[0], lessons[1], lessons[1]):   # completing twice counts once
+        response = client.post(f"/api/v1/students/courses/{course.id}/lessons/{lesson_id}/complete")
+        assert response.status_code == 200, response.text
+    assert response.json()["progress"] == 50.0
+    assert _state(db, enrollment) == (4, 2, 50.0)
+
+    client = login(educator)
+    assert client.delete(f"/api/v1/instructor/lessons/{lessons[0]}").status_code == 200
+    assert _state(db, enrollment) == (3, 1, 33.33)
+
+    added = client.post(f"/api/v1/instructor/courses/{course.id}/lessons", json={"title": "Added"})
+    assert added.status_code == 201, added.text
+    assert _state(db, enrollment) == (4, 1, 25.0)
+
+    # every path kept the counters exact, so a full recount has nothing to fix
+    assert progress_counters.reconcile(db) == {"courses": 0, "enrollments": 0}
@@ -0,0 +1,266 @@
+"""Anonymous catalog endpoints (/api/v1/public); the list and search run on the asyncpg engine."""
+import asyncio
+import time
+from typing import List
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, event, select, text
+from sqlalchemy.orm import joinedload, raiseload
+
+from app import crud, models, schemas
+from app.core import catalog_cache, snapshot_store
+from app.db.sessions import SessionLocal, async_engine, engine, get_async_db, get_db
+
+LIST_REQUESTS = 400
+LIST_CONCURRENCY = 32
+SEARCH_COURSES = 100_000
+SEARCH_ROUNDS = 30
+TREE_ROUNDS = 20
+WORDS = ["python", "data", "science", "machine", "learning", "web", "design", "cooking", "guitar", "finance",
+         "photography", "marketing", "yoga", "drawing", "statistics", "history", "spanish", "chemistry"]
+
+
+def _publish(db, educator, title, description=None):
+    return crud.create_course_with_educator(db, schemas.CourseCreate(title=title, description=description), educator.id)
+
+
+def test_course_list_pages_through_the_async_engine(db, client, make_user):
+    educator = make_user(is_educator=True)
+    created = [_publish(db, educator, f"Course {i}").id for i in range(5)]
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/v1/public/courses", params=params)
+        assert response.status_code == 200, response.text
+        seen += [c["id"] for c in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert sorted(seen) == sorted(created)
+
+
+def test_search_ranks_title_matches_and_falls_back_to_trigrams(db, client, make_user):
+    educator = make_user(is_educator=True)
+    in_title = _publish(db, educator, "Python for Data Science")
+    in_description = _publish(db, educator, "Statistics", description="Worked examples in Python")
+    _publish(db, educator, "Watercolour painting")
+
+    ranked = client.get("/api/v1/public/courses/search", params={"q": "python"})
+    typo = client.get("/api/v1/public/courses/search", params={"q": "Pythn for Data Scence"})
+
+    assert ranked.status_code == 200, ranked.text
+    assert [c["id"] for c in ranked.json()] == [in_title.id, in_description.id]
+    assert [c["id"] for c in typo.json()] == [in_title.id]
+    assert client.get("/api/v1/public/courses/search", params={"q": ""}).status_code == 422
+
+
+def test_course_detail_loads_the_tree_in_a_fixed_number_of_queries(db, client, make_user):
+    educator = make_user(is_educator=True)
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def tree(lessons):
+        return [{"title": "Section", "lessons": [
+            {"title": f"Lesson {i}", "assessments": [
+                {"question_markdown": "?", "choices": [{"text": "a", "is_correct": True}, {"text": "b"}]},
+            ]} for i in range(lessons)
+        ]}]
+
+    counts = []
+    for lessons in (1, 25):
+        course = crud.create_course_with_educator(
+            db, schemas.CourseCreate(title=f"Tree {lessons}", sections=tree(lessons)), educator.id)
+        catalog_cache.clear()   # no snapshot: the tree comes from the database
+        statements.clear()
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            response = client.get(f"/api/v1/public/courses/{course.slug}")
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert len(body["sections"][0]["lessons"]) == lessons
+        assert all(len(l["assessments"][0]["choices"]) == 2 for l in body["sections"][0]["lessons"])
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1]
+
+
+def test_snapshots_are_filled_from_the_primary_only(db, client, make_user, login, monkeypatch):
+    # a second engine on the same database stands in for a replica, so we can see what it is asked
+    replica = create_engine(engine.url)
+    monkeypatch.setattr(SessionLocal.class_, "replica_binds", (replica,))
+    on_replica = []
+    event.listen(replica, "before_cursor_execute", lambda conn, cursor, statement, *args: on_replica.append(statement))
+    educator = make_user(is_educator=True)
+    course = _publish(db, educator, "Replicated")
+    catalog_cache.clear()
+    try:
+        assert client.get(f"/api/v1/public/courses/{course.slug}/preview").status_code == 200
+        assert on_replica, "the stand-in replica is not being routed to"
+        on_replica.clear()
+
+        public = client.get(f"/api/v1/public/courses/{course.slug}")
+        assert public.status_code == 200, public.text
+        assert on_replica == []
+        catalog_cache.clear()
+        editor = login(educator).get(f"/api/v1/instructor/courses/{course.id}")
+        assert editor.status_code == 200, editor.text
+        assert not [s for s in on_replica if "sections" in s]   # auth may read from it, the tree may not
+    finally:
+        replica.dispose()
+
+    assert snapshot_store.get(course.id, catalog_cache.course_version(course.id)) is not None
+
+
+def _list_query(limit):
+    return crud._course_list_order(select(models.Course), None, 0).options(raiseload(models.Course.sections)).limit(limit)
+
+
+# the list query without the page cache, once per engine, so the two drivers can be compared
+bench_app = FastAPI()
+
+
+@bench_app.get("/sync", response_model=List[schemas.PublicCourseListOut])
+def list_sync(limit: int = 50, db=Depends(get_db)):
+    return db.execute(_list_query(limit)).scalars().all()
+
+
+@bench_app.get("/async", response_model=List[schemas.PublicCourseListOut])
+async def list_async(limit: int = 50, db=Depends(get_async_db)):
+    return (await db.execute(_list_query(limit))).scalars().all()
+
+
+async def _throughput(client, path):
+    gate = asyncio.Semaphore(LIST_CONCURRENCY)
+
+    async def one():
+        async with gate:
+            return await client.get(path)
+
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(one() for _ in range(LIST_REQUESTS)))
+    return responses, time.perf_counter() - started
+
+
+async def _side_by_side():
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=bench_app), base_url="http://testserver") as client:
+            await _throughput(client, "/sync")   # warm both pools
+            await _throughput(client, "/async")
+            return {path: await _throughput(client, path) for path in ("/sync", "/async")}
+    finally:
+        await async_engine.dispose()   # its connections belong to this event loop
+
+
+def test_course_list_throughput_sync_vs_async(db, make_user):
+    educator = make_user(is_educator=True)
+    for i in range(200):
+        _publish(db, educator, f"Course {i}", description="x" * 200)
+
+    results = asyncio.run(_side_by_side())
+
+    bodies = {path: {r.text for r in responses} for path, (responses, _) in results.items()}
+    assert all(r.status_code == 200 for responses, _ in results.values() for r in responses)
+    assert len(bodies["/sync"]) == 1 and bodies["/sync"] == bodies["/async"]
+    rates = {path: LIST_REQUESTS / seconds for path, (_, seconds) in results.items()}
+    print(f"\ncourse list, {LIST_REQUESTS} requests {LIST_CONCURRENCY} at a time: "
+          f"sync (threadpool + psycopg2) {rates['/sync']:.0f} req/s, async (asyncpg) {rates['/async']:.0f} req/s")
+
+
+def test_search_latency_on_a_large_catalog(db, client, make_user):
+    educator = make_user(is_educator=True)
+    # three-word titles over a small vocabulary, so common words match thousands of courses
+    db.execute(text(
+        "INSERT INTO courses (educator_id, title, slug, description, is_published, is_udemy, price_cents, currency) "
+        "SELECT :educator, initcap(w[1 + g % n] || ' ' || w[1 + (g / n) % n] || ' ' || w[1 + (g / (n * n)) % n]), "
+        "       'bench-' || g, 'A course about ' || w[1 + (g * 7) % n] || ' and ' || w[1 + (g * 11) % n], true, false, 0, 'INR' "
+        "FROM generate_series(1, :courses) g, (SELECT CAST(:words AS text[]) AS w, :n AS n) v"
+    ), {"educator": educator.id, "courses": SEARCH_COURSES, "words": WORDS, "n": len(WORDS)})
+    db.execute(text("ANALYZE courses"))
+    db.commit()
+
+    queries = [   # (label, q, words the best hit's title must contain)
+        ("common word", "python", ["python"]),
+        ("phrase", "guitar yoga finance", ["guitar", "yoga", "finance"]),
+        ("typo, trigram fallback", "Gutiar Yogga Finanse", ["guitar", "yoga", "finance"]),
+        ("no match", "quantum", None),
+    ]
+    report = []
+    for label, q, expected in queries:
+        timings = []
+        for _ in range(SEARCH_ROUNDS):
+            started = time.perf_counter()
+            response = client.get("/api/v1/public/courses/search", params={"q": q})
+            timings.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+        titles = [c["title"].lower() for c in response.json()]
+        if expected is None:
+            assert titles == []
+        else:
+            assert titles and all(word in titles[0] for word in expected), (label, titles[:3])
+        timings.sort()
+        report.append(f"{label} {timings[len(timings) // 2] * 1000:.1f}ms median / {timings[-1] * 1000:.1f}ms worst")
+
+    print(f"\ncourse search over {SEARCH_COURSES} courses ({SEARCH_ROUNDS} requests each): " + "; ".join(report))
+
+
+def _tree(sections, lessons, choices):
+    return [{"title": f"Section {s}", "lessons": [
+        {"title": f"Lesson {l}", "youtube_url": "https://youtu.be/x", "assessments": [
+            {"question_markdown": "Which one? " * 10, "explanation": "Because. " * 10,
+             "choices": [{"text": f"Choice {c}", "is_correct": c == 0} for c in range(choices)]},
+        ]} for l in range(lessons)
+    ]} for s in range(sections)]
+
+
+def test_course_tree_selectin_vs_joinedload_rows_bytes_and_latency(db, make_user):
+    educator = make_user(is_educator=True)
+    course_id = crud.create_course_with_educator(db, schemas.CourseCreate(
+        title="Big", description="About " * 200, sections=_tree(10, 20, 4)), educator.id).id
+    M = models
+    loaders = {
+        # what get_course_by_id did before: one row per choice, parents repeated on each
+        "joinedload": joinedload(M.Course.sections).joinedload(M.Section.lessons)
+                      .joinedload(M.Lesson.assessments).joinedload(M.Assessment.choices),
+        "selectin": crud._course_tree_options(),
+    }
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    report = {}
+    for name, option in loaders.items():
+        timings = []
+        for _ in range(TREE_ROUNDS):
+            db.expunge_all()
+            captured.clear()
+            event.listen(engine, "before_cursor_execute", capture)
+            try:
+                started = time.perf_counter()
+                loaded = db.query(M.Course).options(option).filter(M.Course.id == course_id).first()
+                timings.append(time.perf_counter() - started)
+            finally:
+                event.remove(engine, "before_cursor_execute", capture)
+        assert sum(len(a.choices) for s in loaded.sections for l in s.lessons for a in l.assessments) == 800
+        # replay what the loader sent, counting the rows and row bytes Postgres returned
+        rows = size = 0
+        with engine.connect() as conn:
+            for statement, parameters in captured:
+                n, b = conn.exec_driver_sql(
+                    f"SELECT count(*), coalesce(sum(pg_column_size(t.*)), 0) FROM ({statement}) t", parameters).one()
+                rows, size = rows + n, size + b
+        timings.sort()
+        report[name] = (len(captured), rows, size, timings[len(timings) // 2])
+
+    print("\ncourse tree (10 sections x 20 lessons x 1 question x 4 choices): " + "; ".join(
+        f"{name} {queries} queries, {rows} rows, {size / 1024:.0f} KiB, median {seconds * 1000:.1f}ms"
+        for name, (queries, rows, size, seconds) in report.items()))
+    # selectin returns every entity once (more, narrower rows); the join repeats each parent per choice
+    assert report["selectin"][2] < report["joinedload"][2] / 2